@@ -0,0 +1,411 @@
+import cv2
+import numpy as np
+import os
+import json
+import queue
+import shutil
+import threading
+import zipfile
+from functools import lru_cache
+from pathlib import Path
+
+from instrumentacion import medir
+from registro_metricas import METRICAS
+
+MODOS_ALMACENAMIENTO = ('carpetas', 'columnar', 'solo_metricas')
+
+NOMBRE_CSV = "resultados_maestros.csv"
+NOMBRE_PARQUET = "resultados_maestros.parquet"
+NOMBRE_MANIFIESTO = "almacenamiento.json"
+DIR_IMAGENES = "imagenes"
+NOMBRE_NPY = "imagen_modificada.npy"
+NOMBRE_INDICE = "indice.json"
+
+# Formato de imagen_modificada en modo carpetas: extensión del archivo ('raw'
+# guarda el array sin comprimir como .npy, legible mapeado en memoria)
+FORMATOS_IMAGEN = {'png': '.png', 'tiff': '.tiff', 'raw': '.npy'}
+
+class EscritorAsincrono:
+    """
+    Escritura en segundo plano: una cola acotada vaciada por hilos escritores.
+
+    enviar() bloquea mientras la cola está llena (contrapresión), por lo que
+    las imágenes pendientes de escribir nunca superan capacidad + hilos.
+    cv2.imwrite, np.save y os.fsync liberan el GIL, de modo que la
+    codificación y la E/S se solapan con el cálculo del hilo principal.
+    """
+
+    def __init__(self, hilos=2, capacidad=None):
+        self._cola = queue.Queue(maxsize=capacidad or 2 * hilos)
+        self._candado = threading.Lock()
+        self._errores = []
+        self._directorios = set()
+        self._hilos = [threading.Thread(target=self._vaciar, daemon=True)
+                       for _ in range(hilos)]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def _vaciar(self):
+        while True:
+            tarea = self._cola.get()
+            try:
+                if tarea is None:
+                    return
+                funcion, args = tarea
+                rutas = funcion(*args)
+                # Persistir cada archivo antes de darlo por escrito
+                for ruta in rutas:
+                    with open(ruta, 'rb') as f:
+                        os.fsync(f.fileno())
+                with self._candado:
+                    self._directorios.update(os.path.dirname(r) for r in rutas)
+            except Exception as e:
+                with self._candado:
+                    self._errores.append(e)
+            finally:
+                self._cola.task_done()
+
+    def enviar(self, funcion, *args):
+        """Encola funcion(*args), que debe devolver la lista de rutas escritas."""
+        self._cola.put((funcion, args))
+
+    def esperar(self):
+        """
+        Barrera: espera a que se vacíe la cola, sincroniza los directorios con
+        disco y relanza el primer error de escritura.
+        """
+        self._cola.join()
+        with self._candado:
+            directorios, self._directorios = self._directorios, set()
+            errores, self._errores = self._errores, []
+        for directorio in directorios:
+            try:
+                fd = os.open(directorio, os.O_RDONLY)
+            except OSError:
+                continue  # p. ej. Windows: los directorios no se pueden abrir
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+        if errores:
+            raise errores[0]
+
+    def cerrar(self):
+        """Barrera final y parada de los hilos escritores."""
+        try:
+            self.esperar()
+        finally:
+            for _ in self._hilos:
+                self._cola.put(None)
+            for hilo in self._hilos:
+                hilo.join()
+
+class AlmacenCarpetas:
+    """
+    Disposición original: una carpeta iteracion_XXXX por experimento con
+    imagen_modificada.png y parametros_resultados.json.
+
+    Con cronómetro se miden las escrituras y el JSON incluye los tiempos por
+    etapa del experimento (la escritura del propio JSON no figura en él).
+    Con escritor, imagen y JSON se escriben en segundo plano y la etapa
+    Escritura_PNG mide solo la espera del cálculo por la cola.
+    """
+    modo = 'carpetas'
+    requiere_imagen = True
+
+    def __init__(self, output_dir, cronometro=None, escritor=None, formato_imagen='png',
+                 compresion_png=None):
+        self.output_dir = output_dir
+        self.cronometro = cronometro
+        self.escritor = escritor
+        self.formato_imagen = formato_imagen
+        self._parametros_png = ([] if compresion_png is None
+                                else [cv2.IMWRITE_PNG_COMPRESSION, int(compresion_png)])
+
+    def _escribir_imagen(self, carpeta_iteracion, imagen, ruta_imagen_cache):
+        """Escribe imagen_modificada en el formato configurado; devuelve las rutas escritas."""
+        # Sin imagen ni caché: ya escrita con crear_imagen_mapeada
+        if imagen is None and ruta_imagen_cache is None:
+            return []
+        ruta_imagen = os.path.join(carpeta_iteracion,
+                                   "imagen_modificada" + FORMATOS_IMAGEN[self.formato_imagen])
+        if ruta_imagen_cache is not None and self.formato_imagen == 'png':
+            shutil.copyfile(ruta_imagen_cache, ruta_imagen)
+            return [ruta_imagen]
+        if imagen is None:
+            imagen = cv2.imread(str(ruta_imagen_cache), cv2.IMREAD_UNCHANGED)
+        if self.formato_imagen == 'raw':
+            np.save(ruta_imagen, imagen)
+        elif not cv2.imwrite(ruta_imagen, imagen,
+                             self._parametros_png if self.formato_imagen == 'png' else []):
+            raise OSError(f"No se pudo escribir {ruta_imagen}")
+        return [ruta_imagen]
+
+    def _escribir_json(self, carpeta_iteracion, datos_json):
+        ruta_json = os.path.join(carpeta_iteracion, "parametros_resultados.json")
+        with open(ruta_json, 'w', encoding='utf-8') as f:
+            json.dump(datos_json, f, indent=4, ensure_ascii=False)
+        return [ruta_json]
+
+    def _escribir(self, carpeta_iteracion, imagen, ruta_imagen_cache, datos_json):
+        """Tarea del escritor: la imagen primero y el JSON al final."""
+        return (self._escribir_imagen(carpeta_iteracion, imagen, ruta_imagen_cache)
+                + self._escribir_json(carpeta_iteracion, datos_json))
+
+    def guardar(self, fila, imagen=None, ruta_imagen_cache=None):
+        """Guarda la imagen (o copia su PNG en caché) y el JSON del experimento."""
+        id_experimento = fila['ID_Experimento']
+
+        # Crear carpeta de iteración
+        carpeta_iteracion = os.path.join(self.output_dir, f"iteracion_{id_experimento:04d}")
+        os.makedirs(carpeta_iteracion, exist_ok=True)
+
+        # Parámetros y métricas para el JSON
+        datos_json = {
+            'ID_Experimento': id_experimento,
+            'Imagen_Original': fila['Imagen_Original'],
+            'ClipLimit': float(fila['ClipLimit']),
+            'TileSize': int(fila['TileSize']),
+            'Metricas': {metrica.columna: float(fila[metrica.columna])
+                         for metrica in METRICAS.values() if metrica.columna in fila}
+        }
+
+        if self.escritor is not None:
+            if self.cronometro is not None:
+                datos_json['Tiempos'] = self.cronometro.columnas(id_experimento)
+            with medir(self.cronometro, 'Escritura_PNG', id_experimento):
+                self.escritor.enviar(self._escribir, carpeta_iteracion, imagen,
+                                     ruta_imagen_cache, datos_json)
+            return
+
+        # 1. Guardar imagen modificada
+        with medir(self.cronometro, 'Escritura_PNG', id_experimento):
+            self._escribir_imagen(carpeta_iteracion, imagen, ruta_imagen_cache)
+        if self.cronometro is not None:
+            datos_json['Tiempos'] = self.cronometro.columnas(id_experimento)
+
+        # 2. Guardar parámetros y métricas en JSON
+        with medir(self.cronometro, 'Escritura_JSON', id_experimento):
+            self._escribir_json(carpeta_iteracion, datos_json)
+
+    def crear_imagen_mapeada(self, id_experimento, forma, dtype=np.uint8):
+        """
+        Crea iteracion_XXXX/imagen_modificada.npy mapeado en memoria para que
+        el procesamiento por franjas escriba la salida sin tenerla completa en RAM.
+        """
+        carpeta_iteracion = os.path.join(self.output_dir, f"iteracion_{id_experimento:04d}")
+        os.makedirs(carpeta_iteracion, exist_ok=True)
+        return np.lib.format.open_memmap(os.path.join(carpeta_iteracion, NOMBRE_NPY),
+                                         mode='w+', dtype=dtype, shape=forma)
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.cerrar()
+
+class AlmacenColumnar:
+    """
+    Métricas en un único archivo columnar (resultados_maestros.parquet) e
+    imágenes agrupadas en bloques NPZ sin comprimir dentro de imagenes/.
+
+    Cada bloque se nombra con el primer ID que contiene, por lo que varios
+    procesos pueden escribir bloques en paralelo sin colisiones. El índice
+    ID → bloque se genera al finalizar el barrido (ver finalizar_almacen).
+    Con escritor, los bloques se vuelcan en segundo plano.
+    """
+    modo = 'columnar'
+    requiere_imagen = True
+
+    def __init__(self, output_dir, bytes_por_bloque=256 * 1024 ** 2, escritor=None):
+        self.directorio = os.path.join(output_dir, DIR_IMAGENES)
+        self.bytes_por_bloque = bytes_por_bloque
+        self.escritor = escritor
+        os.makedirs(self.directorio, exist_ok=True)
+        self._pendientes = {}
+        self._bytes = 0
+
+    def guardar(self, fila, imagen=None, ruta_imagen_cache=None):
+        """Añade la imagen del experimento al bloque en curso."""
+        if imagen is None:
+            imagen = cv2.imread(str(ruta_imagen_cache), cv2.IMREAD_UNCHANGED)
+        self._pendientes[int(fila['ID_Experimento'])] = imagen
+        self._bytes += imagen.nbytes
+        if self._bytes >= self.bytes_por_bloque:
+            self._volcar()
+
+    def _escribir_bloque(self, pendientes):
+        primero = min(pendientes)
+        ruta = os.path.join(self.directorio, f"bloque_{primero:06d}.npz")
+        tmp = os.path.join(self.directorio, f"bloque_{primero:06d}.tmp.npz")
+        np.savez(tmp, **{f"id_{i:06d}": img for i, img in pendientes.items()})
+        os.replace(tmp, ruta)
+        return [ruta]
+
+    def _volcar(self):
+        if not self._pendientes:
+            return
+        if self.escritor is not None:
+            self.escritor.enviar(self._escribir_bloque, self._pendientes)
+        else:
+            self._escribir_bloque(self._pendientes)
+        self._pendientes = {}
+        self._bytes = 0
+
+    def cerrar(self):
+        self._volcar()
+        if self.escritor is not None:
+            self.escritor.cerrar()
+
+class AlmacenSoloMetricas:
+    """Solo la tabla maestra: no se guardan imágenes ni archivos por experimento."""
+    modo = 'solo_metricas'
+    requiere_imagen = False
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def guardar(self, fila, imagen=None, ruta_imagen_cache=None):
+        pass
+
+    def cerrar(self):
+        pass
+
+def crear_almacen(modo, output_dir, cronometro=None, hilos_escritura=0, formato_imagen='png',
+                  compresion_png=None):
+    """
+    Crea el almacén de resultados para el modo de salida indicado.
+
+    Args:
+        hilos_escritura: Hilos del escritor en segundo plano (0 = escritura
+            síncrona). cerrar() actúa como barrera: todo queda escrito y
+            sincronizado con disco antes de devolver
+        formato_imagen: 'png', 'tiff' o 'raw' (.npy sin comprimir), modo carpetas
+        compresion_png: Nivel de compresión PNG 0-9 (None = el de OpenCV)
+    """
+    if formato_imagen not in FORMATOS_IMAGEN:
+        raise ValueError(f"Formato de imagen desconocido: {formato_imagen} "
+                         f"(opciones: {tuple(FORMATOS_IMAGEN)})")
+    escritor = None
+    if hilos_escritura and modo != 'solo_metricas':
+        escritor = EscritorAsincrono(hilos_escritura)
+    if modo == 'carpetas':
+        return AlmacenCarpetas(output_dir, cronometro, escritor, formato_imagen, compresion_png)
+    if modo == 'columnar':
+        return AlmacenColumnar(output_dir, escritor=escritor)
+    if modo == 'solo_metricas':
+        return AlmacenSoloMetricas(output_dir)
+    raise ValueError(f"Modo de almacenamiento desconocido: {modo} "
+                     f"(opciones: {MODOS_ALMACENAMIENTO})")
+
+def preparar_almacen(modo, output_dir, reanudar=False):
+    """
+    Registra el modo en el manifiesto y elimina bloques de ejecuciones previas
+    (salvo al reanudar un barrido, cuyos bloques siguen siendo válidos).
+    """
+    if modo == 'columnar' and not reanudar:
+        directorio = Path(output_dir) / DIR_IMAGENES
+        if directorio.exists():
+            for bloque in directorio.glob("bloque_*.npz"):
+                bloque.unlink()
+
+    with open(os.path.join(output_dir, NOMBRE_MANIFIESTO), 'w', encoding='utf-8') as f:
+        json.dump({'modo': modo}, f, indent=4)
+
+def finalizar_almacen(modo, output_dir, tabla):
+    """
+    Escribe la tabla maestra: siempre en CSV y, en modo columnar, también en
+    Parquet junto con el índice ID → bloque de imágenes.
+
+    Args:
+        tabla: DataFrame o iterable de DataFrames con bloques consecutivos de
+            la tabla, que se escriben a medida que llegan (las columnas y tipos
+            son los del primer bloque)
+
+    Returns:
+        Ruta del CSV maestro
+    """
+    bloques = [tabla] if hasattr(tabla, 'to_csv') else tabla
+    pq = None
+    if modo == 'columnar':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("  ✗ Parquet no disponible (instalar pyarrow); solo se escribe el CSV")
+
+    ruta_csv = os.path.join(output_dir, NOMBRE_CSV)
+    columnas = None
+    escritor_parquet = None
+    try:
+        for bloque in bloques:
+            if columnas is None:
+                columnas = list(bloque.columns)
+                bloque.to_csv(ruta_csv, index=False, encoding='utf-8')
+                if pq is not None:
+                    esquema = pa.Schema.from_pandas(bloque, preserve_index=False)
+                    escritor_parquet = pq.ParquetWriter(
+                        os.path.join(output_dir, NOMBRE_PARQUET), esquema)
+            else:
+                bloque = bloque.reindex(columns=columnas)
+                bloque.to_csv(ruta_csv, mode='a', header=False, index=False, encoding='utf-8')
+            if escritor_parquet is not None:
+                escritor_parquet.write_table(pa.Table.from_pandas(
+                    bloque, schema=escritor_parquet.schema, preserve_index=False))
+    finally:
+        if escritor_parquet is not None:
+            escritor_parquet.close()
+    if columnas is None:
+        # Sin experimentos: CSV vacío
+        open(ruta_csv, 'w', encoding='utf-8').close()
+
+    if modo == 'columnar':
+        directorio = os.path.join(output_dir, DIR_IMAGENES)
+        indice = {}
+        for bloque in sorted(Path(directorio).glob("bloque_*.npz")):
+            with zipfile.ZipFile(bloque) as z:
+                for nombre in z.namelist():
+                    indice[str(int(nombre[3:-4]))] = bloque.name
+        with open(os.path.join(directorio, NOMBRE_INDICE), 'w', encoding='utf-8') as f:
+            json.dump(indice, f)
+
+    return ruta_csv
+
+def leer_modo_almacen(resultados_dir):
+    """Modo de almacenamiento de un directorio de resultados ('carpetas' si no consta)."""
+    try:
+        with open(os.path.join(resultados_dir, NOMBRE_MANIFIESTO), 'r', encoding='utf-8') as f:
+            return json.load(f)['modo']
+    except (OSError, ValueError, KeyError):
+        return 'carpetas'
+
+@lru_cache(maxsize=8)
+def _indice_imagenes(resultados_dir):
+    ruta = os.path.join(resultados_dir, DIR_IMAGENES, NOMBRE_INDICE)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def cargar_imagen_experimento(resultados_dir, exp_id):
+    """
+    Carga la imagen CLAHE de un experimento con independencia del modo de
+    almacenamiento. Devuelve None si no se guardó (modo solo_metricas).
+    """
+    ruta_png = os.path.join(resultados_dir, f"iteracion_{exp_id:04d}", "imagen_modificada.png")
+    if os.path.exists(ruta_png):
+        return cv2.imread(ruta_png, cv2.IMREAD_UNCHANGED)
+    ruta_tiff = os.path.join(resultados_dir, f"iteracion_{exp_id:04d}", "imagen_modificada.tiff")
+    if os.path.exists(ruta_tiff):
+        return cv2.imread(ruta_tiff, cv2.IMREAD_UNCHANGED)
+
+    # Salidas del procesamiento por franjas o en formato 'raw': mapeadas en memoria
+    ruta_npy = os.path.join(resultados_dir, f"iteracion_{exp_id:04d}", NOMBRE_NPY)
+    if os.path.exists(ruta_npy):
+        return np.load(ruta_npy, mmap_mode='r')
+
+    bloque = _indice_imagenes(os.path.normpath(resultados_dir)).get(str(exp_id))
+    if bloque is None:
+        return None
+    with np.load(os.path.join(resultados_dir, DIR_IMAGENES, bloque)) as datos:
+        return datos[f"id_{exp_id:06d}"]
@@ -1,35 +1,325 @@
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import cv2
 import os
 from pathlib import Path
 import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from functools import lru_cache
+from pandas.api.types import union_categoricals
 
-# Configuración de estilo para gráficos
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
+from almacenamiento import DIR_IMAGENES, cargar_imagen_experimento, leer_modo_almacen
+from entrada_mapeada import abrir_imagen_mapeada
+from secuencias import DIR_FOTOGRAMAS_CLAVE
+from registro_metricas import METRICAS
+from seleccion_pareto import optimos_por_imagen, rangos_pareto
 
-def cargar_datos_maestros(ruta_csv):
-    """A. CARGA DE DATOS - Cargar archivo CSV maestro."""
-    print("=" * 70)
-    print("ANÁLISIS DE RESULTADOS CLAHE")
-    print("=" * 70)
-    
-    if not os.path.exists(ruta_csv):
+# Métrica de ordenamiento por defecto (si no está en la tabla, la primera presente)
+METRICA_PRINCIPAL = 'Contraste_Local_Promedio'
+
+# Evaluación cualitativa del reporte cuando una métrica supera su percentil
+# 75 (o no); las métricas sin texto propio usan uno genérico con su etiqueta
+EVALUACION_CUALITATIVA = {
+    'Contraste_Local_Promedio': ("Excelente contraste local - Delimitación clara de estructuras",
+                                 "Contraste local moderado"),
+    'Nitidez_Borde': ("Alta nitidez de bordes - Estructuras bien definidas",
+                      "Nitidez de bordes moderada"),
+    'Entropia': ("Alta entropía - Rica distribución de intensidades", "Entropía moderada"),
+}
+
+# Filas leídas por bloque al cargar la tabla maestra
+FILAS_POR_BLOQUE = 500_000
+
+# Mejores filas por métrica que se conservan en los agregados (preselección y
+# reporte) y puntos como máximo del gráfico de dispersión 3D
+MEJORES_POR_METRICA = 100
+MUESTRA_DISPERSION = 20_000
+BINS_HISTOGRAMA = 20
+
+# Clave de cada métrica en parametros_optimos.json (por defecto, la columna
+# en minúsculas)
+CLAVES_JSON = {'Contraste_Local_Promedio': 'contraste_local'}
+
+# Columnas que se guardan de las filas del frente de Pareto de cada imagen,
+# además de sus métricas
+COLUMNAS_FRENTE = ['ID_Experimento', 'Imagen_Original', 'ClipLimit', 'TileSize']
+
+# Incrementar cuando cambie el contenido de los agregados: invalida la caché
+VERSION_AGREGADOS = 3
+
+# Resolución de los gráficos (final y de vista previa) y manifiesto con el
+# hash de las entradas de cada uno; incrementar VERSION_GRAFICOS al cambiar
+# su aspecto para que se vuelvan a dibujar
+DPI_GRAFICOS = 300
+DPI_VISTA_PREVIA = 72
+VERSION_GRAFICOS = 1
+NOMBRE_MANIFIESTO_GRAFICOS = "manifiesto_graficos.json"
+
+# Imágenes originales que se buscan en data_dir para el reporte visual
+EXTENSIONES_ORIGINALES = ['.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.npy', '.raw']
+
+# Lado mayor de las miniaturas del reporte y memoria máxima de su caché
+LADO_MINIATURA = 384
+CAPACIDAD_MINIATURAS_MB = 64
+
+def _ruta_tabla(ruta_csv):
+    """Tabla maestra a leer: el Parquet (modo 'columnar') si existe y puede leerse, o el CSV."""
+    ruta_parquet = os.path.splitext(ruta_csv)[0] + ".parquet"
+    if os.path.exists(ruta_parquet):
+        try:
+            import pyarrow.parquet  # noqa: F401
+            return ruta_parquet
+        except ImportError:
+            pass
+    return ruta_csv
+
+def _tipos_compactos(muestra):
+    """
+    Tipos compactos por columna a partir de las primeras filas: texto como
+    categoría y reales en float32. ClipLimit se mantiene en float64 para
+    agrupar por el valor exacto de α.
+    """
+    tipos = {}
+    for columna, tipo in muestra.dtypes.items():
+        if columna == 'ClipLimit':
+            continue
+        if pd.api.types.is_object_dtype(tipo) or pd.api.types.is_string_dtype(tipo):
+            tipos[columna] = 'category'
+        elif pd.api.types.is_float_dtype(tipo):
+            tipos[columna] = 'float32'
+    return tipos
+
+def _bloques_tabla(ruta, filas_por_bloque):
+    """Genera la tabla maestra (CSV o Parquet) por bloques con tipos compactos."""
+    if ruta.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        tipos = None
+        for lote in pq.ParquetFile(ruta).iter_batches(batch_size=filas_por_bloque):
+            bloque = lote.to_pandas()
+            if tipos is None:
+                tipos = _tipos_compactos(bloque)
+            yield bloque.astype(tipos)
+    else:
+        tipos = _tipos_compactos(pd.read_csv(ruta, nrows=1000))
+        yield from pd.read_csv(ruta, dtype=tipos, chunksize=filas_por_bloque)
+
+def _concatenar_bloques(bloques):
+    """Concatena bloques conservando las columnas categóricas (categorías unificadas)."""
+    for columna in bloques[0].columns:
+        if isinstance(bloques[0][columna].dtype, pd.CategoricalDtype):
+            categorias = union_categoricals([b[columna] for b in bloques]).categories
+            for bloque in bloques:
+                bloque[columna] = bloque[columna].cat.set_categories(categorias)
+    return pd.concat(bloques, ignore_index=True)
+
+def cargar_datos_maestros(ruta_csv, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    A. CARGA DE DATOS - Cargar la tabla maestra por bloques con tipos compactos.
+    
+    Los nombres de imagen se cargan como categoría y las métricas y tiempos
+    en float32, lo que reduce varias veces la memoria con millones de filas.
+    """
+    ruta_tabla = _ruta_tabla(ruta_csv)
+    if not os.path.exists(ruta_tabla):
         print(f"✗ Error: No se encuentra el archivo {ruta_csv}")
         return None
     
-    df = pd.read_csv(ruta_csv)
-    print(f"\n✓ Datos cargados exitosamente: {ruta_csv}")
+    bloques = list(_bloques_tabla(ruta_tabla, filas_por_bloque))
+    df = _concatenar_bloques(bloques) if bloques else pd.read_csv(ruta_tabla)
+    del bloques
+    
+    print(f"\n✓ Datos cargados exitosamente: {ruta_tabla}")
     print(f"✓ Total de experimentos: {len(df)}")
+    print(f"✓ Memoria de la tabla: {df.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB")
     print(f"✓ Columnas disponibles: {list(df.columns)}")
     
     return df
 
-def preseleccion_objetiva(df, metrica_principal='Contraste_Local_Promedio', top_n=10):
-    """B. PRESELECCIÓN OBJETIVA - Ordenar y filtrar mejores resultados."""
+def _a_json(valor):
+    """Convierte escalares de NumPy para json.dump."""
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def metricas_presentes(columnas):
+    """Columnas de métricas del registro presentes en la tabla, en el orden del registro."""
+    return [m.columna for m in METRICAS.values() if m.columna in columnas]
+
+def _etiqueta(columna):
+    """Etiqueta de consola de la métrica con esa columna."""
+    return next((m.etiqueta for m in METRICAS.values() if m.columna == columna), columna)
+
+def calcular_agregados(df, mejores_por_metrica=MEJORES_POR_METRICA,
+                       muestra_maxima=MUESTRA_DISPERSION):
+    """
+    Calcula todo lo que necesitan los gráficos y el reporte en una pasada:
+    medias por (ω, α) en una sola agrupación, histogramas, percentil 75,
+    las mejores filas por métrica y una muestra para la dispersión 3D.
+    
+    Returns:
+        Diccionario serializable en JSON (ver agregados_desde_datos)
+    """
+    metricas = metricas_presentes(df.columns)
+    medias = df.groupby(['TileSize', 'ClipLimit'], observed=True)[metricas].mean()
+    
+    histogramas = {}
+    for metrica in metricas:
+        # Sin NaN ni infinitos (PSNR de una salida idéntica a la original)
+        valores = df[metrica].to_numpy(dtype=np.float64)
+        valores = valores[np.isfinite(valores)]
+        conteos, bordes = np.histogram(valores, bins=BINS_HISTOGRAMA)
+        histogramas[metrica] = {'conteos': conteos.tolist(), 'bordes': bordes.tolist(),
+                                'media': float(valores.mean()) if len(valores) else None}
+    
+    # Rango de Pareto de cada fila dentro de su imagen (0 = frente), sobre
+    # las métricas presentes en la tabla
+    frente = None
+    if 'Imagen_Original' in df.columns and metricas:
+        rangos = rangos_pareto(df, metricas)
+        frente = df.loc[rangos == 0, COLUMNAS_FRENTE + metricas]
+    
+    indices = set()
+    for metrica in metricas:
+        indices.update(df[metrica].nlargest(mejores_por_metrica).index)
+    mejores = df.loc[sorted(indices)]
+    if frente is not None:
+        mejores = mejores.assign(Rango_Pareto=rangos.loc[mejores.index])
+    
+    muestra = df[['ClipLimit', 'TileSize'] + metricas]
+    if len(muestra) > muestra_maxima:
+        muestra = muestra.sample(n=muestra_maxima, random_state=0).sort_index()
+    
+    datos = {
+        'total': len(df),
+        'metricas': metricas,
+        'medias': medias.reset_index().to_dict('list'),
+        'histogramas': histogramas,
+        'cuantil_75': df[metricas].quantile(0.75).to_dict(),
+        'mejores': mejores.to_dict('list'),
+        'muestra': muestra.to_dict('list'),
+        'rangos_pareto': (None if frente is None
+                          else {str(r): int(n) for r, n in rangos.value_counts().sort_index().items()})
+    }
+    # Normalizar a tipos de Python (mismo resultado con y sin caché)
+    datos = json.loads(json.dumps(datos, default=_a_json))
+    # El frente puede tener millones de filas: se guarda aparte en binario
+    datos['frente_pareto'] = None if frente is None else frente.reset_index(drop=True)
+    return datos
+
+def agregados_desde_datos(datos):
+    """
+    Reconstruye los DataFrames de los agregados (medias, mejores filas y
+    muestra); frente_pareto ya es un DataFrame (o None).
+    """
+    agregados = dict(datos)
+    agregados['medias'] = pd.DataFrame(datos['medias']).set_index(['TileSize', 'ClipLimit'])
+    agregados['mejores'] = pd.DataFrame(datos['mejores'])
+    agregados['muestra'] = pd.DataFrame(datos['muestra'])
+    return agregados
+
+def _guardar_columnas(ruta, df):
+    """Guarda un DataFrame en .npz por columnas (el texto como códigos + categorías)."""
+    columnas = {}
+    for columna in df.columns:
+        if pd.api.types.is_numeric_dtype(df[columna]):
+            columnas[f"valores:{columna}"] = df[columna].to_numpy()
+        else:
+            codigos, categorias = pd.factorize(df[columna])
+            columnas[f"codigos:{columna}"] = codigos.astype(np.int32)
+            columnas[f"categorias:{columna}"] = np.asarray(categorias, dtype=str)
+    ruta_temporal = f"{ruta}.{os.getpid()}.tmp.npz"
+    np.savez(ruta_temporal, **columnas)
+    os.replace(ruta_temporal, ruta)
+
+def _cargar_columnas(ruta):
+    """DataFrame guardado con _guardar_columnas."""
+    with np.load(ruta) as archivo:
+        columnas = {}
+        for nombre in archivo.files:
+            tipo, columna = nombre.split(':', 1)
+            if tipo == 'valores':
+                columnas[columna] = archivo[nombre]
+            elif tipo == 'codigos':
+                columnas[columna] = pd.Categorical.from_codes(
+                    archivo[nombre], archivo[f"categorias:{columna}"])
+    return pd.DataFrame(columnas)
+
+def _firma_tabla(ruta_tabla, mejores_por_metrica, muestra_maxima):
+    """Identifica una versión de la tabla y de los parámetros de los agregados."""
+    estado = os.stat(ruta_tabla)
+    return {'tabla': os.path.abspath(ruta_tabla), 'tamano': estado.st_size,
+            'modificacion_ns': estado.st_mtime_ns, 'version': VERSION_AGREGADOS,
+            'mejores_por_metrica': mejores_por_metrica, 'muestra_maxima': muestra_maxima}
+
+def obtener_agregados(ruta_csv, filas_por_bloque=FILAS_POR_BLOQUE,
+                      mejores_por_metrica=MEJORES_POR_METRICA,
+                      muestra_maxima=MUESTRA_DISPERSION):
+    """
+    Agregados de la tabla maestra, leídos de la caché junto a la tabla
+    (<tabla>.agregados.json) si esta no ha cambiado (tamaño y fecha de
+    modificación), o calculados con una carga compacta y guardados.
+    
+    Returns:
+        Diccionario de agregados (ver calcular_agregados), o None si no
+        existe la tabla
+    """
+    ruta_tabla = _ruta_tabla(ruta_csv)
+    if not os.path.exists(ruta_tabla):
+        print(f"✗ Error: No se encuentra el archivo {ruta_csv}")
+        return None
+    
+    firma = _firma_tabla(ruta_tabla, mejores_por_metrica, muestra_maxima)
+    ruta_cache = os.path.splitext(ruta_tabla)[0] + ".agregados.json"
+    try:
+        with open(ruta_cache, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        datos = None
+    
+    ruta_frente = os.path.splitext(ruta_tabla)[0] + ".frente_pareto.npz"
+    if datos is not None and datos.get('firma') == firma:
+        try:
+            datos['frente_pareto'] = (None if datos['rangos_pareto'] is None
+                                      else _cargar_columnas(ruta_frente))
+        except (OSError, ValueError, KeyError):
+            datos = None
+    if datos is not None and datos.get('firma') == firma:
+        print(f"\n✓ Agregados en caché (tabla sin cambios): {ruta_cache}")
+        print(f"✓ Total de experimentos: {datos['total']}")
+        return agregados_desde_datos(datos)
+    
+    df = cargar_datos_maestros(ruta_csv, filas_por_bloque)
+    datos = calcular_agregados(df, mejores_por_metrica, muestra_maxima)
+    del df
+    datos['firma'] = firma
+    
+    # Escritura atómica: otra ejecución nunca lee una caché a medias. El JSON
+    # (con la firma) se escribe el último y valida también el frente.
+    frente = datos.pop('frente_pareto')
+    if frente is not None:
+        _guardar_columnas(ruta_frente, frente)
+    ruta_temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(ruta_temporal, ruta_cache)
+    datos['frente_pareto'] = frente
+    print(f"✓ Agregados guardados en: {ruta_cache}")
+    
+    return agregados_desde_datos(datos)
+
+def preseleccion_objetiva(df, metrica_principal=METRICA_PRINCIPAL, top_n=10):
+    """
+    B. PRESELECCIÓN OBJETIVA - Ordenar y filtrar mejores resultados.
+    
+    Raises:
+        ValueError: Si metrica_principal no es una columna de df
+    """
+    if metrica_principal not in df.columns:
+        raise ValueError(f"La métrica principal {metrica_principal} no está en la tabla "
+                         f"(disponibles: {metricas_presentes(df.columns)})")
     print(f"\n{'─' * 70}")
     print(f"PRESELECCIÓN OBJETIVA - Top {top_n} según {metrica_principal}")
     print(f"{'─' * 70}")
@@ -42,9 +332,8 @@ def preseleccion_objetiva(df, metrica_principal='Contraste_Local_Promedio', top_
     print("─" * 70)
     
     # Mostrar tabla formateada
-    columnas_mostrar = ['ID_Experimento', 'ClipLimit', 'TileSize', 
-                        'Entropia', 'Contraste_Local_Promedio', 
-                        'Nitidez_Borde', 'Contraste_Michelson']
+    columnas_mostrar = (['ID_Experimento', 'ClipLimit', 'TileSize']
+                        + metricas_presentes(top_resultados.columns) + ['Rango_Pareto'])
     
     # Filtrar columnas que existan en el DataFrame
     columnas_existentes = [col for col in columnas_mostrar if col in top_resultados.columns]
@@ -57,58 +346,58 @@ def preseleccion_objetiva(df, metrica_principal='Contraste_Local_Promedio', top_
     
     return top_resultados
 
-def visualizar_relaciones_parametros(df, output_dir):
-    """C. VISUALIZACIÓN DE RESULTADOS - Gráficos de dispersión y mapas de calor."""
-    print(f"\n{'─' * 70}")
-    print("GENERANDO VISUALIZACIONES")
-    print(f"{'─' * 70}")
-    
-    # Crear directorio para gráficos
-    graficos_dir = os.path.join(output_dir, "graficos_analisis")
-    os.makedirs(graficos_dir, exist_ok=True)
-    
-    metricas = ['Entropia', 'Contraste_Local_Promedio', 'Nitidez_Borde', 'Contraste_Michelson']
-    metricas_existentes = [m for m in metricas if m in df.columns]
-    
-    # 1. MAPAS DE CALOR para cada métrica
-    print("\n1. Generando mapas de calor (α vs ω)...")
-    
-    for metrica in metricas_existentes:
-        plt.figure(figsize=(10, 8))
-        
-        # Crear tabla pivote
-        pivot_table = df.pivot_table(
-            values=metrica,
-            index='TileSize',
-            columns='ClipLimit',
-            aggfunc='mean'
-        )
-        
-        # Crear mapa de calor
-        sns.heatmap(pivot_table, annot=True, fmt='.3f', cmap='YlOrRd', 
-                    cbar_kws={'label': metrica})
-        plt.title(f'Mapa de Calor: {metrica}\n(α: ClipLimit, ω: TileSize)', 
-                  fontsize=14, fontweight='bold')
-        plt.xlabel('Clip Limit (α)', fontsize=12)
-        plt.ylabel('Tile Size (ω)', fontsize=12)
-        plt.tight_layout()
-        
-        # Guardar
-        filename = f"heatmap_{metrica.lower()}.png"
-        plt.savefig(os.path.join(graficos_dir, filename), dpi=300, bbox_inches='tight')
-        plt.close()
-        print(f"  ✓ {filename}")
-    
-    # 2. GRÁFICOS DE DISPERSIÓN 3D (Clip Limit vs Tile Size vs Métrica)
-    print("\n2. Generando gráficos de dispersión 3D...")
-    
-    fig = plt.figure(figsize=(16, 12))
+@lru_cache(maxsize=None)
+def _pyplot():
+    """
+    (pyplot, seaborn) con el estilo de los gráficos. Se importan al dibujar el
+    primer gráfico, no al importar el módulo.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
+    # Configuración de estilo para gráficos
+    plt.style.use('seaborn-v0_8-darkgrid')
+    sns.set_palette("husl")
+    return plt, sns
+
+def _cuadricula(plt, n, **kwargs):
+    """Figura con una cuadrícula de dos columnas para n métricas (ejes sobrantes ocultos)."""
+    columnas = 2 if n > 1 else 1
+    filas = max(-(-n // columnas), 1)
+    fig, axes = plt.subplots(filas, columnas, figsize=(16, 6 * filas), squeeze=False, **kwargs)
+    axes = axes.flatten()
+    for ax in axes[n:]:
+        ax.set_visible(False)
+    return fig, axes
+
+def _grafico_mapa_calor(ruta, dpi, metrica, indice, columnas, valores):
+    """Mapa de calor de la media de una métrica por (ω, α)."""
+    plt, sns = _pyplot()
+    plt.figure(figsize=(10, 8))
+    
+    pivot_table = pd.DataFrame(valores, index=pd.Index(indice, name='TileSize'),
+                               columns=pd.Index(columnas, name='ClipLimit'))
+    
+    # Crear mapa de calor
+    sns.heatmap(pivot_table, annot=True, fmt='.3f', cmap='YlOrRd', 
+                cbar_kws={'label': metrica})
+    plt.title(f'Mapa de Calor: {metrica}\n(α: ClipLimit, ω: TileSize)', 
+              fontsize=14, fontweight='bold')
+    plt.xlabel('Clip Limit (α)', fontsize=12)
+    plt.ylabel('Tile Size (ω)', fontsize=12)
+    plt.tight_layout()
+    plt.savefig(ruta, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+def _grafico_dispersion_3d(ruta, dpi, metricas, alpha, omega, valores):
+    """Dispersión 3D (α, ω, métrica) de la muestra de experimentos."""
+    plt, _ = _pyplot()
+    fig, axes = _cuadricula(plt, len(metricas), subplot_kw={'projection': '3d'})
     
-    for idx, metrica in enumerate(metricas_existentes, 1):
-        ax = fig.add_subplot(2, 2, idx, projection='3d')
+    for ax, metrica in zip(axes, metricas):
         
-        scatter = ax.scatter(df['ClipLimit'], df['TileSize'], df[metrica],
-                            c=df[metrica], cmap='viridis', s=100, alpha=0.6)
+        scatter = ax.scatter(alpha, omega, valores[metrica],
+                            c=valores[metrica], cmap='viridis', s=100, alpha=0.6)
         
         ax.set_xlabel('Clip Limit (α)', fontsize=10)
         ax.set_ylabel('Tile Size (ω)', fontsize=10)
@@ -120,25 +409,19 @@ def visualizar_relaciones_parametros(df, output_dir):
     plt.suptitle('Relación entre Parámetros CLAHE y Métricas de Calidad', 
                  fontsize=16, fontweight='bold', y=0.98)
     plt.tight_layout()
-    plt.savefig(os.path.join(graficos_dir, "scatter_3d_all_metrics.png"), 
-                dpi=300, bbox_inches='tight')
+    plt.savefig(ruta, dpi=dpi, bbox_inches='tight')
     plt.close()
-    print(f"  ✓ scatter_3d_all_metrics.png")
-    
-    # 3. GRÁFICO DE LÍNEAS: Evolución de métricas por Clip Limit
-    print("\n3. Generando gráficos de líneas por Tile Size...")
-    
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-    axes = axes.flatten()
+
+def _grafico_lineas(ruta, dpi, metricas, series):
+    """Evolución de la media de cada métrica con α, una línea por ω."""
+    plt, _ = _pyplot()
+    fig, axes = _cuadricula(plt, len(metricas))
     
-    for idx, metrica in enumerate(metricas_existentes):
+    for idx, metrica in enumerate(metricas):
         ax = axes[idx]
         
-        for tile_size in sorted(df['TileSize'].unique()):
-            df_filtrado = df[df['TileSize'] == tile_size]
-            df_agrupado = df_filtrado.groupby('ClipLimit')[metrica].mean()
-            ax.plot(df_agrupado.index, df_agrupado.values, 
-                   marker='o', linewidth=2, label=f'ω={tile_size}')
+        for tile_size, alphas, medias in series[metrica]:
+            ax.plot(alphas, medias, marker='o', linewidth=2, label=f'ω={tile_size}')
         
         ax.set_xlabel('Clip Limit (α)', fontsize=11)
         ax.set_ylabel(metrica, fontsize=11)
@@ -150,22 +433,22 @@ def visualizar_relaciones_parametros(df, output_dir):
     plt.suptitle('Evolución de Métricas según Clip Limit', 
                  fontsize=16, fontweight='bold')
     plt.tight_layout()
-    plt.savefig(os.path.join(graficos_dir, "lineas_evolucion_metricas.png"), 
-                dpi=300, bbox_inches='tight')
+    plt.savefig(ruta, dpi=dpi, bbox_inches='tight')
     plt.close()
-    print(f"  ✓ lineas_evolucion_metricas.png")
-    
-    # 4. DISTRIBUCIONES: Histogramas de métricas
-    print("\n4. Generando histogramas de distribución...")
-    
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-    axes = axes.flatten()
+
+def _grafico_histogramas(ruta, dpi, metricas, histogramas):
+    """Histogramas precalculados de cada métrica con su media."""
+    plt, _ = _pyplot()
+    fig, axes = _cuadricula(plt, len(metricas))
     
-    for idx, metrica in enumerate(metricas_existentes):
+    for idx, metrica in enumerate(metricas):
         ax = axes[idx]
-        ax.hist(df[metrica], bins=20, color='steelblue', alpha=0.7, edgecolor='black')
-        ax.axvline(df[metrica].mean(), color='red', linestyle='--', 
-                  linewidth=2, label=f'Media: {df[metrica].mean():.3f}')
+        histograma = histogramas[metrica]
+        bordes = histograma['bordes']
+        ax.hist(bordes[:-1], bins=bordes, weights=histograma['conteos'],
+                color='steelblue', alpha=0.7, edgecolor='black')
+        ax.axvline(histograma['media'], color='red', linestyle='--', 
+                  linewidth=2, label=f"Media: {histograma['media']:.3f}")
         ax.set_xlabel(metrica, fontsize=11)
         ax.set_ylabel('Frecuencia', fontsize=11)
         ax.set_title(f'Distribución de {metrica}', fontsize=12, fontweight='bold')
@@ -175,17 +458,267 @@ def visualizar_relaciones_parametros(df, output_dir):
     plt.suptitle('Distribución de Métricas de Calidad', 
                  fontsize=16, fontweight='bold')
     plt.tight_layout()
-    plt.savefig(os.path.join(graficos_dir, "histogramas_distribucion.png"), 
-                dpi=300, bbox_inches='tight')
+    plt.savefig(ruta, dpi=dpi, bbox_inches='tight')
     plt.close()
-    print(f"  ✓ histogramas_distribucion.png")
+
+def _iniciar_proceso_graficos():
+    """Backend sin pantalla en los procesos que dibujan."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+def _renderizar(tarea):
+    funcion, ruta, dpi, entradas = tarea
+    funcion(ruta, dpi, **entradas)
+
+def _hash_grafico(funcion, entradas, dpi):
+    """Hash de las entradas de un gráfico (y de su resolución y versión)."""
+    texto = json.dumps([funcion.__name__, entradas, dpi, VERSION_GRAFICOS],
+                       sort_keys=True, default=_a_json)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def _tareas_graficos(agregados):
+    """
+    Gráficos a generar: (archivo, sección, función, entradas), con entradas
+    serializables que se envían a los procesos y determinan el hash.
+    """
+    metricas = agregados['metricas']
+    medias = agregados['medias']
+    muestra = agregados['muestra']
+    tareas = []
+    
+    # 1. MAPAS DE CALOR para cada métrica
+    for metrica in metricas:
+        pivot_table = medias[metrica].unstack('ClipLimit')
+        tareas.append((f"heatmap_{metrica.lower()}.png", 1, _grafico_mapa_calor, {
+            'metrica': metrica,
+            'indice': pivot_table.index.tolist(),
+            'columnas': pivot_table.columns.tolist(),
+            'valores': pivot_table.to_numpy().tolist()
+        }))
+    
+    # 2. GRÁFICOS DE DISPERSIÓN 3D (Clip Limit vs Tile Size vs Métrica)
+    tareas.append(("scatter_3d_all_metrics.png", 2, _grafico_dispersion_3d, {
+        'metricas': metricas,
+        'alpha': muestra['ClipLimit'].tolist(),
+        'omega': muestra['TileSize'].tolist(),
+        'valores': {m: muestra[m].tolist() for m in metricas}
+    }))
+    
+    # 3. GRÁFICO DE LÍNEAS: Evolución de métricas por Clip Limit
+    series = {}
+    for metrica in metricas:
+        series[metrica] = []
+        for tile_size in medias.index.unique('TileSize'):
+            serie = medias.xs(tile_size, level='TileSize')[metrica]
+            series[metrica].append((int(tile_size), serie.index.tolist(), serie.tolist()))
+    tareas.append(("lineas_evolucion_metricas.png", 3, _grafico_lineas,
+                   {'metricas': metricas, 'series': series}))
+    
+    # 4. DISTRIBUCIONES: Histogramas de métricas
+    tareas.append(("histogramas_distribucion.png", 4, _grafico_histogramas,
+                   {'metricas': metricas, 'histogramas': agregados['histogramas']}))
     
-    print(f"\n✓ Todas las visualizaciones guardadas en: {graficos_dir}")
+    return tareas
+
+def visualizar_relaciones_parametros(df, output_dir, agregados=None, procesos=None,
+                                     vista_previa=False, forzar=False):
+    """
+    C. VISUALIZACIÓN DE RESULTADOS - Gráficos de dispersión y mapas de calor.
+    
+    Los gráficos se construyen a partir de los agregados (obtener_agregados);
+    si no se indican, se calculan a partir de df. Cada gráfico se dibuja en
+    un pool de procesos con un backend sin pantalla, y un manifiesto guarda
+    el hash de sus entradas para no volver a dibujar los que no cambian.
+    
+    Args:
+        procesos: Procesos de dibujo (None = todos los núcleos, 1 = en este proceso)
+        vista_previa: Dibujar a DPI_VISTA_PREVIA en lugar de DPI_GRAFICOS
+        forzar: Dibujar todos los gráficos aunque no hayan cambiado
+    """
+    if agregados is None:
+        agregados = agregados_desde_datos(calcular_agregados(df))
+    
+    print(f"\n{'─' * 70}")
+    print("GENERANDO VISUALIZACIONES")
+    print(f"{'─' * 70}")
+    
+    # Crear directorio para gráficos
+    graficos_dir = os.path.join(output_dir, "graficos_analisis")
+    os.makedirs(graficos_dir, exist_ok=True)
+    
+    dpi = DPI_VISTA_PREVIA if vista_previa else DPI_GRAFICOS
+    ruta_manifiesto = os.path.join(graficos_dir, NOMBRE_MANIFIESTO_GRAFICOS)
+    try:
+        with open(ruta_manifiesto, 'r', encoding='utf-8') as f:
+            manifiesto = json.load(f)
+    except (OSError, ValueError):
+        manifiesto = {}
+    
+    tareas = _tareas_graficos(agregados)
+    pendientes = []
+    for archivo, _, funcion, entradas in tareas:
+        ruta = os.path.join(graficos_dir, archivo)
+        huella = _hash_grafico(funcion, entradas, dpi)
+        if forzar or manifiesto.get(archivo) != huella or not os.path.exists(ruta):
+            pendientes.append((archivo, huella, (funcion, ruta, dpi, entradas)))
+    
+    if len(agregados['muestra']) < agregados['total']:
+        print(f"  (dispersión 3D: muestra de {len(agregados['muestra'])} de "
+              f"{agregados['total']} experimentos)")
+    
+    procesos = min(procesos or os.cpu_count() or 1, len(pendientes))
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos,
+                                 initializer=_iniciar_proceso_graficos) as pool:
+            list(pool.map(_renderizar, [tarea for _, _, tarea in pendientes]))
+    else:
+        for _, _, tarea in pendientes:
+            _renderizar(tarea)
+    
+    for archivo, huella, _ in pendientes:
+        manifiesto[archivo] = huella
+    ruta_temporal = f"{ruta_manifiesto}.{os.getpid()}.tmp"
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2)
+    os.replace(ruta_temporal, ruta_manifiesto)
+    
+    secciones = {1: "Mapas de calor (α vs ω)", 2: "Dispersión 3D",
+                 3: "Líneas por Tile Size", 4: "Histogramas de distribución"}
+    dibujados = {archivo for archivo, _, _ in pendientes}
+    for seccion, titulo in secciones.items():
+        print(f"\n{seccion}. {titulo}:")
+        for archivo, seccion_tarea, _, _ in tareas:
+            if seccion_tarea == seccion:
+                estado = "✓" if archivo in dibujados else "• sin cambios:"
+                print(f"  {estado} {archivo}")
+    
+    print(f"\n✓ {len(pendientes)} gráfico(s) generados a {dpi} DPI, "
+          f"{len(tareas) - len(pendientes)} sin cambios")
+    print(f"✓ Todas las visualizaciones guardadas en: {graficos_dir}")
     
     return graficos_dir
 
-def evaluar_subjetivamente(df, top_ids, resultados_dir, output_dir):
-    """D. EVALUACIÓN SUBJETIVA - Generar reporte visual de las mejores iteraciones."""
+def indexar_imagenes_originales(data_dir):
+    """Índice {nombre de archivo: ruta} de las imágenes originales de data_dir."""
+    data_dir = Path(data_dir)
+    if not data_dir.is_dir():
+        return {}
+    return {f.name: f for f in sorted(data_dir.iterdir())
+            if f.suffix.lower() in EXTENSIONES_ORIGINALES}
+
+def _cargar_original(ruta):
+    """Carga una imagen original (mapeada si es .npy/.raw); None si no se puede leer."""
+    if ruta.suffix.lower() in ('.npy', '.raw'):
+        try:
+            return abrir_imagen_mapeada(ruta)
+        except (OSError, ValueError):
+            return None
+    return cv2.imread(str(ruta), cv2.IMREAD_UNCHANGED)
+
+def miniatura(imagen, lado_maximo=LADO_MINIATURA):
+    """
+    Versión reducida en 8 bits y escala de grises de una imagen, con su lado
+    mayor limitado a lado_maximo (INTER_AREA promedia y no introduce aliasing).
+    """
+    if imagen.ndim == 3:
+        imagen = cv2.cvtColor(np.ascontiguousarray(imagen), cv2.COLOR_BGR2GRAY)
+    escala = lado_maximo / max(imagen.shape[:2])
+    if escala < 1:
+        tamano = (max(1, round(imagen.shape[1] * escala)), max(1, round(imagen.shape[0] * escala)))
+        imagen = cv2.resize(np.asarray(imagen), tamano, interpolation=cv2.INTER_AREA)
+    if imagen.dtype != np.uint8:
+        imagen = (np.asarray(imagen, dtype=np.float32) * (255.0 / np.iinfo(imagen.dtype).max)
+                  if np.issubdtype(imagen.dtype, np.integer)
+                  else np.clip(imagen, 0, 255)).astype(np.uint8)
+    return np.array(imagen)
+
+class CacheMiniaturas:
+    """
+    Caché LRU en memoria de miniaturas decodificadas, acotada en bytes.
+    
+    Cada imagen se decodifica y reduce una sola vez aunque aparezca en varias
+    filas del reporte (p. ej. la misma original); al superar capacidad_mb se
+    descartan las usadas menos recientemente.
+    """
+    
+    def __init__(self, capacidad_mb=CAPACIDAD_MINIATURAS_MB, lado_maximo=LADO_MINIATURA):
+        self.capacidad = capacidad_mb * 1024 ** 2
+        self.lado_maximo = lado_maximo
+        self._entradas = OrderedDict()
+        self._bytes = 0
+    
+    def obtener(self, clave, cargar):
+        """Miniatura de clave; cargar() devuelve la imagen completa (o None) si no está."""
+        if clave in self._entradas:
+            self._entradas.move_to_end(clave)
+            return self._entradas[clave]
+        imagen = cargar()
+        reducida = None if imagen is None else miniatura(imagen, self.lado_maximo)
+        del imagen
+        self._entradas[clave] = reducida
+        self._bytes += 0 if reducida is None else reducida.nbytes
+        while self._bytes > self.capacidad and len(self._entradas) > 1:
+            _, descartada = self._entradas.popitem(last=False)
+            self._bytes -= 0 if descartada is None else descartada.nbytes
+        return reducida
+
+def _guardar_mosaico(filas, ruta, lado=LADO_MINIATURA, margen=8, cabecera=40):
+    """
+    Guarda la comparación Original | CLAHE como un mosaico de miniaturas: una
+    fila (título, original, título, modificada) por experimento. El tamaño de la figura depende
+    solo del número de filas y de `lado`, no de la resolución de las imágenes.
+    """
+    plt, _ = _pyplot()
+    dpi = 100
+    ancho = 2 * lado + 3 * margen
+    alto_fila = cabecera + lado + margen
+    alto = margen + len(filas) * alto_fila
+    mosaico = np.full((alto, ancho), 255, dtype=np.uint8)
+    
+    fig = plt.figure(figsize=(ancho / dpi, (alto + 40) / dpi), dpi=dpi)
+    ax = fig.add_axes([0, 0, 1, alto / (alto + 40)])
+    for fila, celdas in enumerate(filas):
+        y = margen + fila * alto_fila + cabecera
+        for columna, (titulo, imagen, texto) in enumerate(zip(celdas[::2], celdas[1::2],
+                                                             ('No disponible',
+                                                              'Imagen no encontrada'))):
+            x = margen + columna * (lado + margen)
+            ax.text(x + lado / 2, y - cabecera / 2, titulo, ha='center', va='center',
+                    fontsize=9, fontweight='bold')
+            if imagen is None:
+                ax.text(x + lado / 2, y + lado / 2, texto, ha='center', va='center', fontsize=12)
+                continue
+            # Centrar la miniatura en su celda
+            dy, dx = (lado - imagen.shape[0]) // 2, (lado - imagen.shape[1]) // 2
+            mosaico[y + dy:y + dy + imagen.shape[0], x + dx:x + dx + imagen.shape[1]] = imagen
+    
+    ax.imshow(mosaico, cmap='gray', vmin=0, vmax=255, interpolation='nearest')
+    ax.set_xlim(0, ancho)
+    ax.set_ylim(alto, 0)
+    ax.axis('off')
+    fig.suptitle('Comparación Visual: Original vs CLAHE Optimizado', 
+                 fontsize=14, fontweight='bold', y=1 - 10 / (alto + 40), va='top')
+    fig.savefig(ruta, dpi=dpi)
+    plt.close(fig)
+
+def evaluar_subjetivamente(df, top_ids, resultados_dir, output_dir, agregados=None,
+                           data_dir="./data", metrica_principal=METRICA_PRINCIPAL):
+    """
+    D. EVALUACIÓN SUBJETIVA - Generar reporte visual de las mejores iteraciones.
+    
+    Con agregados, df solo necesita contener las filas de top_ids (p. ej.
+    agregados['mejores']): el total y los percentiles salen de los agregados.
+    Cada experimento se compara con su propia imagen original (Imagen_Original
+    en data_dir) en un mosaico de miniaturas. Se muestran las métricas
+    presentes en la tabla, ordenadas por metrica_principal.
+    """
+    metricas = metricas_presentes(df.columns)
+    if agregados is not None:
+        total_experimentos = agregados['total']
+        cuantil_75 = agregados['cuantil_75']
+    else:
+        total_experimentos = len(df)
+        cuantil_75 = df[metricas].quantile(0.75).to_dict()
     print(f"\n{'─' * 70}")
     print(f"EVALUACIÓN SUBJETIVA - Top {len(top_ids)} Iteraciones")
     print(f"{'─' * 70}")
@@ -196,76 +729,53 @@ def evaluar_subjetivamente(df, top_ids, resultados_dir, output_dir):
     
     # Filtrar datos de los top IDs
     df_top = df[df['ID_Experimento'].isin(top_ids)].sort_values(
-        by='Contraste_Local_Promedio', ascending=False
+        by=metrica_principal, ascending=False
     )
-    
-    # Crear figura para comparación visual
-    n_top = len(top_ids)
-    fig, axes = plt.subplots(n_top, 2, figsize=(14, 5 * n_top))
-    
-    if n_top == 1:
-        axes = axes.reshape(1, -1)
-    
+    # Métricas del título de cada miniatura: la principal y la siguiente
+    metricas_titulo = [metrica_principal] + [m for m in metricas if m != metrica_principal][:1]
+    
+    # Índice nombre -> archivo original (una sola vez) y miniaturas en caché;
+    # los fotogramas clave de secuencias están en el directorio de resultados
+    originales = indexar_imagenes_originales(data_dir)
+    for nombre, ruta in indexar_imagenes_originales(
+            Path(resultados_dir) / DIR_FOTOGRAMAS_CLAVE).items():
+        originales.setdefault(nombre, ruta)
+    miniaturas = CacheMiniaturas()
+    # Solo una tabla sin la columna Imagen_Original recurre a la primera imagen
+    imagen_por_defecto = (next(iter(originales.values()), None)
+                          if 'Imagen_Original' not in df_top.columns else None)
+    
+    filas_mosaico = []
     for idx, (_, row) in enumerate(df_top.iterrows()):
         exp_id = int(row['ID_Experimento'])
         
-        # Cargar imagen original (primera imagen encontrada en data)
-        data_dir = Path("./data")
-        imagenes_originales = list(data_dir.glob("*.*"))
-        if imagenes_originales:
-            img_original = cv2.imread(str(imagenes_originales[0]), cv2.IMREAD_GRAYSCALE)
-        else:
-            img_original = None
+        # Imagen original de este experimento (o la primera si la tabla no la
+        # indica); si no se encuentra, la miniatura queda como no disponible
+        ruta_original = originales.get(row.get('Imagen_Original'), imagen_por_defecto)
+        img_original = None
+        if ruta_original is not None:
+            img_original = miniaturas.obtener(('original', ruta_original.name),
+                                              lambda: _cargar_original(ruta_original))
         
-        # Cargar imagen modificada
-        ruta_img_modificada = os.path.join(
-            resultados_dir, 
-            f"iteracion_{exp_id:04d}", 
-            "imagen_modificada.png"
-        )
+        # Imagen modificada (carpetas iteracion_XXXX o bloques NPZ)
+        img_modificada = miniaturas.obtener(
+            ('experimento', exp_id), lambda: cargar_imagen_experimento(resultados_dir, exp_id))
         
-        if os.path.exists(ruta_img_modificada):
-            img_modificada = cv2.imread(ruta_img_modificada, cv2.IMREAD_GRAYSCALE)
-        else:
-            img_modificada = None
+        if img_modificada is None:
             print(f"  ✗ Advertencia: No se encontró imagen para ID {exp_id}")
         
-        # Mostrar imagen original
-        if img_original is not None:
-            axes[idx, 0].imshow(img_original, cmap='gray')
-            axes[idx, 0].set_title('Imagen Original', fontsize=11, fontweight='bold')
-            axes[idx, 0].axis('off')
-        else:
-            axes[idx, 0].text(0.5, 0.5, 'No disponible', 
-                             ha='center', va='center', fontsize=12)
-            axes[idx, 0].axis('off')
-        
-        # Mostrar imagen modificada
-        if img_modificada is not None:
-            axes[idx, 1].imshow(img_modificada, cmap='gray')
-            titulo = (f"ID {exp_id}: α={row['ClipLimit']:.1f}, ω={int(row['TileSize'])}\n"
-                     f"Contraste: {row['Contraste_Local_Promedio']:.3f}, "
-                     f"Entropía: {row['Entropia']:.3f}")
-            axes[idx, 1].set_title(titulo, fontsize=10, fontweight='bold')
-            axes[idx, 1].axis('off')
-        else:
-            axes[idx, 1].text(0.5, 0.5, 'Imagen no encontrada', 
-                             ha='center', va='center', fontsize=12)
-            axes[idx, 1].axis('off')
+        titulo_original = ('Imagen Original' if ruta_original is None
+                           else f"Imagen Original\n{ruta_original.name}")
+        titulo = (f"ID {exp_id}: α={row['ClipLimit']:.1f}, ω={int(row['TileSize'])}\n"
+                  + ", ".join(f"{_etiqueta(m)}: {row[m]:.3f}" for m in metricas_titulo))
+        filas_mosaico.append((titulo_original, img_original, titulo, img_modificada))
         
         print(f"\n{idx + 1}. Experimento ID {exp_id}:")
         print(f"   Parámetros: α={row['ClipLimit']:.2f}, ω={int(row['TileSize'])}")
-        print(f"   Entropía: {row['Entropia']:.4f}")
-        print(f"   Contraste Local: {row['Contraste_Local_Promedio']:.4f}")
-        print(f"   Nitidez Borde: {row['Nitidez_Borde']:.4f}")
-        print(f"   Contraste Michelson: {row['Contraste_Michelson']:.4f}")
+        for metrica in metricas:
+            print(f"   {_etiqueta(metrica)}: {row[metrica]:.4f}")
     
-    plt.suptitle('Comparación Visual: Original vs CLAHE Optimizado', 
-                 fontsize=16, fontweight='bold', y=0.995)
-    plt.tight_layout()
-    plt.savefig(os.path.join(reporte_dir, "comparacion_top_resultados.png"), 
-                dpi=300, bbox_inches='tight')
-    plt.close()
+    _guardar_mosaico(filas_mosaico, os.path.join(reporte_dir, "comparacion_top_resultados.png"))
     print(f"\n✓ Comparación visual guardada en: {reporte_dir}")
     
     # Generar reporte textual detallado
@@ -275,7 +785,7 @@ def evaluar_subjetivamente(df, top_ids, resultados_dir, output_dir):
         f.write("REPORTE FINAL DE OPTIMIZACIÓN CLAHE\n")
         f.write("=" * 80 + "\n\n")
         
-        f.write(f"Total de experimentos analizados: {len(df)}\n")
+        f.write(f"Total de experimentos analizados: {total_experimentos}\n")
         f.write(f"Mejores {len(top_ids)} iteraciones seleccionadas\n\n")
         
         f.write("─" * 80 + "\n")
@@ -287,29 +797,26 @@ def evaluar_subjetivamente(df, top_ids, resultados_dir, output_dir):
             f.write(f"   {'─' * 70}\n")
             f.write(f"   Parámetros:\n")
             f.write(f"     • Clip Limit (α): {row['ClipLimit']:.2f}\n")
-            f.write(f"     • Tile Size (ω): {int(row['TileSize'])} x {int(row['TileSize'])}\n\n")
+            f.write(f"     • Tile Size (ω): {int(row['TileSize'])} x {int(row['TileSize'])}\n")
+            if 'Rango_Pareto' in row:
+                f.write(f"     • Rango de Pareto en su imagen: {int(row['Rango_Pareto'])}"
+                        f"{' (frente)' if row['Rango_Pareto'] == 0 else ''}\n")
+            f.write("\n")
             f.write(f"   Métricas de Calidad:\n")
-            f.write(f"     • Entropía: {row['Entropia']:.4f}\n")
-            f.write(f"     • Contraste Local Promedio: {row['Contraste_Local_Promedio']:.4f}\n")
-            f.write(f"     • Nitidez de Borde: {row['Nitidez_Borde']:.4f}\n")
-            f.write(f"     • Contraste de Michelson: {row['Contraste_Michelson']:.4f}\n\n")
+            for metrica in metricas:
+                f.write(f"     • {_etiqueta(metrica)}: {row[metrica]:.4f}\n")
+            f.write("\n")
             
             # Evaluación cualitativa automática
             f.write(f"   Evaluación Cualitativa:\n")
-            if row['Contraste_Local_Promedio'] > df['Contraste_Local_Promedio'].quantile(0.75):
-                f.write(f"     ✓ Excelente contraste local - Delimitación clara de estructuras\n")
-            else:
-                f.write(f"     • Contraste local moderado\n")
-            
-            if row['Nitidez_Borde'] > df['Nitidez_Borde'].quantile(0.75):
-                f.write(f"     ✓ Alta nitidez de bordes - Estructuras bien definidas\n")
-            else:
-                f.write(f"     • Nitidez de bordes moderada\n")
-            
-            if row['Entropia'] > df['Entropia'].quantile(0.75):
-                f.write(f"     ✓ Alta entropía - Rica distribución de intensidades\n")
-            else:
-                f.write(f"     • Entropía moderada\n")
+            for metrica in metricas:
+                alta, moderada = EVALUACION_CUALITATIVA.get(
+                    metrica, (f"{_etiqueta(metrica)} en el cuartil superior",
+                              f"{_etiqueta(metrica)} moderada"))
+                if row[metrica] > cuantil_75[metrica]:
+                    f.write(f"     ✓ {alta}\n")
+                else:
+                    f.write(f"     • {moderada}\n")
             
             f.write("\n")
         
@@ -319,8 +826,12 @@ def evaluar_subjetivamente(df, top_ids, resultados_dir, output_dir):
     
     return reporte_dir, df_top
 
-def determinar_combinacion_optima(df_top):
-    """E. CONCLUSIÓN - Determinar y reportar la combinación óptima."""
+def determinar_combinacion_optima(df_top, resultados_dir="./resultados_clahe/"):
+    """
+    E. CONCLUSIÓN - Determinar y reportar la combinación óptima (la primera
+    fila de df_top, ya ordenado por la métrica principal). La ubicación de
+    su imagen depende del modo de almacenamiento de resultados_dir.
+    """
     print(f"\n{'=' * 70}")
     print("CONCLUSIÓN: COMBINACIÓN ÓPTIMA")
     print(f"{'=' * 70}")
@@ -328,20 +839,27 @@ def determinar_combinacion_optima(df_top):
     # Seleccionar el mejor resultado (primera fila ya está ordenada)
     mejor = df_top.iloc[0]
     
-    alpha_optimo = mejor['ClipLimit']
+    alpha_optimo = float(mejor['ClipLimit'])
     omega_optimo = int(mejor['TileSize'])
     
     print(f"\n🏆 PARÁMETROS ÓPTIMOS IDENTIFICADOS:")
     print(f"   α* (Clip Limit): {alpha_optimo:.2f}")
     print(f"   ω* (Tile Size): {omega_optimo} x {omega_optimo}")
     print(f"\n📊 MÉTRICAS DEL RESULTADO ÓPTIMO:")
-    print(f"   • Entropía: {mejor['Entropia']:.4f}")
-    print(f"   • Contraste Local Promedio: {mejor['Contraste_Local_Promedio']:.4f}")
-    print(f"   • Nitidez de Borde: {mejor['Nitidez_Borde']:.4f}")
-    print(f"   • Contraste de Michelson: {mejor['Contraste_Michelson']:.4f}")
-    
-    print(f"\n📁 Experimento ID: {int(mejor['ID_Experimento'])}")
-    print(f"   Ruta: ./resultados_clahe/iteracion_{int(mejor['ID_Experimento']):04d}/")
+    metricas = metricas_presentes(df_top.columns)
+    for metrica in metricas:
+        print(f"   • {_etiqueta(metrica)}: {mejor[metrica]:.4f}")
+    
+    exp_id = int(mejor['ID_Experimento'])
+    print(f"\n📁 Experimento ID: {exp_id}")
+    modo = leer_modo_almacen(resultados_dir)
+    if modo == 'carpetas':
+        print(f"   Ruta: {os.path.join(resultados_dir, f'iteracion_{exp_id:04d}')}{os.sep}")
+    elif modo == 'columnar':
+        print(f"   Imagen: {os.path.join(resultados_dir, DIR_IMAGENES)} "
+              f"(clave id_{exp_id:06d}; ver almacenamiento.cargar_imagen_experimento)")
+    else:
+        print(f"   Sin imagen guardada (modo de salida {modo})")
     
     print(f"\n{'=' * 70}")
     print("✓ ANÁLISIS COMPLETADO EXITOSAMENTE")
@@ -351,45 +869,141 @@ def determinar_combinacion_optima(df_top):
         'alpha_optimo': alpha_optimo,
         'omega_optimo': omega_optimo,
         'id_experimento': int(mejor['ID_Experimento']),
-        'metricas': {
-            'entropia': mejor['Entropia'],
-            'contraste_local': mejor['Contraste_Local_Promedio'],
-            'nitidez_borde': mejor['Nitidez_Borde'],
-            'contraste_michelson': mejor['Contraste_Michelson']
+        'metricas': _metricas_json(mejor, metricas)
+    }
+
+def _metricas_json(fila, metricas):
+    """Métricas de una fila para parametros_optimos.json ({clave: valor})."""
+    return {CLAVES_JSON.get(m, m.lower()): float(fila[m]) for m in metricas}
+
+def determinar_optimos_pareto(agregados, pesos=None):
+    """
+    Parámetros óptimos de cada imagen a partir de su frente de Pareto sobre
+    las métricas de la tabla (ver seleccion_pareto.optimos_por_imagen).
+    
+    Returns:
+        Diccionario {imagen: parámetros, métricas y tamaño del frente}, o
+        None si los agregados no incluyen el frente
+    """
+    frente = agregados.get('frente_pareto')
+    if frente is None:
+        return None
+    
+    print(f"\n{'─' * 70}")
+    print("SELECCIÓN MULTIOBJETIVO - Frente de Pareto por imagen")
+    print(f"{'─' * 70}")
+    
+    optimos = optimos_por_imagen(frente, pesos, agregados['metricas'])
+    rangos = agregados['rangos_pareto']
+    print(f"\n✓ Filas por rango de dominancia (0 = frente): "
+          f"{dict(list(rangos.items())[:10])}{' ...' if len(rangos) > 10 else ''}")
+    print(f"✓ Tamaño medio del frente: {optimos['Tamano_Frente'].mean():.1f} "
+          f"filas por imagen")
+    print(optimos[['Imagen_Original', 'ID_Experimento', 'ClipLimit', 'TileSize',
+                   'Tamano_Frente']].head(10).to_string(index=False))
+    if len(optimos) > 10:
+        print(f"... ({len(optimos)} imágenes)")
+    
+    return {
+        fila['Imagen_Original']: {
+            'alpha_optimo': float(fila['ClipLimit']),
+            'omega_optimo': int(fila['TileSize']),
+            'id_experimento': int(fila['ID_Experimento']),
+            'tamano_frente': int(fila['Tamano_Frente']),
+            'metricas': _metricas_json(fila, agregados['metricas'])
         }
+        for fila in optimos.to_dict('records')
     }
 
-def main():
+def _parsear_pesos(texto):
+    """Peso de Pareto 'Metrica=peso' desde la línea de comandos."""
+    metrica, separador, peso = texto.partition('=')
+    try:
+        if not separador:
+            raise ValueError
+        return metrica, float(peso)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"se esperaba Metrica=peso: {texto}")
+
+def main(argv=None, prog=None):
     """Función principal que ejecuta todo el flujo de análisis."""
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Análisis de los resultados de un barrido CLAHE")
+    parser.add_argument('--resultados', default="./resultados_clahe/",
+                        help="Directorio de resultados del barrido")
+    parser.add_argument('--csv', default=None,
+                        help="Tabla maestra (por defecto, <resultados>/resultados_maestros.csv)")
+    parser.add_argument('--data', default="./data", help="Imágenes originales del barrido")
+    parser.add_argument('--salida', default=None,
+                        help="Directorio de gráficos y reportes (por defecto, --resultados)")
+    parser.add_argument('--metrica-principal', default=None,
+                        help=f"Métrica de ordenamiento (por defecto, {METRICA_PRINCIPAL} "
+                             f"si está en la tabla; si no, la primera presente)")
+    parser.add_argument('--top-preseleccion', type=int, default=10)
+    parser.add_argument('--top-evaluacion', type=int, default=5)
+    parser.add_argument('--procesos-graficos', type=int, default=None,
+                        help="Procesos de dibujo (por defecto, todos los núcleos; 1 = sin pool)")
+    parser.add_argument('--vista-previa', action='store_true',
+                        help="Gráficos a baja resolución para iterar rápido")
+    parser.add_argument('--pesos-pareto', type=_parsear_pesos, nargs='+', default=None,
+                        metavar='METRICA=PESO',
+                        help="Pesos para elegir en el frente de Pareto (por defecto, iguales)")
+    args = parser.parse_args(argv)
     
     # Configuración
-    RUTA_CSV = "./resultados_clahe/resultados_maestros.csv"
-    RESULTADOS_DIR = "./resultados_clahe/"
-    OUTPUT_DIR = "./resultados_clahe/"
-    METRICA_PRINCIPAL = 'Contraste_Local_Promedio'
-    TOP_N_PRESELECCION = 10
-    TOP_N_EVALUACION = 5
-    
-    # A. CARGA DE DATOS
-    df = cargar_datos_maestros(RUTA_CSV)
-    if df is None:
+    ruta_csv = args.csv or os.path.join(args.resultados, "resultados_maestros.csv")
+    output_dir = args.salida or args.resultados
+    pesos_pareto = dict(args.pesos_pareto) if args.pesos_pareto else None
+    
+    print("=" * 70)
+    print("ANÁLISIS DE RESULTADOS CLAHE")
+    print("=" * 70)
+    
+    # A. CARGA DE DATOS (agregados en caché si la tabla no ha cambiado)
+    agregados = obtener_agregados(ruta_csv, mejores_por_metrica=max(MEJORES_POR_METRICA,
+                                                                   args.top_preseleccion))
+    if agregados is None:
         return
+    df = agregados['mejores']
+    metricas = agregados['metricas']
+    if not metricas:
+        parser.error(f"la tabla {ruta_csv} no contiene métricas del registro")
+    metrica_principal = args.metrica_principal or (
+        METRICA_PRINCIPAL if METRICA_PRINCIPAL in metricas else metricas[0])
+    if metrica_principal not in metricas:
+        parser.error(f"--metrica-principal: {metrica_principal} no está en la tabla "
+                     f"(disponibles: {metricas})")
+    if pesos_pareto:
+        desconocidas = sorted(set(pesos_pareto) - set(metricas))
+        if desconocidas:
+            parser.error(f"--pesos-pareto: métricas desconocidas {desconocidas} "
+                         f"(disponibles: {metricas})")
     
     # B. PRESELECCIÓN OBJETIVA
-    top_resultados = preseleccion_objetiva(df, METRICA_PRINCIPAL, TOP_N_PRESELECCION)
+    top_resultados = preseleccion_objetiva(df, metrica_principal, args.top_preseleccion)
     
     # C. VISUALIZACIÓN DE RESULTADOS
-    graficos_dir = visualizar_relaciones_parametros(df, OUTPUT_DIR)
+    graficos_dir = visualizar_relaciones_parametros(df, output_dir, agregados,
+                                                    procesos=args.procesos_graficos,
+                                                    vista_previa=args.vista_previa)
     
     # D. EVALUACIÓN SUBJETIVA
-    top_ids = top_resultados.head(TOP_N_EVALUACION)['ID_Experimento'].tolist()
-    reporte_dir, df_top = evaluar_subjetivamente(df, top_ids, RESULTADOS_DIR, OUTPUT_DIR)
+    top_ids = top_resultados.head(args.top_evaluacion)['ID_Experimento'].tolist()
+    reporte_dir, df_top = evaluar_subjetivamente(df, top_ids, args.resultados, output_dir,
+                                                 agregados, data_dir=args.data,
+                                                 metrica_principal=metrica_principal)
+    
+    # Selección multiobjetivo por imagen (frente de Pareto)
+    optimos_pareto = determinar_optimos_pareto(agregados, pesos_pareto)
     
     # E. CONCLUSIÓN
-    resultado_optimo = determinar_combinacion_optima(df_top)
+    resultado_optimo = determinar_combinacion_optima(df_top, args.resultados)
+    if optimos_pareto is not None:
+        resultado_optimo['pesos_pareto'] = pesos_pareto
+        resultado_optimo['por_imagen'] = optimos_pareto
     
     # Guardar resultado óptimo en JSON
-    ruta_optimo = os.path.join(OUTPUT_DIR, "parametros_optimos.json")
+    ruta_optimo = os.path.join(output_dir, "parametros_optimos.json")
     with open(ruta_optimo, 'w', encoding='utf-8') as f:
         json.dump(resultado_optimo, f, indent=4, ensure_ascii=False)
     
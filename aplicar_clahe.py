@@ -0,0 +1,356 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from region_interes import es_archivo_auxiliar
+from secuencias import aplicar_secuencia, es_secuencia
+
+EXTENSIONES_ENTRADA = ['.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff']
+
+# Imágenes por tarea del pool (se decodifican, procesan y codifican juntas)
+TAMANO_LOTE = 8
+
+# Carpeta vigilada: segundos entre exploraciones
+INTERVALO_VIGILANCIA_S = 0.5
+
+_local = threading.local()
+
+def leer_parametros_optimos(ruta):
+    """
+    (α, ω) óptimos de un parametros_optimos.json generado por analisis_resultados.
+
+    Raises:
+        KeyError: Si el archivo no contiene alpha_optimo / omega_optimo
+    """
+    with open(ruta, 'r', encoding='utf-8') as f:
+        parametros = json.load(f)
+    return float(parametros['alpha_optimo']), int(parametros['omega_optimo'])
+
+def _clahe(alpha, omega):
+    """Objeto cv2.CLAHE del hilo actual para (α, ω), creado una sola vez por hilo."""
+    objetos = getattr(_local, 'clahe', None)
+    if objetos is None:
+        objetos = _local.clahe = {}
+    clave = (alpha, omega)
+    if clave not in objetos:
+        objetos[clave] = cv2.createCLAHE(clipLimit=alpha, tileGridSize=(omega, omega))
+    return objetos[clave]
+
+def _inicializar_proceso():
+    """Evita sobresuscripción: cada trabajador usa un único hilo de OpenCV."""
+    cv2.setNumThreads(1)
+
+def _procesar_lote(lote, alpha, omega, output_dir, extension, alta_profundidad,
+                   parametros_escritura):
+    """
+    Decodifica, aplica CLAHE y codifica un lote de imágenes.
+
+    Returns:
+        Lista de (ruta de entrada, ruta de salida o None, mensaje de error o None)
+    """
+    modo_lectura = cv2.IMREAD_ANYDEPTH if alta_profundidad else cv2.IMREAD_GRAYSCALE
+    imagenes = [cv2.imread(str(ruta), modo_lectura) for ruta in lote]
+
+    clahe = _clahe(alpha, omega)
+    resultados = []
+    for ruta, imagen in zip(lote, imagenes):
+        if imagen is None:
+            resultados.append((ruta, None, "no se pudo leer"))
+            continue
+        salida = clahe.apply(imagen)
+        ruta_salida = os.path.join(output_dir, Path(ruta).stem + (extension or Path(ruta).suffix))
+        if not cv2.imwrite(ruta_salida, salida, parametros_escritura):
+            resultados.append((ruta, None, "no se pudo escribir"))
+            continue
+        resultados.append((ruta, ruta_salida, None))
+    return resultados
+
+def rutas_directorio(input_dir):
+    """Imágenes de un directorio en orden alfabético (sin máscaras de región de interés)."""
+    return sorted(str(f) for f in Path(input_dir).iterdir()
+                  if f.suffix.lower() in EXTENSIONES_ENTRADA and not es_archivo_auxiliar(f))
+
+def rutas_entrada_estandar(flujo=None):
+    """Rutas de imagen leídas de la entrada estándar, una por línea, según llegan."""
+    for linea in flujo or sys.stdin:
+        linea = linea.strip()
+        if linea:
+            yield linea
+
+def rutas_vigiladas(input_dir, intervalo_s=INTERVALO_VIGILANCIA_S, inactividad_s=None):
+    """
+    Vigila un directorio y genera cada imagen nueva una vez que su tamaño
+    deja de cambiar entre dos exploraciones (archivo escrito por completo).
+    Las imágenes ya presentes al empezar también se generan.
+
+    Args:
+        inactividad_s: Terminar tras estos segundos sin imágenes nuevas
+            (None = vigilar hasta interrumpir con Ctrl+C)
+    """
+    vistas = set()
+    tamanos = {}
+    ultima_novedad = time.monotonic()
+    while True:
+        for ruta in rutas_directorio(input_dir):
+            if ruta in vistas:
+                continue
+            try:
+                tamano = os.path.getsize(ruta)
+            except OSError:
+                continue
+            if tamanos.get(ruta) == tamano and tamano > 0:
+                vistas.add(ruta)
+                del tamanos[ruta]
+                ultima_novedad = time.monotonic()
+                yield ruta
+            else:
+                tamanos[ruta] = tamano
+        if inactividad_s is not None and time.monotonic() - ultima_novedad >= inactividad_s:
+            return
+        time.sleep(intervalo_s)
+
+def _con_pausas(rutas, intervalo_s, capacidad):
+    """
+    Consume la fuente en un hilo y genera sus rutas, o None cada intervalo_s
+    segundos sin rutas nuevas (fuentes en streaming que se bloquean).
+    """
+    cola = queue.Queue(maxsize=capacidad)
+    fin = object()
+
+    def leer():
+        try:
+            for ruta in rutas:
+                cola.put(ruta)
+        except BaseException as e:
+            cola.put(e)
+        cola.put(fin)
+
+    threading.Thread(target=leer, daemon=True).start()
+    while True:
+        try:
+            elemento = cola.get(timeout=intervalo_s)
+        except queue.Empty:
+            yield None
+            continue
+        if elemento is fin:
+            return
+        if isinstance(elemento, BaseException):
+            raise elemento
+        yield elemento
+
+def _lotes(rutas, tamano_lote, intervalo_s):
+    """
+    Agrupa las rutas en lotes. Un lote incompleto se entrega en cuanto la
+    fuente pasa intervalo_s sin producir rutas, de modo que la latencia de
+    una fuente lenta no espera a llenar el lote.
+    """
+    lote = []
+    for ruta in _con_pausas(rutas, intervalo_s, 4 * tamano_lote):
+        if ruta is not None:
+            lote.append((ruta, time.perf_counter()))
+        if lote and (ruta is None or len(lote) >= tamano_lote):
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def aplicar_clahe(rutas, output_dir, alpha, omega, trabajadores=None, procesos=False,
+                  tamano_lote=TAMANO_LOTE, extension=None, compresion_png=None,
+                  alta_profundidad=False, verbose=True):
+    """
+    Aplica CLAHE con (α, ω) fijos a un flujo de imágenes y las escribe en
+    output_dir, sin métricas ni trazabilidad por experimento.
+
+    Los lotes se reparten en un pool de hilos (cv2 libera el GIL; cada hilo
+    reutiliza su propio objeto cv2.CLAHE) o de procesos, con como mucho dos
+    lotes por trabajador en curso para que la memoria no dependa de la
+    longitud del flujo.
+
+    Args:
+        rutas: Iterable de rutas (se consume de forma perezosa)
+        trabajadores: Hilos o procesos (None = número de núcleos)
+        procesos: Usar un pool de procesos en lugar de hilos
+        extension: Extensión de salida ('.png', '.tiff'...); None = la de entrada
+        compresion_png: Nivel de compresión PNG 0-9 (None = predeterminado)
+        alta_profundidad: Conservar 16 bits en lugar de reducir a 8
+
+    Returns:
+        Diccionario con imágenes procesadas, fallidas, segundos, imágenes/s
+        y latencias p50/p99 en ms (desde que la ruta llega hasta que su
+        imagen está escrita)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    trabajadores = trabajadores or os.cpu_count() or 1
+    parametros_escritura = ([cv2.IMWRITE_PNG_COMPRESSION, int(compresion_png)]
+                            if compresion_png is not None else [])
+    if procesos:
+        pool = ProcessPoolExecutor(max_workers=trabajadores, initializer=_inicializar_proceso)
+    else:
+        # Paralelismo entre imágenes: un hilo de OpenCV por llamada
+        if trabajadores > 1:
+            cv2.setNumThreads(1)
+        pool = ThreadPoolExecutor(max_workers=trabajadores)
+
+    latencias = []
+    procesadas = fallidas = 0
+    inicio = time.perf_counter()
+
+    def recoger(futuro, llegadas):
+        nonlocal procesadas, fallidas
+        # El callback puede no haberse ejecutado aún cuando wait() retorna
+        terminado = getattr(futuro, 'terminado', None) or time.perf_counter()
+        for (ruta, ruta_salida, error), llegada in zip(futuro.result(), llegadas):
+            if error is not None:
+                fallidas += 1
+                if verbose:
+                    print(f"  ✗ {Path(ruta).name}: {error}")
+                continue
+            procesadas += 1
+            latencias.append(terminado - llegada)
+
+    def marcar(futuro):
+        futuro.terminado = time.perf_counter()
+
+    with pool:
+        en_curso = deque()
+        for lote in _lotes(rutas, tamano_lote, INTERVALO_VIGILANCIA_S):
+            futuro = pool.submit(_procesar_lote, [r for r, _ in lote], alpha, omega,
+                                 output_dir, extension, alta_profundidad, parametros_escritura)
+            futuro.add_done_callback(marcar)
+            en_curso.append((futuro, [t for _, t in lote]))
+            while len(en_curso) >= 2 * trabajadores:
+                wait([f for f, _ in en_curso], return_when=FIRST_COMPLETED)
+                for elemento in [e for e in en_curso if e[0].done()]:
+                    en_curso.remove(elemento)
+                    recoger(*elemento)
+        for futuro, llegadas in en_curso:
+            futuro.result()
+            recoger(futuro, llegadas)
+
+    segundos = time.perf_counter() - inicio
+    latencias_ms = np.array(latencias) * 1000
+    return {
+        'procesadas': procesadas,
+        'fallidas': fallidas,
+        'segundos': segundos,
+        'imagenes_por_s': procesadas / segundos if segundos > 0 else float('nan'),
+        'latencia_p50_ms': float(np.percentile(latencias_ms, 50)) if procesadas else None,
+        'latencia_p99_ms': float(np.percentile(latencias_ms, 99)) if procesadas else None
+    }
+
+def _aplicar_a_secuencia(args, alpha, omega):
+    """Aplica CLAHE a un vídeo o TIFF multipágina desde la línea de comandos."""
+    print("=" * 70)
+    print("APLICACIÓN DE CLAHE A UNA SECUENCIA")
+    print("=" * 70)
+    print(f"  - Parámetros: α={alpha}, ω={omega}")
+    print(f"  - Entrada: {args.entrada}")
+    print(f"  - Salida: {args.salida}")
+    print(f"  - Suavizado temporal: {args.suavizado or 'desactivado'}, "
+          f"LUT cada {args.actualizar_cada} fotograma(s)\n")
+
+    try:
+        resumen = aplicar_secuencia(args.entrada, args.salida, alpha, omega, args.suavizado,
+                                    args.actualizar_cada, args.fourcc, args.alta_profundidad)
+    except KeyboardInterrupt:
+        print("\n✗ Interrumpido")
+        return
+
+    print(f"✓ Fotogramas procesados: {resumen['fotogramas']} en {resumen['segundos']:.2f} s")
+    print(f"✓ Rendimiento: {resumen['fotogramas_por_s']:.1f} fotogramas/s "
+          f"(CLAHE: {resumen['fotogramas_por_s_clahe']:.1f} fotogramas/s)")
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Aplica los parámetros CLAHE óptimos a imágenes nuevas")
+    parser.add_argument('entrada',
+                        help="Directorio de imágenes, vídeo o TIFF multipágina, o '-' para "
+                             "leer rutas de la entrada estándar")
+    parser.add_argument('salida', help="Directorio de salida (para una secuencia: vídeo, "
+                                       ".tif o directorio de PNG)")
+    parser.add_argument('--parametros', default="./resultados_clahe/parametros_optimos.json",
+                        help="parametros_optimos.json con alpha_optimo y omega_optimo")
+    parser.add_argument('--alpha', type=float, help="Clip limit (sustituye al del JSON)")
+    parser.add_argument('--omega', type=int, help="Tile size (sustituye al del JSON)")
+    parser.add_argument('--vigilar', action='store_true',
+                        help="Vigilar el directorio y procesar las imágenes nuevas")
+    parser.add_argument('--inactividad', type=float, default=None,
+                        help="Con --vigilar, terminar tras estos segundos sin imágenes nuevas")
+    parser.add_argument('--trabajadores', type=int, default=None,
+                        help="Hilos o procesos (por defecto, número de núcleos)")
+    parser.add_argument('--procesos', action='store_true',
+                        help="Usar un pool de procesos en lugar de hilos")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Imágenes por tarea")
+    parser.add_argument('--formato', choices=['png', 'tiff', 'jpg'], default=None,
+                        help="Formato de salida (por defecto, el de entrada)")
+    parser.add_argument('--compresion-png', type=int, default=None, choices=range(10))
+    parser.add_argument('--alta-profundidad', action='store_true',
+                        help="Conservar imágenes de 16 bits")
+    parser.add_argument('--suavizado', type=float, default=0.0,
+                        help="Secuencias: peso del promedio temporal de los histogramas "
+                             "por baldosa en [0, 1) (0 = CLAHE independiente por fotograma)")
+    parser.add_argument('--actualizar-cada', type=int, default=1,
+                        help="Secuencias: recalcular histogramas y LUT cada N fotogramas")
+    parser.add_argument('--fourcc', default='mp4v', help="Secuencias: códec del vídeo de salida")
+    args = parser.parse_args(argv)
+
+    if args.alpha is not None and args.omega is not None:
+        alpha, omega = args.alpha, args.omega
+    else:
+        alpha, omega = leer_parametros_optimos(args.parametros)
+        alpha = args.alpha if args.alpha is not None else alpha
+        omega = args.omega if args.omega is not None else omega
+
+    if args.entrada != '-' and os.path.isfile(args.entrada):
+        if not es_secuencia(args.entrada):
+            parser.error(f"{args.entrada} no es un vídeo ni un TIFF multipágina")
+        _aplicar_a_secuencia(args, alpha, omega)
+        return
+
+    if args.entrada == '-':
+        rutas = rutas_entrada_estandar()
+        origen = "entrada estándar"
+    elif args.vigilar:
+        rutas = rutas_vigiladas(args.entrada, inactividad_s=args.inactividad)
+        origen = f"{args.entrada} (vigilado)"
+    else:
+        rutas = rutas_directorio(args.entrada)
+        origen = f"{args.entrada} ({len(rutas)} imágenes)"
+
+    print("=" * 70)
+    print("APLICACIÓN DE CLAHE")
+    print("=" * 70)
+    print(f"  - Parámetros: α={alpha}, ω={omega}")
+    print(f"  - Entrada: {origen}")
+    print(f"  - Salida: {args.salida}")
+    print(f"  - Pool: {args.trabajadores or os.cpu_count()} "
+          f"{'procesos' if args.procesos else 'hilos'}, lotes de {args.lote}\n")
+
+    try:
+        resumen = aplicar_clahe(rutas, args.salida, alpha, omega, args.trabajadores,
+                                args.procesos, args.lote,
+                                args.formato and f".{args.formato}", args.compresion_png,
+                                args.alta_profundidad)
+    except KeyboardInterrupt:
+        print("\n✗ Interrumpido")
+        return
+
+    print(f"✓ Imágenes procesadas: {resumen['procesadas']} "
+          f"({resumen['fallidas']} fallidas) en {resumen['segundos']:.2f} s")
+    print(f"✓ Rendimiento: {resumen['imagenes_por_s']:.1f} imágenes/s")
+    if resumen['procesadas']:
+        print(f"✓ Latencia: p50 {resumen['latencia_p50_ms']:.1f} ms, "
+              f"p99 {resumen['latencia_p99_ms']:.1f} ms")
+
+if __name__ == "__main__":
+    main()
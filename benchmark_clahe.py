@@ -0,0 +1,381 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+
+from generar_datos_clahe import (EvaluadorMetricas, _cargar_imagen,
+                                 calcular_contraste_local_promedio,
+                                 calcular_contraste_michelson, calcular_entropia,
+                                 calcular_nitidez_borde)
+from motor_clahe import clahe_lote
+
+TAMANOS = [512, 1024, 2048, 4096, 8192]
+PROFUNDIDADES = [8, 16]
+TEXTURAS = ['ruido_suave', 'fractal', 'bordes', 'gradiente_tenue']
+
+# Parámetros fijos de las etapas medidas
+ALPHA_REFERENCIA = 2.0
+OMEGA_REFERENCIA = 8
+CLIP_LIMITS_LOTE = np.arange(1.0, 5.1, 0.5)
+
+# Diferencias por debajo de este tiempo se consideran ruido de medida
+MINIMO_REGRESION_S = 1e-3
+
+# Módulo de cada subcomando de clahe.py cuyo tiempo de importación se mide
+MODULOS_SUBCOMANDOS = {'barrer': 'generar_datos_clahe', 'analizar': 'analisis_resultados',
+                       'aplicar': 'aplicar_clahe'}
+
+def generar_imagen_sintetica(tamano, profundidad, textura, semilla=0):
+    """
+    Genera una imagen sintética determinista en escala de grises.
+
+    Texturas:
+        ruido_suave      Ruido gaussiano suavizado (estadística local homogénea)
+        fractal          Suma de octavas de ruido reescalado (espectro ~1/f)
+        bordes           Regiones constantes a trozos con bordes nítidos
+        gradiente_tenue  Gradiente lineal de bajo contraste con ruido leve
+                         (caso típico de imagen subexpuesta)
+
+    Returns:
+        Array uint8 (profundidad 8) o uint16 (profundidad 16) de tamano × tamano
+    """
+    rng = np.random.default_rng([semilla, tamano, profundidad, TEXTURAS.index(textura)])
+
+    if textura == 'ruido_suave':
+        base = cv2.GaussianBlur(rng.standard_normal((tamano, tamano), np.float32), (0, 0), 3)
+    elif textura == 'fractal':
+        base = np.zeros((tamano, tamano), np.float32)
+        lado = 4
+        while lado <= tamano:
+            octava = rng.standard_normal((lado, lado), np.float32)
+            base += cv2.resize(octava, (tamano, tamano), interpolation=cv2.INTER_CUBIC) / lado
+            lado *= 2
+    elif textura == 'bordes':
+        celdas = rng.random((32, 32), np.float32)
+        base = cv2.resize(celdas, (tamano, tamano), interpolation=cv2.INTER_NEAREST)
+        base += 0.02 * rng.standard_normal((tamano, tamano), np.float32)
+    elif textura == 'gradiente_tenue':
+        base = np.add.outer(np.arange(tamano, dtype=np.float32),
+                            np.arange(tamano, dtype=np.float32)) / (2 * tamano)
+        base = 0.3 + 0.2 * base + 0.01 * rng.standard_normal((tamano, tamano), np.float32)
+    else:
+        raise ValueError(f"Textura desconocida: {textura} (opciones: {TEXTURAS})")
+
+    if textura != 'gradiente_tenue':
+        base = (base - base.min()) / (base.max() - base.min())
+    maximo = 255 if profundidad == 8 else 65535
+    dtype = np.uint8 if profundidad == 8 else np.uint16
+    return np.clip(base * maximo, 0, maximo).round().astype(dtype)
+
+def medir(funcion, repeticiones):
+    """Ejecuta funcion repeticiones veces (más un calentamiento) y devuelve los tiempos."""
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+def _registro(imagen, etapa, tiempos, pixeles):
+    mediana = float(np.median(tiempos))
+    return {
+        'imagen': imagen,
+        'etapa': etapa,
+        'mediana_s': mediana,
+        'minimo_s': float(np.min(tiempos)),
+        'repeticiones': len(tiempos),
+        'megapixeles_s': pixeles / mediana / 1e6 if pixeles and mediana > 0 else None
+    }
+
+def medir_imagen(ruta, profundidad, directorio, repeticiones):
+    """Mide cada etapa del barrido sobre una imagen sintética guardada en PNG."""
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    alta = profundidad == 16
+    imagen = _cargar_imagen(ruta, alta_profundidad=alta)
+    pixeles = imagen.size
+    clahe = cv2.createCLAHE(clipLimit=ALPHA_REFERENCIA,
+                            tileGridSize=(OMEGA_REFERENCIA, OMEGA_REFERENCIA))
+    salida = clahe.apply(imagen)
+    evaluador = EvaluadorMetricas()
+    metricas = evaluador.evaluar(salida)
+    ruta_json = os.path.join(directorio, f"{nombre}.json")
+
+    def escribir_json():
+        datos = {
+            'ID_Experimento': 1,
+            'Imagen_Original': os.path.basename(ruta),
+            'ClipLimit': ALPHA_REFERENCIA,
+            'TileSize': OMEGA_REFERENCIA,
+            'Metricas': metricas
+        }
+        with open(ruta_json, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, indent=4, ensure_ascii=False)
+
+    etapas = [
+        ('carga', lambda: _cargar_imagen(ruta, alta_profundidad=alta)),
+        ('clahe_opencv', lambda: clahe.apply(imagen)),
+        ('clahe_numpy_9_alphas', lambda: clahe_lote(imagen, CLIP_LIMITS_LOTE, OMEGA_REFERENCIA)),
+        ('calcular_entropia', lambda: calcular_entropia(salida)),
+        ('calcular_contraste_local_promedio', lambda: calcular_contraste_local_promedio(salida)),
+        ('calcular_nitidez_borde', lambda: calcular_nitidez_borde(salida)),
+        ('calcular_contraste_michelson', lambda: calcular_contraste_michelson(salida)),
+        ('metricas_fusionadas', lambda: evaluador.evaluar(salida)),
+        ('codificacion_png', lambda: cv2.imencode('.png', salida)),
+        ('escritura_json', escribir_json),
+    ]
+
+    if alta:
+        # calcular_entropia usa un histograma fijo de 256 niveles: solo aplica a 8 bits
+        etapas = [e for e in etapas if e[0] != 'calcular_entropia']
+
+    registros = []
+    for etapa, funcion in etapas:
+        tiempos = medir(funcion, repeticiones)
+        # La etapa por lotes procesa 9 imágenes de salida
+        factor = len(CLIP_LIMITS_LOTE) if etapa == 'clahe_numpy_9_alphas' else 1
+        registros.append(_registro(nombre, etapa, tiempos, pixeles * factor))
+    return registros
+
+def medir_graficos(directorio, repeticiones):
+    """Mide visualizar_relaciones_parametros sobre una tabla de barrido real (9 α × 3 ω)."""
+    from analisis_resultados import visualizar_relaciones_parametros
+
+    imagen = generar_imagen_sintetica(512, 8, 'fractal')
+    evaluador = EvaluadorMetricas()
+    filas = []
+    for omega in (8, 16, 32):
+        for alpha, salida in zip(CLIP_LIMITS_LOTE, clahe_lote(imagen, CLIP_LIMITS_LOTE, omega)):
+            metricas = evaluador.evaluar(salida)
+            filas.append({
+                'ID_Experimento': len(filas) + 1,
+                'Imagen_Original': 'fractal.png',
+                'ClipLimit': float(alpha),
+                'TileSize': omega,
+                'Entropia': metricas['entropia'],
+                'Contraste_Local_Promedio': metricas['contraste_local_promedio'],
+                'Nitidez_Borde': metricas['nitidez_borde'],
+                'Contraste_Michelson': metricas['contraste_michelson']
+            })
+    df = pd.DataFrame(filas)
+
+    def graficar():
+        with contextlib.redirect_stdout(io.StringIO()):
+            visualizar_relaciones_parametros(df, directorio, forzar=True)
+
+    return _registro('analisis', 'visualizar_relaciones_parametros',
+                     medir(graficar, repeticiones), None)
+
+def _medir_proceso(argumentos, repeticiones):
+    """Tiempos de pared de un proceso Python nuevo (intérprete incluido) en el repositorio."""
+    directorio = os.path.dirname(os.path.abspath(__file__))
+
+    def ejecutar():
+        subprocess.run([sys.executable] + argumentos, cwd=directorio, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    return medir(ejecutar, repeticiones)
+
+def medir_arranque(directorio, repeticiones):
+    """
+    Coste de arranque de la línea de comandos, en procesos nuevos: el
+    intérprete solo, la importación del módulo de cada subcomando y el tiempo
+    hasta el primer resultado de cada uno (un experimento, su análisis y una
+    imagen aplicada) sobre una imagen de 512 × 512. Tras el calentamiento, el
+    análisis reutiliza los agregados y los gráficos en caché, como al iterar.
+    """
+    datos = os.path.join(directorio, "arranque_datos")
+    resultados = os.path.join(directorio, "arranque_resultados")
+    os.makedirs(datos, exist_ok=True)
+    cv2.imwrite(os.path.join(datos, "fractal.png"), generar_imagen_sintetica(512, 8, 'fractal'))
+
+    medidas = [('interprete', ['-c', 'pass'])]
+    for subcomando, modulo in MODULOS_SUBCOMANDOS.items():
+        medidas.append((f"importar_{subcomando}", ['-c', f"import {modulo}"]))
+    medidas += [
+        ('primer_resultado_barrer',
+         ['clahe.py', 'barrer', '--entrada', datos, '--salida', resultados, '--clip-limits', '2',
+          '--tile-sizes', '8', '--hilos-escritura', '0', '--precarga', '0']),
+        ('primer_resultado_analizar',
+         ['clahe.py', 'analizar', '--resultados', resultados, '--data', datos,
+          '--procesos-graficos', '1', '--vista-previa', '--top-evaluacion', '1']),
+        ('primer_resultado_aplicar',
+         ['clahe.py', 'aplicar', datos, os.path.join(directorio, "arranque_aplicadas"),
+          '--alpha', '2', '--omega', '8', '--trabajadores', '1']),
+    ]
+    registros = []
+    for etapa, argumentos in medidas:
+        registros.append(_registro('arranque', etapa, _medir_proceso(argumentos, repeticiones),
+                                   None))
+    return registros
+
+def _metadatos():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'hilos_opencv': cv2.getNumThreads()
+    }
+
+def ejecutar_benchmark(tamanos=TAMANOS, profundidades=PROFUNDIDADES, texturas=TEXTURAS,
+                       repeticiones=3, graficos=True, arranque=True):
+    """
+    Genera el corpus sintético y mide todas las etapas.
+
+    Returns:
+        Diccionario {'metadatos': ..., 'resultados': [...]} serializable en JSON
+    """
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="benchmark_clahe_") as directorio:
+        for tamano in tamanos:
+            for profundidad in profundidades:
+                for textura in texturas:
+                    nombre = f"{textura}_{tamano}_{profundidad}bits"
+                    ruta = os.path.join(directorio, f"{nombre}.png")
+                    cv2.imwrite(ruta, generar_imagen_sintetica(tamano, profundidad, textura))
+
+                    registros = medir_imagen(ruta, profundidad, directorio, repeticiones)
+                    for registro in registros:
+                        registro.update({'tamano': tamano, 'profundidad': profundidad,
+                                         'textura': textura})
+                    resultados.extend(registros)
+                    total = sum(r['mediana_s'] for r in registros)
+                    print(f"  ✓ {nombre}: {total:.3f} s por barrido de etapas")
+
+        if graficos:
+            registro = medir_graficos(directorio, repeticiones)
+            resultados.append(registro)
+            print(f"  ✓ Gráficos de análisis: {registro['mediana_s']:.3f} s")
+
+        if arranque:
+            registros = medir_arranque(directorio, repeticiones)
+            resultados.extend(registros)
+            for registro in registros:
+                print(f"  ✓ Arranque, {registro['etapa']}: {registro['mediana_s']:.3f} s")
+
+    return {'metadatos': _metadatos(), 'resultados': resultados}
+
+def comparar_resultados(actual, referencia, umbral=0.10):
+    """
+    Compara dos ejecuciones etapa a etapa.
+
+    Una etapa es una regresión si su mediana supera la de referencia en más
+    de `umbral` (fracción) y en más de MINIMO_REGRESION_S segundos.
+
+    Returns:
+        DataFrame con la comparación y columna booleana 'Regresion'
+    """
+    clave = ['imagen', 'etapa']
+    df_actual = pd.DataFrame(actual['resultados'])[clave + ['mediana_s']]
+    df_referencia = pd.DataFrame(referencia['resultados'])[clave + ['mediana_s']]
+    df = df_actual.merge(df_referencia, on=clave, suffixes=('', '_referencia'))
+    df['Cambio'] = df['mediana_s'] / df['mediana_s_referencia'] - 1
+    df['Regresion'] = ((df['Cambio'] > umbral) &
+                       (df['mediana_s'] - df['mediana_s_referencia'] > MINIMO_REGRESION_S))
+    return df
+
+def _resumen(datos):
+    df = pd.DataFrame(datos['resultados'])
+    df = df[~df['imagen'].isin(['analisis', 'arranque'])].astype({'tamano': int,
+                                                                  'profundidad': int})
+    tabla = df.pivot_table(values='mediana_s', index='etapa', columns=['profundidad', 'tamano'],
+                           aggfunc='median')
+    print(f"\n{'─' * 70}")
+    print("MEDIANA POR ETAPA (s, mediana entre texturas)")
+    print(f"{'─' * 70}")
+    with pd.option_context('display.width', None, 'display.max_columns', None,
+                           'display.float_format', '{:.4f}'.format):
+        print(tabla)
+
+    arranque = pd.DataFrame(datos['resultados'])
+    arranque = arranque[arranque['imagen'] == 'arranque']
+    if not arranque.empty:
+        print(f"\n{'─' * 70}")
+        print("ARRANQUE DE LA LÍNEA DE COMANDOS (s, proceso nuevo)")
+        print(f"{'─' * 70}")
+        for fila in arranque.itertuples():
+            print(f"  {fila.etapa:<28}{fila.mediana_s:.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark por etapas del barrido CLAHE sobre imágenes sintéticas")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS)
+    parser.add_argument('--profundidades', type=int, nargs='+', default=PROFUNDIDADES,
+                        choices=PROFUNDIDADES)
+    parser.add_argument('--texturas', nargs='+', default=TEXTURAS, choices=TEXTURAS)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--sin-graficos', action='store_true',
+                        help="No medir el trazado de analisis_resultados")
+    parser.add_argument('--sin-arranque', action='store_true',
+                        help="No medir la importación y el primer resultado de clahe.py")
+    parser.add_argument('--hilos', type=int, default=None,
+                        help="Hilos de OpenCV (por defecto, los de la instalación)")
+    parser.add_argument('--salida', default="benchmark_resultados.json")
+    parser.add_argument('--comparar', default=None,
+                        help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument('--umbral', type=float, default=0.10,
+                        help="Aumento relativo de la mediana considerado regresión")
+    args = parser.parse_args()
+
+    if args.hilos is not None:
+        cv2.setNumThreads(args.hilos)
+
+    print("=" * 70)
+    print("BENCHMARK DEL BARRIDO CLAHE")
+    print("=" * 70)
+    print(f"  - Tamaños: {args.tamanos}")
+    print(f"  - Profundidades: {args.profundidades}")
+    print(f"  - Texturas: {args.texturas}")
+    print(f"  - Repeticiones: {args.repeticiones}\n")
+
+    datos = ejecutar_benchmark(args.tamanos, args.profundidades, args.texturas,
+                               args.repeticiones, not args.sin_graficos,
+                               not args.sin_arranque)
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+    _resumen(datos)
+    print(f"\n✓ Resultados guardados en: {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            referencia = json.load(f)
+        comparacion = comparar_resultados(datos, referencia, args.umbral)
+        regresiones = comparacion[comparacion['Regresion']]
+        print(f"\n{'─' * 70}")
+        print(f"COMPARACIÓN CON {args.comparar} (commit {referencia['metadatos'].get('commit')})")
+        print(f"{'─' * 70}")
+        print(f"✓ Etapas comparadas: {len(comparacion)}")
+        if regresiones.empty:
+            print(f"✓ Sin regresiones por encima del {args.umbral:.0%}")
+        else:
+            print(f"✗ {len(regresiones)} regresión(es) por encima del {args.umbral:.0%}:")
+            with pd.option_context('display.width', None, 'display.float_format',
+                                   '{:.4f}'.format):
+                print(regresiones.to_string(index=False))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import math
+
+ESTRATEGIAS_BUSQUEDA = ('exhaustiva', 'grueso_fino')
+
+class BusquedaExhaustiva:
+    """Rejilla completa α × ω en una sola ronda (α externo, ω interno)."""
+
+    def __init__(self, clip_limits, tile_sizes):
+        self.puntos = [(alpha, omega) for alpha in clip_limits for omega in tile_sizes]
+
+    def total_evaluaciones(self):
+        return len(self.puntos)
+
+    def proponer(self, historial):
+        """Devuelve la rejilla completa en la primera ronda y nada después."""
+        return [] if historial else list(self.puntos)
+
+class BusquedaGruesoFino:
+    """
+    Búsqueda de grueso a fino con un presupuesto fijo de evaluaciones.
+
+    El espacio es α ∈ [min, max] de clip_limits (discretizado a
+    resolucion_alpha) y ω entero en [min, max] de tile_sizes, normalizado a
+    [0, 1] (ω en escala logarítmica). La primera ronda evalúa una rejilla
+    gruesa 3 × 3; cada ronda siguiente evalúa los vecinos aún no visitados
+    del mejor punto a distancia h y reduce h a la mitad. Si no quedan
+    vecinos nuevos se completan las evaluaciones con los puntos del retículo
+    más cercanos al mejor.
+
+    Se consumen exactamente min(presupuesto, tamaño del retículo)
+    evaluaciones por imagen, de modo que la numeración de experimentos es
+    determinista aunque el recorrido dependa de la imagen.
+    """
+
+    def __init__(self, clip_limits, tile_sizes, presupuesto,
+                 objetivo='Contraste_Local_Promedio', resolucion_alpha=0.05):
+        self.alpha_min = float(min(clip_limits))
+        self.alpha_max = float(max(clip_limits))
+        self.omega_min = int(min(tile_sizes))
+        self.omega_max = int(max(tile_sizes))
+        self.resolucion_alpha = resolucion_alpha
+        self.objetivo = objetivo
+
+        n_alpha = int(round((self.alpha_max - self.alpha_min) / resolucion_alpha)) + 1
+        n_omega = self.omega_max - self.omega_min + 1
+        self._alphas = [self._alpha(pasos) for pasos in range(n_alpha)]
+        self.presupuesto = min(int(presupuesto), n_alpha * n_omega)
+        self._h = 0.5
+
+    def total_evaluaciones(self):
+        return self.presupuesto
+
+    def _alpha(self, pasos):
+        """α del retículo a `pasos` de alpha_min, sin superar alpha_max."""
+        return round(min(self.alpha_min + pasos * self.resolucion_alpha, self.alpha_max), 6)
+
+    def _a_punto(self, u, v):
+        """Convierte coordenadas normalizadas en un punto (α, ω) del retículo."""
+        u = min(max(u, 0.0), 1.0)
+        v = min(max(v, 0.0), 1.0)
+        alpha = self._alpha(round(u * (self.alpha_max - self.alpha_min) / self.resolucion_alpha))
+        if self.omega_max > self.omega_min:
+            omega = int(round(self.omega_min * (self.omega_max / self.omega_min) ** v))
+        else:
+            omega = self.omega_min
+        return alpha, omega
+
+    def _a_normalizado(self, alpha, omega):
+        u = ((alpha - self.alpha_min) / (self.alpha_max - self.alpha_min)
+             if self.alpha_max > self.alpha_min else 0.0)
+        v = (math.log(omega / self.omega_min) / math.log(self.omega_max / self.omega_min)
+             if self.omega_max > self.omega_min else 0.0)
+        return u, v
+
+    def _mas_cercanos(self, centro, evaluados, n):
+        """Los n puntos no evaluados del retículo más cercanos al centro."""
+        cu, cv = self._a_normalizado(*centro)
+        candidatos = []
+        for alpha in self._alphas:
+            for omega in range(self.omega_min, self.omega_max + 1):
+                punto = (alpha, omega)
+                if punto not in evaluados:
+                    u, v = self._a_normalizado(*punto)
+                    candidatos.append(((u - cu) ** 2 + (v - cv) ** 2, punto))
+        candidatos.sort()
+        return [punto for _, punto in candidatos[:n]]
+
+    def proponer(self, historial):
+        """
+        Siguiente ronda de puntos (α, ω) a evaluar.
+
+        Args:
+            historial: Lista de filas ya evaluadas (con ClipLimit, TileSize y
+                la columna objetivo)
+        """
+        restantes = self.presupuesto - len(historial)
+        if restantes <= 0:
+            return []
+
+        evaluados = {(round(float(f['ClipLimit']), 6), int(f['TileSize'])) for f in historial}
+
+        if not historial:
+            rondas = [self._a_punto(u, v) for u in (0.0, 0.5, 1.0) for v in (0.0, 0.5, 1.0)]
+            return list(dict.fromkeys(rondas))[:restantes]
+
+        mejor = max(historial, key=lambda f: f[self.objetivo])
+        centro = (round(float(mejor['ClipLimit']), 6), int(mejor['TileSize']))
+        u0, v0 = self._a_normalizado(*centro)
+
+        # Vecinos a distancia h; reducir h hasta encontrar puntos nuevos
+        while self._h >= 1e-3:
+            vecinos = [self._a_punto(u0 + du * self._h, v0 + dv * self._h)
+                       for du in (-1, 0, 1) for dv in (-1, 0, 1) if du or dv]
+            nuevos = [p for p in dict.fromkeys(vecinos) if p not in evaluados]
+            self._h /= 2
+            if nuevos:
+                return nuevos[:restantes]
+
+        return self._mas_cercanos(centro, evaluados, restantes)
+
+def crear_busqueda(estrategia, clip_limits, tile_sizes, presupuesto=None,
+                   objetivo='Contraste_Local_Promedio'):
+    """Crea una estrategia de búsqueda nueva (una por imagen)."""
+    if estrategia == 'exhaustiva':
+        return BusquedaExhaustiva(clip_limits, tile_sizes)
+    if estrategia == 'grueso_fino':
+        if presupuesto is None:
+            raise ValueError("La búsqueda 'grueso_fino' requiere un presupuesto")
+        return BusquedaGruesoFino(clip_limits, tile_sizes, presupuesto, objetivo)
+    raise ValueError(f"Estrategia de búsqueda desconocida: {estrategia} "
+                     f"(opciones: {ESTRATEGIAS_BUSQUEDA})")
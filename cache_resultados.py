@@ -0,0 +1,143 @@
+import cv2
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# Incrementar cuando cambie el cálculo de cualquier métrica: invalida la caché
+VERSION_METRICAS = 1
+
+def hash_archivo(ruta, tam_bloque=1 << 20):
+    """Hash SHA-256 del contenido de un archivo."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+class CacheResultados:
+    """
+    Caché persistente de experimentos direccionada por contenido.
+
+    Cada entrada se identifica por el hash del archivo de la imagen original,
+    (α, ω) y la versión de las métricas, de modo que el mismo directorio puede
+    compartirse entre distintos directorios de salida y ejecuciones. Guarda
+    las métricas en JSON y, opcionalmente, la imagen CLAHE en PNG:
+
+        <directorio>/<ab>/<clave>.json
+        <directorio>/<ab>/<clave>.png
+
+    Las escrituras son atómicas (archivo temporal + os.replace), por lo que
+    varios procesos pueden usar la misma caché. Si se indica tamano_maximo
+    (bytes), al superarlo se desalojan las entradas usadas menos recientemente.
+    """
+
+    def __init__(self, directorio, tamano_maximo=None, guardar_imagenes=False):
+        self.directorio = Path(directorio)
+        self.tamano_maximo = tamano_maximo
+        self.guardar_imagenes = guardar_imagenes
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._tamano_estimado = self._tamano_total() if tamano_maximo else 0
+
+    @staticmethod
+    def clave(hash_imagen, alpha, omega, variante=''):
+        """
+        Clave de un experimento (imagen, α, ω, versión de métricas).
+
+        variante distingue configuraciones que cambian las métricas para la
+        misma imagen (p. ej. profundidad de bits o binning del histograma).
+        """
+        texto = f"{hash_imagen}|{float(alpha)!r}|{int(omega)}|v{VERSION_METRICAS}"
+        if variante:
+            texto += f"|{variante}"
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def _ruta(self, clave, extension):
+        return self.directorio / clave[:2] / f"{clave}{extension}"
+
+    def obtener(self, clave):
+        """Devuelve el diccionario de métricas en caché, o None si no existe."""
+        ruta = self._ruta(clave, '.json')
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                metricas = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Marcar como usada recientemente para el desalojo LRU
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+        return metricas
+
+    def ruta_imagen(self, clave):
+        """Ruta del PNG en caché para la clave, o None si no se guardó."""
+        ruta = self._ruta(clave, '.png')
+        return ruta if ruta.exists() else None
+
+    def guardar(self, clave, metricas, imagen=None):
+        """Guarda las métricas (y la imagen si guardar_imagenes está activo)."""
+        ruta_json = self._ruta(clave, '.json')
+        ruta_json.parent.mkdir(exist_ok=True)
+        sufijo_tmp = f".{os.getpid()}.tmp"
+        bytes_escritos = 0
+
+        if self.guardar_imagenes and imagen is not None:
+            ruta_png = self._ruta(clave, '.png')
+            tmp_png = ruta_png.with_name(f"{clave}{sufijo_tmp}.png")
+            if cv2.imwrite(str(tmp_png), imagen):
+                os.replace(tmp_png, ruta_png)
+                bytes_escritos += ruta_png.stat().st_size
+
+        # El JSON se escribe al final: su presencia marca la entrada como completa
+        tmp_json = ruta_json.with_name(f"{clave}{sufijo_tmp}.json")
+        with open(tmp_json, 'w', encoding='utf-8') as f:
+            json.dump({k: float(v) for k, v in metricas.items()}, f)
+        os.replace(tmp_json, ruta_json)
+        bytes_escritos += ruta_json.stat().st_size
+
+        if self.tamano_maximo:
+            self._tamano_estimado += bytes_escritos
+            if self._tamano_estimado > self.tamano_maximo:
+                self._desalojar()
+
+    def _entradas(self):
+        """Agrupa los archivos de la caché por clave: {clave: [(ruta, stat)]}."""
+        entradas = {}
+        for subdir in self.directorio.iterdir():
+            if not subdir.is_dir():
+                continue
+            for archivo in subdir.iterdir():
+                if '.tmp' in archivo.name:
+                    continue
+                try:
+                    estado = archivo.stat()
+                except OSError:
+                    continue
+                entradas.setdefault(archivo.name.split('.')[0], []).append((archivo, estado))
+        return entradas
+
+    def _tamano_total(self):
+        return sum(e.st_size for archivos in self._entradas().values() for _, e in archivos)
+
+    def _desalojar(self):
+        """Elimina las entradas menos usadas hasta quedar en el 90 % del máximo."""
+        entradas = self._entradas()
+        tamano = sum(e.st_size for archivos in entradas.values() for _, e in archivos)
+        objetivo = int(self.tamano_maximo * 0.9)
+
+        # El uso reciente se refleja en el mtime del JSON (ver obtener)
+        def ultimo_uso(archivos):
+            return max(e.st_mtime for _, e in archivos)
+
+        for clave, archivos in sorted(entradas.items(), key=lambda kv: ultimo_uso(kv[1])):
+            if tamano <= objetivo:
+                break
+            for archivo, estado in archivos:
+                try:
+                    archivo.unlink()
+                    tamano -= estado.st_size
+                except OSError:
+                    pass
+
+        self._tamano_estimado = tamano
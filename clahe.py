@@ -0,0 +1,41 @@
+import argparse
+import importlib
+import sys
+
+# Subcomando -> (módulo que lo implementa, descripción). El módulo solo se
+# importa al ejecutar su subcomando, de modo que cada uno carga únicamente
+# las librerías que necesita (pandas y matplotlib solo en 'analizar')
+SUBCOMANDOS = {
+    'barrer': ('generar_datos_clahe', "Barrido de parámetros CLAHE con métricas (fase 1)"),
+    'analizar': ('analisis_resultados', "Análisis, gráficos y parámetros óptimos (fase 2)"),
+    'aplicar': ('aplicar_clahe', "Aplicar los parámetros óptimos a imágenes o vídeos (fase 3)"),
+}
+ALIAS = {'sweep': 'barrer', 'analyze': 'analizar', 'apply': 'aplicar'}
+
+def main(argv=None):
+    """
+    Punto de entrada único: python clahe.py <subcomando> [argumentos].
+
+    Los argumentos tras el subcomando se pasan al main() de su módulo
+    (python clahe.py <subcomando> --help muestra los suyos).
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    descripciones = "\n".join(f"  {nombre:<10}{descripcion}"
+                              for nombre, (_, descripcion) in SUBCOMANDOS.items())
+    parser = argparse.ArgumentParser(
+        prog="clahe", usage="%(prog)s [-h] subcomando [argumentos ...]",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="Optimización de parámetros CLAHE con trazabilidad",
+        epilog=f"subcomandos:\n{descripciones}\n\n"
+               f"alias: {', '.join(f'{a} = {n}' for a, n in ALIAS.items())}")
+    parser.add_argument('subcomando', choices=list(SUBCOMANDOS) + list(ALIAS),
+                        metavar='subcomando', help="barrer, analizar o aplicar (ver abajo)")
+    # Solo se interpreta el primer argumento: el resto (incluido --help) es del subcomando
+    args = parser.parse_args(argv[:1])
+
+    nombre = ALIAS.get(args.subcomando, args.subcomando)
+    modulo = importlib.import_module(SUBCOMANDOS[nombre][0])
+    return modulo.main(argv[1:], prog=f"clahe {nombre}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import json
+import os
+import time
+from array import array
+
+import numpy as np
+
+NOMBRE_DIARIO = "resultados_diario.jsonl"
+
+# Filas acumuladas (o segundos transcurridos) antes de escribirlas y
+# sincronizarlas con disco
+LOTE_DIARIO = 256
+INTERVALO_DIARIO_S = 30
+
+# Filas por bloque al volcar el diario a la tabla maestra
+FILAS_POR_BLOQUE = 50_000
+
+def _a_json(valor):
+    """Convierte escalares de NumPy para json.dumps."""
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def _clave_tarea(imagen, alpha, omega):
+    return imagen, round(float(alpha), 6), int(omega)
+
+class DiarioResultados:
+    """
+    Diario de solo anexado (JSON Lines) con las filas de la tabla maestra.
+
+    La primera línea registra la configuración del barrido; cada una de las
+    siguientes es una fila. Las filas se escriben y sincronizan con disco por
+    lotes de `lote` filas o cada `intervalo_s` segundos, de modo que la
+    memoria del barrido no crece con el número de experimentos y una caída
+    pierde como mucho el lote en curso. Una línea final truncada por una
+    interrupción se ignora al leer.
+
+    Al reanudar solo se retiene, por imagen, la posición en el archivo de sus
+    filas ya registradas; las filas se leen bajo demanda con previas().
+    """
+
+    def __init__(self, output_dir, configuracion, reanudar=False, lote=LOTE_DIARIO,
+                 intervalo_s=INTERVALO_DIARIO_S, nombre=NOMBRE_DIARIO):
+        """
+        Args:
+            output_dir: Directorio de resultados
+            configuracion: Diccionario serializable que identifica el barrido
+            reanudar: Continuar un diario existente (debe tener la misma
+                configuración); si no existe se empieza uno nuevo
+            nombre: Nombre del archivo (un diario por shard en barridos repartidos)
+
+        Raises:
+            ValueError: Si se reanuda un diario de otra configuración
+        """
+        self.ruta = os.path.join(output_dir, nombre)
+        self.lote = lote
+        self.intervalo_s = intervalo_s
+        self._pendientes = []
+        self._ultimo_volcado = time.monotonic()
+        # Imagen → desplazamientos (bytes) de sus filas en el diario
+        self.completadas = {}
+        # IDs estrictamente crecientes: la tabla maestra se vuelca sin ordenar
+        self.ordenado = True
+        self._ultimo_id = None
+
+        configuracion = json.loads(json.dumps(configuracion, default=_a_json))
+        if reanudar and os.path.exists(self.ruta):
+            previa = None
+            fin = 0
+            with open(self.ruta, 'rb') as f:
+                for linea in f:
+                    if not linea.endswith(b'\n'):
+                        break
+                    inicio, fin = fin, fin + len(linea)
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        continue
+                    if '_configuracion' in registro:
+                        previa = registro['_configuracion']
+                        continue
+                    self._registrar_id(registro)
+                    self.completadas.setdefault(registro['Imagen_Original'],
+                                                array('q')).append(inicio)
+            if previa != configuracion:
+                raise ValueError(f"El diario {self.ruta} corresponde a otra configuración; "
+                                 f"no se puede reanudar")
+            # Descartar una posible línea final incompleta antes de anexar
+            with open(self.ruta, 'rb+') as f:
+                f.truncate(fin)
+            self._archivo = open(self.ruta, 'a', encoding='utf-8')
+        else:
+            self._archivo = open(self.ruta, 'w', encoding='utf-8')
+            self._archivo.write(json.dumps({'_configuracion': configuracion}) + '\n')
+            self._sincronizar()
+
+    def registradas(self, imagen):
+        """Número de filas de una imagen ya registradas en el diario."""
+        return len(self.completadas.get(imagen, ()))
+
+    def previas(self, imagen):
+        """
+        Filas ya registradas de una imagen, {(α, ω): fila}, leídas del diario;
+        la imagen deja de retenerse en completadas.
+        """
+        desplazamientos = self.completadas.pop(imagen, None)
+        if not desplazamientos:
+            return {}
+        previas = {}
+        with open(self.ruta, 'rb') as f:
+            for desplazamiento in desplazamientos:
+                f.seek(desplazamiento)
+                fila = json.loads(f.readline())
+                previas[_clave_tarea(imagen, fila['ClipLimit'], fila['TileSize'])[1:]] = fila
+        return previas
+
+    def _registrar_id(self, fila):
+        id_experimento = fila['ID_Experimento']
+        if self._ultimo_id is not None and id_experimento <= self._ultimo_id:
+            self.ordenado = False
+        self._ultimo_id = id_experimento
+
+    def anadir(self, filas, previas=None):
+        """Anexa las filas nuevas (las presentes en previas ya constan en el diario)."""
+        for fila in filas:
+            if previas and _clave_tarea(fila['Imagen_Original'], fila['ClipLimit'],
+                                        fila['TileSize'])[1:] in previas:
+                continue
+            self._registrar_id(fila)
+            self._pendientes.append(json.dumps(fila, default=_a_json, ensure_ascii=False))
+        if (len(self._pendientes) >= self.lote
+                or time.monotonic() - self._ultimo_volcado >= self.intervalo_s):
+            self.volcar()
+
+    def volcar(self):
+        if self._pendientes:
+            self._archivo.write('\n'.join(self._pendientes) + '\n')
+            self._pendientes = []
+        self._sincronizar()
+        self._ultimo_volcado = time.monotonic()
+
+    def _sincronizar(self):
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+
+    def cerrar(self):
+        self.volcar()
+        self._archivo.close()
+
+def leer_lineas_diario(ruta):
+    """(configuración, filas) de un diario, ignorando líneas incompletas."""
+    configuracion = None
+    filas = []
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                continue
+            if '_configuracion' in registro:
+                configuracion = registro['_configuracion']
+            else:
+                filas.append(registro)
+    return configuracion, filas
+
+def bloques_diario(ruta, ordenado=True, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Tabla maestra a partir del diario, en DataFrames de hasta filas_por_bloque
+    filas: una fila por ID (la última registrada) ordenada por ID_Experimento.
+
+    Con ordenado (IDs estrictamente crecientes, ver DiarioResultados.ordenado)
+    el diario se recorre una sola vez con memoria acotada por el bloque; en
+    otro caso se carga entero para ordenarlo.
+    """
+    import pandas as pd
+    if not ordenado:
+        print("  Diario con IDs desordenados: se ordena en memoria")
+        _, filas = leer_lineas_diario(ruta)
+        df = pd.DataFrame(filas)
+        if df.empty:
+            return
+        df = df.drop_duplicates('ID_Experimento', keep='last')
+        df = df.sort_values('ID_Experimento', kind='stable').reset_index(drop=True)
+        for inicio in range(0, len(df), filas_por_bloque):
+            yield df.iloc[inicio:inicio + filas_por_bloque].reset_index(drop=True)
+        return
+
+    bloque = []
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                continue
+            if '_configuracion' in registro:
+                continue
+            bloque.append(registro)
+            if len(bloque) >= filas_por_bloque:
+                yield pd.DataFrame(bloque)
+                bloque = []
+    if bloque:
+        yield pd.DataFrame(bloque)
@@ -0,0 +1,45 @@
+import json
+import numpy as np
+from pathlib import Path
+
+# Formatos que pueden abrirse mapeados en memoria (sin leer la imagen completa)
+EXTENSIONES_MAPEADAS = ['.npy', '.raw', '.tif', '.tiff']
+
+def abrir_imagen_mapeada(ruta):
+    """
+    Abre una imagen en escala de grises como array mapeado en memoria (solo lectura).
+
+    Formatos admitidos:
+        .npy          Array 2-D de NumPy
+        .raw          Píxeles sin cabecera; la forma se lee de un archivo
+                      hermano .json con {"alto": ..., "ancho": ..., "dtype": "uint8"}
+        .tif / .tiff  TIFF sin compresión (requiere tifffile)
+
+    Raises:
+        ValueError: Si el formato no se admite o el contenido no es una
+            imagen 2-D mapeable
+    """
+    ruta = Path(ruta)
+    sufijo = ruta.suffix.lower()
+
+    if sufijo == '.npy':
+        imagen = np.load(ruta, mmap_mode='r')
+    elif sufijo == '.raw':
+        with open(ruta.with_suffix('.json'), 'r', encoding='utf-8') as f:
+            descriptor = json.load(f)
+        imagen = np.memmap(ruta, dtype=descriptor.get('dtype', 'uint8'), mode='r',
+                           shape=(int(descriptor['alto']), int(descriptor['ancho'])))
+    elif sufijo in ('.tif', '.tiff'):
+        try:
+            import tifffile
+        except ImportError:
+            raise ImportError("La lectura mapeada de TIFF requiere tifffile "
+                              "(pip install tifffile)")
+        # Falla con ValueError si el TIFF está comprimido o no es contiguo
+        imagen = tifffile.memmap(ruta, mode='r')
+    else:
+        raise ValueError(f"Formato no admitido para lectura mapeada: {sufijo}")
+
+    if imagen.ndim != 2:
+        raise ValueError(f"Se esperaba una imagen 2-D en escala de grises: {imagen.shape}")
+    return imagen
@@ -1,17 +1,36 @@
+import argparse
 import cv2
 import numpy as np
 import os
-import json
-import pandas as pd
 from pathlib import Path
-from scipy.stats import entropy
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from almacenamiento import (FORMATOS_IMAGEN, MODOS_ALMACENAMIENTO, crear_almacen,
+                            finalizar_almacen, preparar_almacen)
+from busqueda_adaptativa import crear_busqueda
+from cache_resultados import CacheResultados, hash_archivo
+from diario_resultados import NOMBRE_DIARIO, DiarioResultados, bloques_diario
+from entrada_mapeada import EXTENSIONES_MAPEADAS, abrir_imagen_mapeada
+from instrumentacion import (AcumuladorTiempos, Cronometro, combinar_perfiles, medir, perfilar,
+                             pico_memoria_mb, reiniciar_pico_memoria)
+from motor_clahe import HistogramasBaldosas, clahe_lote
+from precarga import CargadorAnticipado
+from region_interes import MARGEN_RECORTE, cargar_region_interes, es_archivo_auxiliar
+from registro_metricas import METRICAS, EvaluadorMetricas, columnas_metricas, resolver_metricas
+from reparto_trabajo import ColaTrabajo, nodo_por_defecto, nombre_diario_shard, parsear_shard
+from secuencias import (DIR_FOTOGRAMAS_CLAVE, EXTENSIONES_TIFF, EXTENSIONES_VIDEO,
+                        es_secuencia, extraer_fotogramas_clave)
+
+MOTORES_CLAHE = ('opencv', 'numpy')
+
+COLUMNAS_METRICAS = columnas_metricas()
 
 def calcular_entropia(imagen):
     """Calcula la entropía de Shannon de la imagen."""
-    histograma = cv2.calcHist([imagen], [0], None, [256], [0, 256])
-    histograma = histograma.flatten() / histograma.sum()
-    histograma = histograma[histograma > 0]
-    return entropy(histograma, base=2)
+    histograma = cv2.calcHist([imagen], [0], None, [256], [0, 256]).ravel()
+    p = histograma[histograma > 0] / histograma.sum()
+    return float(-np.sum(p * np.log2(p)))
 
 def calcular_contraste_local_promedio(imagen, kernel_size=3):
     """Calcula el contraste local promedio usando la desviación estándar local."""
@@ -31,13 +50,785 @@ def calcular_nitidez_borde(imagen):
 
 def calcular_contraste_michelson(imagen):
     """Calcula el contraste de Michelson global."""
-    I_max = np.max(imagen)
-    I_min = np.min(imagen)
+    # Enteros de Python: la suma de dos uint8 desborda y falsea el resultado
+    I_max = int(np.max(imagen))
+    I_min = int(np.min(imagen))
     if I_max + I_min == 0:
         return 0
     return (I_max - I_min) / (I_max + I_min)
 
-def procesar_imagenes_clahe(input_dir, output_dir, clip_limits, tile_sizes):
+# Evaluador del proceso actual (uno por trabajador del pool)
+_evaluador_proceso = None
+
+def _evaluador(bins=None, metricas=None):
+    """Devuelve el evaluador de métricas del proceso, creándolo si hace falta."""
+    global _evaluador_proceso
+    metricas = resolver_metricas(metricas)
+    if (_evaluador_proceso is None or _evaluador_proceso.bins != bins
+            or _evaluador_proceso.metricas != metricas):
+        _evaluador_proceso = EvaluadorMetricas(bins=bins, metricas=metricas)
+    return _evaluador_proceso
+
+def _metricas_nulas(metricas=None):
+    """Métricas a cero que se registran cuando falla su cálculo."""
+    return {clave: 0 for clave in resolver_metricas(metricas)}
+
+def _mostrar_metricas(metricas):
+    """Imprime cada métrica con su etiqueta del registro."""
+    for clave, valor in metricas.items():
+        print(f"  {METRICAS[clave].etiqueta}: {valor:.4f}")
+
+def _cargar_imagen(img_path, mapeada=False, alta_profundidad=False):
+    """
+    Carga una imagen en escala de grises (None si no se puede leer).
+    
+    Con mapeada=True la imagen se abre mapeada en memoria (ver
+    entrada_mapeada) y los píxeles solo se leen al recorrerla por franjas.
+    Con alta_profundidad=True se conserva la profundidad original (uint8 o
+    uint16, p. ej. datos de 12/16 bits) en lugar de reducirla a 8 bits.
+    """
+    if not mapeada:
+        if not alta_profundidad:
+            return cv2.imread(str(img_path), cv2.IMREAD_GRAYSCALE)
+        imagen = cv2.imread(str(img_path), cv2.IMREAD_ANYDEPTH)
+        if imagen is None:
+            return None
+    else:
+        try:
+            imagen = abrir_imagen_mapeada(img_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  ✗ {img_path.name}: {e}")
+            return None
+    
+    admitidos = (np.uint8, np.uint16) if alta_profundidad else (np.uint8,)
+    if imagen.dtype not in admitidos:
+        print(f"  ✗ {img_path.name}: tipo no admitido {imagen.dtype} "
+              f"(admitidos: {', '.join(np.dtype(t).name for t in admitidos)})")
+        return None
+    return imagen
+
+def _cargar_instrumentada(img_path, opciones, obtener=None):
+    """
+    Carga la imagen según las opciones del barrido y, si la instrumentación
+    está activa, crea su cronómetro (con la carga medida) y reinicia el pico
+    de memoria del proceso.
+    
+    Args:
+        obtener: Función sin argumentos que devuelve la imagen ya cargada
+            en segundo plano (ver CargadorAnticipado); la etapa Carga mide
+            entonces solo la espera
+    
+    Returns:
+        (imagen o None, cronómetro o None)
+    """
+    cronometro = None
+    if opciones['instrumentar']:
+        cronometro = Cronometro()
+        reiniciar_pico_memoria()
+    with medir(cronometro, 'Carga'):
+        if obtener is not None:
+            imagen = obtener()
+        else:
+            imagen = _cargar_imagen(img_path, opciones['filas_franja'] is not None,
+                                    opciones['alta_profundidad'])
+    return imagen, cronometro
+
+def _cabecera_legible(img_path, mapeada=False, alta_profundidad=False):
+    """
+    Indica, sin decodificar los píxeles, si la imagen parece legible (usado
+    para numerar en paralelo): las mapeadas se abren, lo que solo lee su
+    cabecera, y el resto se comprueba con la firma del archivo
+    (cv2.haveImageReader).
+    """
+    if mapeada:
+        return _cargar_imagen(img_path, True, alta_profundidad) is not None
+    return cv2.haveImageReader(str(img_path))
+
+def _generar_salidas_clahe(imagen_original, puntos, motor, cronometro=None, claves=None):
+    """
+    Aplica CLAHE a cada punto (α, ω) y genera pares (índice, imagen_modificada).
+    
+    Con motor='numpy' los puntos se agrupan por ω: los histogramas por baldosa
+    se calculan una sola vez por grupo y todos los α se resuelven en lote.
+    Con cronómetro, el tiempo de CLAHE se registra con claves[índice] (en el
+    motor numpy, el de cada lote se reparte entre sus puntos).
+    """
+    if motor == 'opencv':
+        for indice, (alpha, omega) in enumerate(puntos):
+            with medir(cronometro, 'CLAHE', claves and claves[indice]):
+                clahe = cv2.createCLAHE(clipLimit=alpha, tileGridSize=(omega, omega))
+                imagen_modificada = clahe.apply(imagen_original)
+            yield indice, imagen_modificada
+    else:
+        grupos = {}
+        for indice, (alpha, omega) in enumerate(puntos):
+            grupos.setdefault(omega, []).append(indice)
+        for omega, indices in grupos.items():
+            lote = Cronometro()
+            with medir(lote, 'CLAHE'):
+                salidas = clahe_lote(imagen_original, [puntos[i][0] for i in indices], omega)
+            if cronometro is not None:
+                cronometro.repartir('CLAHE', [claves[i] for i in indices],
+                                    *lote.tiempo('CLAHE'))
+            for indice, imagen_modificada in zip(indices, salidas):
+                yield indice, imagen_modificada
+
+def _generar_metricas_franjas(imagen_original, puntos, filas_franja, destinos, bins=None,
+                              cronometro=None, claves=None, metricas=None, zona=None):
+    """
+    Aplica CLAHE y calcula las métricas por franjas de filas, sin materializar
+    la imagen completa, y genera pares (índice, métricas).
+    
+    Para cada ω los histogramas por baldosa se acumulan en una primera pasada
+    por franjas; en la segunda se interpola cada franja (con self.halo filas
+    de contexto por encima y por debajo para los filtros) para todos los α a
+    la vez y se acumulan las sumas de las métricas. La salida CLAHE coincide
+    bit a bit con la ruta en memoria; las métricas solo difieren en el orden
+    de suma en float64. La memoria de trabajo es proporcional a filas_franja
+    × ancho × número de α del grupo.
+    
+    Args:
+        destinos: Arrays (p. ej. np.memmap) donde escribir cada salida, o None
+        bins: Intervalos del histograma para la entropía (ver EvaluadorMetricas)
+        cronometro, claves: Instrumentación opcional, como en _generar_salidas_clahe
+        metricas: Métricas a calcular (ver registro_metricas; None = las cuatro clásicas)
+        zona: (recorte, máscara) de la región de interés (ver _zona_metricas):
+            las sumas solo se calculan en las franjas que la cortan y sobre
+            las columnas del recorte (None = imagen completa)
+    """
+    evaluador = _evaluador(bins, metricas)
+    alto = imagen_original.shape[0]
+    (filas_zona, columnas_zona), mascara = zona or ((slice(0, alto), slice(None)), None)
+    r0, r1 = filas_zona.start, filas_zona.stop
+    
+    grupos = {}
+    for indice, (alpha, omega) in enumerate(puntos):
+        grupos.setdefault(omega, []).append(indice)
+    
+    for omega, indices in grupos.items():
+        lote = Cronometro()
+        with medir(lote, 'CLAHE'):
+            histogramas = HistogramasBaldosas(imagen_original, omega, filas_franja)
+            luts = histogramas.luts_interpolacion([puntos[i][0] for i in indices])
+        acumulados = [None] * len(indices)
+        
+        for y0 in range(0, alto, filas_franja):
+            y1 = min(y0 + filas_franja, alto)
+            e0, e1 = max(y0 - evaluador.halo, 0), min(y1 + evaluador.halo, alto)
+            with medir(lote, 'CLAHE'):
+                salidas = histogramas.aplicar_filas(luts, e0, e1)
+            # Filas de la franja dentro de la zona de métricas y su contexto
+            m0, m1 = max(y0, r0), min(y1, r1)
+            evaluar = m0 < m1 and (mascara is None or mascara[m0 - r0:m1 - r0].any())
+            c0, c1 = max(m0 - evaluador.halo, r0), min(m1 + evaluador.halo, r1)
+            for k, indice in enumerate(indices):
+                if destinos[indice] is not None:
+                    destinos[indice][y0:y1] = salidas[k, y0 - e0:y1 - e0]
+                if not evaluar:
+                    continue
+                franja = np.ascontiguousarray(salidas[k, c0 - e0:c1 - e0, columnas_zona])
+                parciales = evaluador.sumas(franja, m0 - c0, m1 - c0, cronometro,
+                                            claves and claves[indice],
+                                            imagen_original[c0:c1, columnas_zona],
+                                            None if mascara is None
+                                            else mascara[c0 - r0:c1 - r0])
+                acumulados[k] = evaluador.acumular(acumulados[k], parciales)
+        
+        if cronometro is not None:
+            cronometro.repartir('CLAHE', [claves[i] for i in indices], *lote.tiempo('CLAHE'))
+        for k, indice in enumerate(indices):
+            if destinos[indice] is not None:
+                destinos[indice].flush()
+            yield indice, evaluador.metricas_desde_sumas(acumulados[k], cronometro=cronometro,
+                                                         clave=claves and claves[indice])
+
+def _calcular_metricas(imagen_modificada, id_experimento, verbose=True, bins=None,
+                       cronometro=None, metricas=None, referencia=None, zona=None):
+    """
+    Calcula las métricas seleccionadas de un experimento (None si falla el
+    cálculo). referencia es la imagen original, para las que la requieren, y
+    zona la región de interés (ver _zona_metricas; None = imagen completa).
+    """
+    # D. CÁLCULO DE MÉTRICAS
+    mascara = None
+    if zona is not None:
+        recorte, mascara = zona
+        imagen_modificada = np.ascontiguousarray(imagen_modificada[recorte])
+        referencia = None if referencia is None else referencia[recorte]
+    try:
+        valores = _evaluador(bins, metricas).evaluar(imagen_modificada, cronometro,
+                                                     id_experimento, referencia, mascara)
+    except Exception as e:
+        print(f"  ✗ Error calculando métricas (experimento {id_experimento}): {e}")
+        return None
+    
+    if verbose:
+        _mostrar_metricas(valores)
+    
+    return valores
+
+def _fila_resultado(img_path, id_experimento, alpha, omega, metricas):
+    """Fila de la tabla maestra para un experimento (una columna por métrica)."""
+    # F. ALMACENAMIENTO MAESTRO (ANÁLISIS)
+    fila = {
+        'ID_Experimento': id_experimento,
+        'Imagen_Original': img_path.name,
+        'ClipLimit': alpha,
+        'TileSize': omega
+    }
+    fila.update({METRICAS[clave].columna: valor for clave, valor in metricas.items()})
+    return fila
+
+def _zona_metricas(region, forma, opciones):
+    """
+    (recorte, máscara) sobre el que se calculan las métricas de una región
+    de interés: su caja más el halo de los filtros de las métricas, de modo
+    que los píxeles de la región dan los mismos valores que en la imagen
+    completa sin filtrar el resto (None si no hay región).
+    """
+    if region is None:
+        return None
+    return region.zona(forma, _evaluador(opciones['bins_histograma'], opciones['metricas']).halo)
+
+def _cargar_region(img_path, imagen_original, opciones, verbose=True):
+    """
+    Carga la región de interés de una imagen (ver region_interes) si está
+    activada y la imagen tiene máscara o caja.
+    
+    Con clahe_recorte, CLAHE se aplica solo al recorte de la región con
+    MARGEN_RECORTE píxeles de contexto (la rejilla de baldosas cubre el
+    recorte) y la imagen devuelta es ese recorte. Un archivo de región no
+    válido se avisa y la imagen se evalúa completa.
+    
+    Returns:
+        (imagen sobre la que aplicar CLAHE, región en sus coordenadas o None)
+    """
+    if not opciones['region_interes']:
+        return imagen_original, None
+    try:
+        region = cargar_region_interes(img_path, imagen_original.shape)
+    except (OSError, ValueError) as e:
+        print(f"  ✗ {img_path.name}: {e} (se evalúa la imagen completa)")
+        return imagen_original, None
+    if region is None:
+        return imagen_original, None
+    
+    if verbose:
+        y0, y1, x0, x1 = region.caja
+        print(f"✓ Región de interés: filas {y0}-{y1}, columnas {x0}-{x1} "
+              f"({100 * region.pixeles / imagen_original.size:.1f} % de los píxeles)")
+    if opciones['clahe_recorte']:
+        margen = max(MARGEN_RECORTE,
+                     _evaluador(opciones['bins_histograma'], opciones['metricas']).halo)
+        (filas, columnas), _ = region.zona(imagen_original.shape, margen)
+        imagen_original = imagen_original[filas, columnas]
+        if opciones['filas_franja'] is None:
+            imagen_original = np.ascontiguousarray(imagen_original)
+        region = region.desplazada(-filas.start, -columnas.start)
+    return imagen_original, region
+
+def _evaluar_puntos(img_path, imagen_original, puntos, id_base, opciones, almacen,
+                    hash_imagen=None, verbose=True, cronometro=None, previas=None, zona=None):
+    """
+    Evalúa una lista de puntos (α, ω) y devuelve sus filas en el mismo orden.
+    
+    El punto i recibe el ID id_base + i + 1 con independencia del orden en
+    que el motor produzca las salidas. Con caché, los experimentos ya
+    calculados solo se ensamblan: si la caché guarda la imagen (o el modo de
+    salida no la necesita) no se vuelve a aplicar CLAHE; en cualquier caso
+    se omite el cálculo de métricas.
+    
+    Los puntos presentes en previas ({(α, ω): fila} de un diario reanudado)
+    se toman tal cual, sin volver a calcularlos ni a guardarlos.
+    
+    Con cronómetro, cada fila incluye las columnas de tiempo por etapa.
+    
+    Con zona (ver _zona_metricas), las métricas se calculan solo sobre la
+    región de interés.
+    
+    Solo se calculan las métricas de opciones['metricas']; una entrada de
+    caché sin alguna de ellas cuenta como fallo y, al recalcularla, se
+    guarda junto con las que ya tenía.
+    """
+    cache = opciones['cache']
+    filas = [None] * len(puntos)
+    
+    restantes = range(len(puntos))
+    if previas:
+        for indice, (alpha, omega) in enumerate(puntos):
+            filas[indice] = previas.get((round(float(alpha), 6), int(omega)))
+        restantes = [i for i in restantes if filas[i] is None]
+        if verbose:
+            print(f"✓ Diario: {len(puntos) - len(restantes)}/{len(puntos)} "
+                  f"experimentos ya registrados")
+    
+    # Consultar la caché: (métricas, ruta PNG) por índice acertado
+    claves = [None] * len(puntos)
+    aciertos = {}
+    guardadas = {}
+    if cache is not None:
+        for indice in restantes:
+            alpha, omega = puntos[indice]
+            claves[indice] = cache.clave(hash_imagen, alpha, omega, opciones['variante_cache'])
+            metricas = cache.obtener(claves[indice])
+            if metricas is None:
+                continue
+            if all(clave in metricas for clave in opciones['metricas']):
+                metricas = {clave: metricas[clave] for clave in opciones['metricas']}
+                aciertos[indice] = (metricas, cache.ruta_imagen(claves[indice]))
+            else:
+                guardadas[indice] = metricas
+        if verbose:
+            print(f"✓ Caché: {len(aciertos)}/{len(restantes)} experimentos ya calculados")
+    
+    pendientes = []
+    for indice in restantes:
+        if indice in aciertos and (aciertos[indice][1] is not None
+                                   or not almacen.requiere_imagen):
+            alpha, omega = puntos[indice]
+            metricas, ruta_png = aciertos[indice]
+            filas[indice] = _fila_resultado(img_path, id_base + indice + 1, alpha,
+                                            omega, metricas)
+            almacen.guardar(filas[indice], ruta_imagen_cache=ruta_png)
+        else:
+            pendientes.append(indice)
+    
+    if opciones['filas_franja'] is not None:
+        _evaluar_pendientes_franjas(img_path, imagen_original, puntos, pendientes, id_base,
+                                    opciones, almacen, filas, claves, aciertos, guardadas,
+                                    verbose, cronometro, zona)
+        return _anadir_tiempos(filas, cronometro)
+    
+    # C. PROCESAMIENTO - Aplicar CLAHE
+    salidas = _generar_salidas_clahe(imagen_original, [puntos[i] for i in pendientes],
+                                     opciones['motor'], cronometro,
+                                     [id_base + i + 1 for i in pendientes])
+    for iteracion_actual, (j, imagen_modificada) in enumerate(salidas, 1):
+        indice = pendientes[j]
+        alpha, omega = puntos[indice]
+        id_experimento = id_base + indice + 1
+        
+        if verbose:
+            print(f"\n[{iteracion_actual}/{len(pendientes)}] Experimento {id_experimento}: α={alpha:.2f}, ω={omega}")
+        
+        if indice in aciertos:
+            metricas = aciertos[indice][0]
+        else:
+            metricas = _calcular_metricas(imagen_modificada, id_experimento, verbose,
+                                          opciones['bins_histograma'], cronometro,
+                                          opciones['metricas'], imagen_original, zona)
+            if metricas is None:
+                metricas = _metricas_nulas(opciones['metricas'])
+            elif cache is not None:
+                cache.guardar(claves[indice], {**guardadas.get(indice, {}), **metricas},
+                              imagen_modificada)
+        
+        filas[indice] = _fila_resultado(img_path, id_experimento, alpha, omega, metricas)
+        almacen.guardar(filas[indice], imagen_modificada)
+    
+    return _anadir_tiempos(filas, cronometro)
+
+def _anadir_tiempos(filas, cronometro):
+    """Añade a cada fila sus columnas de tiempo por etapa (si hay cronómetro)."""
+    if cronometro is not None:
+        for fila in filas:
+            fila.update(cronometro.columnas(fila['ID_Experimento']))
+    return filas
+
+def _evaluar_pendientes_franjas(img_path, imagen_original, puntos, pendientes, id_base,
+                                opciones, almacen, filas, claves, aciertos, guardadas,
+                                verbose, cronometro=None, zona=None):
+    """Parte de _evaluar_puntos que procesa los puntos pendientes por franjas."""
+    cache = opciones['cache']
+    destinos = [
+        almacen.crear_imagen_mapeada(id_base + indice + 1, imagen_original.shape,
+                                     imagen_original.dtype)
+        if almacen.requiere_imagen else None
+        for indice in pendientes
+    ]
+    
+    # C. PROCESAMIENTO - Aplicar CLAHE y acumular métricas por franjas
+    resultados = _generar_metricas_franjas(imagen_original, [puntos[i] for i in pendientes],
+                                           opciones['filas_franja'], destinos,
+                                           opciones['bins_histograma'], cronometro,
+                                           [id_base + i + 1 for i in pendientes],
+                                           opciones['metricas'], zona)
+    for iteracion_actual, (j, metricas) in enumerate(resultados, 1):
+        indice = pendientes[j]
+        alpha, omega = puntos[indice]
+        id_experimento = id_base + indice + 1
+        
+        if verbose:
+            print(f"\n[{iteracion_actual}/{len(pendientes)}] Experimento {id_experimento}: "
+                  f"α={alpha:.2f}, ω={omega} (por franjas)")
+            _mostrar_metricas(metricas)
+        
+        if indice in aciertos:
+            metricas = aciertos[indice][0]
+        elif cache is not None:
+            cache.guardar(claves[indice], {**guardadas.get(indice, {}), **metricas})
+        
+        filas[indice] = _fila_resultado(img_path, id_experimento, alpha, omega, metricas)
+        # La imagen ya se escribió franja a franja en su destino mapeado
+        almacen.guardar(filas[indice])
+
+def _crear_busqueda(opciones):
+    """Estrategia de búsqueda nueva según las opciones del barrido."""
+    return crear_busqueda(opciones['busqueda'], opciones['clip_limits'],
+                          opciones['tile_sizes'], opciones['presupuesto'],
+                          opciones['objetivo'])
+
+def _evaluaciones_por_imagen(opciones):
+    """Número fijo de experimentos registrados por imagen (para numerar en paralelo)."""
+    evaluaciones = _crear_busqueda(opciones).total_evaluaciones()
+    if opciones['proxy_escala'] is not None:
+        evaluaciones = min(evaluaciones, opciones['proxy_top_k'])
+    return evaluaciones
+
+def _cribado_proxy(img_path, imagen_original, opciones, region=None):
+    """
+    Ejecuta la búsqueda sobre una copia reducida de la imagen.
+    
+    La rejilla de baldosas de CLAHE se expresa en número de baldosas, de
+    modo que con el mismo ω cada baldosa del proxy cubre la misma región de
+    la imagen que a resolución completa (su tamaño en píxeles se escala con
+    la imagen) y el clip limit, relativo al área de la baldosa, es
+    equivalente. Solo se calculan métricas (sobre la región de interés
+    reescalada, si la hay): no se almacena nada.
+    
+    Returns:
+        Filas proxy ordenadas por Proxy_Rango (1 = mejor según el objetivo)
+    """
+    escala = opciones['proxy_escala']
+    proxy = cv2.resize(imagen_original, None, fx=escala, fy=escala,
+                       interpolation=cv2.INTER_AREA)
+    zona = None
+    if region is not None:
+        zona = _zona_metricas(region.escalada(escala, proxy.shape), proxy.shape, opciones)
+    
+    busqueda = _crear_busqueda(opciones)
+    historial = []
+    while True:
+        puntos = busqueda.proponer(historial)
+        if not puntos:
+            break
+        ronda = [None] * len(puntos)
+        for indice, imagen_modificada in _generar_salidas_clahe(proxy, puntos, opciones['motor']):
+            alpha, omega = puntos[indice]
+            metricas = _calcular_metricas(imagen_modificada, 'proxy', verbose=False,
+                                          bins=opciones['bins_histograma'],
+                                          metricas=opciones['metricas'], referencia=proxy,
+                                          zona=zona)
+            if metricas is None:
+                metricas = _metricas_nulas(opciones['metricas'])
+            ronda[indice] = _fila_resultado(img_path, None, alpha, omega, metricas)
+        historial.extend(ronda)
+    
+    # Orden estable: a igualdad de objetivo se conserva el orden de evaluación
+    historial.sort(key=lambda f: f[opciones['objetivo']], reverse=True)
+    filas_proxy = []
+    for rango, fila in enumerate(historial, 1):
+        fila_proxy = {
+            'Imagen_Original': fila['Imagen_Original'],
+            'ClipLimit': fila['ClipLimit'],
+            'TileSize': fila['TileSize']
+        }
+        fila_proxy.update({f"Proxy_{m}": fila[m]
+                           for m in columnas_metricas(opciones['metricas'])})
+        fila_proxy['Proxy_Rango'] = rango
+        fila_proxy['ID_Experimento'] = None
+        filas_proxy.append(fila_proxy)
+    return filas_proxy
+
+def _procesar_imagen(img_path, imagen_original, id_inicial, opciones, verbose=True,
+                     cronometro=None, previas=None):
+    """
+    Ejecuta la búsqueda de parámetros (α, ω) sobre una imagen ya cargada.
+    
+    La estrategia propone puntos por rondas; todos los puntos evaluados se
+    registran con IDs consecutivos a partir de id_inicial + 1. Con la
+    búsqueda exhaustiva hay una única ronda con la rejilla completa en el
+    orden del bucle anidado original (α externo, ω interno).
+    
+    Con cribado proxy, la búsqueda se ejecuta sobre una copia reducida y
+    solo los proxy_top_k mejores puntos se evalúan a resolución completa (en
+    orden de Proxy_Rango); sus filas incluyen las métricas proxy.
+    
+    Con cronómetro, las filas incluyen los tiempos por etapa y el pico de
+    memoria residente del proceso durante la imagen (Pico_RSS_MB).
+    
+    previas son las filas de la imagen ya registradas en un diario
+    reanudado; esos puntos no se vuelven a evaluar.
+    
+    Con region_interes, las métricas se calculan solo sobre la región de la
+    imagen (ver _cargar_region).
+    
+    Returns:
+        (filas para la tabla maestra ordenadas por ID, filas proxy)
+    """
+    # B. BUCLE DE EXPERIMENTACIÓN
+    hash_imagen = hash_archivo(img_path) if opciones['cache'] is not None else None
+    imagen_original, region = _cargar_region(img_path, imagen_original, opciones, verbose)
+    if region is not None and hash_imagen is not None:
+        # La región forma parte de la identidad del experimento en la caché
+        hash_imagen = f"{hash_imagen}-{region.firma}"
+    zona = _zona_metricas(region, imagen_original.shape, opciones)
+    
+    # E. ALMACENAMIENTO LOCAL (TRAZABILIDAD)
+    almacen = crear_almacen(opciones['modo_salida'], opciones['output_dir'], cronometro,
+                            opciones['hilos_escritura'], opciones['formato_imagen'],
+                            opciones['compresion_png'])
+    
+    filas = []
+    filas_proxy = []
+    if opciones['proxy_escala'] is not None:
+        filas_proxy = _cribado_proxy(img_path, imagen_original, opciones, region)
+        promovidas = filas_proxy[:opciones['proxy_top_k']]
+        if verbose:
+            print(f"✓ Cribado proxy (escala {opciones['proxy_escala']}): "
+                  f"{len(filas_proxy)} candidatos, {len(promovidas)} promovidos")
+        puntos = [(f['ClipLimit'], f['TileSize']) for f in promovidas]
+        filas = _evaluar_puntos(img_path, imagen_original, puntos, id_inicial, opciones,
+                                almacen, hash_imagen, verbose, cronometro, previas, zona)
+        for fila, fila_proxy in zip(filas, promovidas):
+            fila_proxy['ID_Experimento'] = fila['ID_Experimento']
+            fila.update({c: v for c, v in fila_proxy.items() if c.startswith('Proxy_')})
+    else:
+        busqueda = _crear_busqueda(opciones)
+        while True:
+            puntos = busqueda.proponer(filas)
+            if not puntos:
+                break
+            filas.extend(_evaluar_puntos(img_path, imagen_original, puntos,
+                                         id_inicial + len(filas), opciones, almacen,
+                                         hash_imagen, verbose, cronometro, previas, zona))
+    
+    almacen.cerrar()
+    if cronometro is not None:
+        pico = pico_memoria_mb()
+        for fila in filas:
+            fila['Pico_RSS_MB'] = pico
+    return filas, filas_proxy
+
+class _ResumenMaestro:
+    """
+    Estadísticas de la tabla maestra acumuladas bloque a bloque mientras se
+    escribe: recuento, media, desviación, mínimo y máximo por columna numérica
+    (medias y varianzas combinadas por bloques), tiempos por etapa y, con
+    cribado proxy, las columnas de la correlación proxy/final.
+    """
+    
+    def __init__(self, objetivo, instrumentar):
+        self.filas = 0
+        self.tiempos = AcumuladorTiempos() if instrumentar else None
+        self._objetivo = objetivo
+        # Columna → [n, media, suma de cuadrados de las desviaciones, mínimo, máximo]
+        self._columnas = {}
+        self._promovidos = []
+    
+    def observar(self, bloques):
+        """Genera los bloques sin modificarlos, acumulando sus estadísticas."""
+        for bloque in bloques:
+            self._anadir(bloque)
+            yield bloque
+    
+    def _anadir(self, df):
+        self.filas += len(df)
+        for columna in df.select_dtypes('number').columns:
+            valores = df[columna].dropna().to_numpy(dtype=float)
+            acumulado = self._columnas.setdefault(columna, [0, 0.0, 0.0, np.inf, -np.inf])
+            if not len(valores):
+                continue
+            n, media = len(valores), valores.mean()
+            total = acumulado[0] + n
+            delta = media - acumulado[1]
+            acumulado[2] += (((valores - media) ** 2).sum()
+                             + delta ** 2 * acumulado[0] * n / total)
+            acumulado[1] += delta * n / total
+            acumulado[0] = total
+            acumulado[3] = min(acumulado[3], valores.min())
+            acumulado[4] = max(acumulado[4], valores.max())
+        if self.tiempos is not None:
+            self.tiempos.anadir(df)
+        columna_proxy = f"Proxy_{self._objetivo}"
+        if columna_proxy in df.columns:
+            self._promovidos.append(df[['Imagen_Original', columna_proxy, self._objetivo]])
+    
+    def maximo(self, columna):
+        """Máximo de una columna numérica (None si no consta)."""
+        acumulado = self._columnas.get(columna)
+        return acumulado[4] if acumulado and acumulado[0] else None
+    
+    def describir(self):
+        """Como DataFrame.describe(), sin los cuartiles."""
+        import pandas as pd
+        return pd.DataFrame({
+            columna: {'count': n,
+                      'mean': media if n else np.nan,
+                      'std': np.sqrt(m2 / (n - 1)) if n > 1 else np.nan,
+                      'min': minimo if n else np.nan,
+                      'max': maximo if n else np.nan}
+            for columna, (n, media, m2, minimo, maximo) in self._columnas.items()})
+    
+    def promovidos(self):
+        """Imagen, objetivo proxy y objetivo final de los promovidos (None sin proxy)."""
+        import pandas as pd
+        return pd.concat(self._promovidos, ignore_index=True) if self._promovidos else None
+
+def _resumen_proxy(df_promovidos, df_proxy, objetivo):
+    """Correlación de Spearman por imagen entre el objetivo proxy y el final."""
+    if df_promovidos is None or df_promovidos.empty:
+        return
+    correlaciones = []
+    for _, grupo in df_promovidos.groupby('Imagen_Original'):
+        if len(grupo) > 2:
+            correlaciones.append(grupo[f"Proxy_{objetivo}"].corr(grupo[objetivo],
+                                                                method='spearman'))
+    print(f"✓ Candidatos evaluados en proxy: {len(df_proxy)}; "
+          f"promovidos a resolución completa: {len(df_promovidos)}")
+    if correlaciones:
+        print(f"✓ Correlación de Spearman proxy/final ({objetivo}) entre promovidos: "
+              f"media {np.nanmean(correlaciones):.3f}")
+
+def _inicializar_trabajador():
+    """Evita sobresuscripción: cada proceso usa un único hilo de OpenCV."""
+    cv2.setNumThreads(1)
+
+def _trabajador_imagen(tarea):
+    """Tarea del pool: carga una imagen y ejecuta su búsqueda completa."""
+    img_path, id_inicial, opciones, previas = tarea
+    perfil = opciones['perfil'] and f"{opciones['perfil']}.{id_inicial:06d}"
+    with perfilar(perfil):
+        imagen_original, cronometro = _cargar_instrumentada(img_path, opciones)
+        if imagen_original is None:
+            return None
+        return _procesar_imagen(img_path, imagen_original, id_inicial, opciones,
+                                verbose=False, cronometro=cronometro, previas=previas)
+
+def _imagen_completa(registradas, opciones):
+    """Indica si el diario ya contiene todas las evaluaciones (registradas) de una imagen."""
+    return (opciones['proxy_escala'] is None
+            and registradas >= _evaluaciones_por_imagen(opciones))
+
+def _tareas_repartidas(imagenes, opciones, diario, posiciones, cola=None):
+    """
+    Tareas del pool para un barrido repartido, generadas de forma perezosa
+    (las imágenes de una cola se reclaman a medida que se consumen). El
+    bloque de IDs de cada imagen es su posición en la lista global.
+    """
+    evaluaciones = _evaluaciones_por_imagen(opciones)
+    for img_path in imagenes:
+        if _imagen_completa(diario.registradas(img_path.name), opciones):
+            print(f"✓ {img_path.name}: ya registrada en el diario")
+            if cola is not None:
+                cola.completar(img_path)
+            continue
+        yield (img_path, posiciones[img_path] * evaluaciones, opciones,
+               diario.previas(img_path.name))
+
+def _mapa_acotado(pool, funcion, tareas, ventana):
+    """
+    Como pool.map, pero consume las tareas de forma perezosa con como mucho
+    `ventana` en curso. Genera pares (tarea, resultado) en el orden de las tareas.
+    """
+    en_curso = deque()
+    for tarea in tareas:
+        en_curso.append((tarea, pool.submit(funcion, tarea)))
+        if len(en_curso) >= ventana:
+            tarea, futuro = en_curso.popleft()
+            yield tarea, futuro.result()
+    while en_curso:
+        tarea, futuro = en_curso.popleft()
+        yield tarea, futuro.result()
+
+def _barrido_paralelo(imagenes, opciones, n_procesos, diario, posiciones=None, cola=None):
+    """
+    Distribuye el barrido en lotes por imagen sobre un pool de procesos.
+    
+    Primero se comprueba la cabecera de cada imagen para asignarle el mismo
+    bloque de IDs que tendría en una ejecución secuencial (el número de
+    evaluaciones por imagen es fijo para cada estrategia); después cada
+    proceso carga una imagen, una sola vez, y ejecuta su búsqueda completa.
+    Una imagen con cabecera válida que no llega a decodificarse (p. ej.
+    truncada) conserva su bloque sin filas, igual que en el bucle secuencial. Las filas se anexan
+    al diario en el orden original de las imágenes a medida que terminan;
+    las imágenes ya completas en el diario no se vuelven a cargar.
+    
+    En un barrido repartido (posiciones = {imagen: posición global}) no se
+    verifica la legibilidad: los IDs salen de la posición global y las
+    imágenes se toman de forma perezosa, p. ej. de una cola de trabajo.
+    
+    Returns:
+        Filas proxy
+    """
+    evaluaciones = _evaluaciones_por_imagen(opciones)
+    
+    with ProcessPoolExecutor(max_workers=n_procesos,
+                             initializer=_inicializar_trabajador) as pool:
+        if posiciones is None:
+            completas = {img_path for img_path in imagenes
+                         if _imagen_completa(diario.registradas(img_path.name), opciones)}
+            legibles = {img_path: _cabecera_legible(img_path,
+                                                    opciones['filas_franja'] is not None,
+                                                    opciones['alta_profundidad'])
+                        for img_path in imagenes if img_path not in completas}
+            
+            bloques = []
+            id_inicial = 0
+            for img_path in imagenes:
+                if img_path in completas:
+                    print(f"✓ {img_path.name}: ya registrada en el diario")
+                    id_inicial += evaluaciones
+                    continue
+                if not legibles[img_path]:
+                    print(f"✗ Error al cargar {img_path.name}")
+                    continue
+                bloques.append((img_path, id_inicial))
+                id_inicial += evaluaciones
+            # Las filas previas de cada imagen se leen del diario al encolarla
+            tareas = ((img_path, id_inicial, opciones, diario.previas(img_path.name))
+                      for img_path, id_inicial in bloques)
+            total = f"/{len(bloques)}"
+        else:
+            tareas = _tareas_repartidas(imagenes, opciones, diario, posiciones, cola)
+            total = ""
+        
+        resultados_proxy = []
+        perfiles = []
+        for indice, (tarea, resultado) in enumerate(
+                _mapa_acotado(pool, _trabajador_imagen, tareas, 2 * n_procesos), 1):
+            img_path, id_inicial, _, previas_imagen = tarea
+            perfiles.append(f"{opciones['perfil']}.{id_inicial:06d}")
+            if resultado is None:
+                print(f"✗ Error al cargar {img_path.name}")
+            else:
+                filas, filas_proxy = resultado
+                diario.anadir(filas, previas_imagen)
+                resultados_proxy.extend(filas_proxy)
+                print(f"✓ [{indice}{total}] {img_path.name}: experimentos "
+                      f"{id_inicial + 1}-{id_inicial + len(filas)}")
+            if cola is not None:
+                # La tarea solo se da por hecha con sus filas ya en disco
+                diario.volcar()
+                cola.completar(img_path)
+    
+    if opciones['perfil'] is not None:
+        combinar_perfiles(opciones['perfil'], perfiles)
+    
+    return resultados_proxy
+
+def procesar_imagenes_clahe(input_dir, output_dir, clip_limits, tile_sizes, n_procesos=1,
+                            motor='opencv', cache_dir=None, cache_tamano_maximo=None,
+                            cache_imagenes=False, modo_salida='carpetas',
+                            busqueda='exhaustiva', presupuesto=None,
+                            objetivo='Contraste_Local_Promedio', proxy_escala=None,
+                            proxy_top_k=5, filas_franja=None, alta_profundidad=False,
+                            bins_histograma=None, instrumentar=False, perfil=None,
+                            hilos_escritura=0, formato_imagen='png', compresion_png=None,
+                            precarga=0, memoria_precarga_mb=None, reanudar=False,
+                            shard=None, cola_trabajo=None, nodo=None, metricas=None,
+                            region_interes=False, clahe_recorte=False,
+                            paso_fotogramas=None):
     """
     Función principal para experimentación CLAHE con trazabilidad completa.
     
@@ -46,7 +837,125 @@ def procesar_imagenes_clahe(input_dir, output_dir, clip_limits, tile_sizes):
         output_dir: Directorio raíz para resultados
         clip_limits: Array de valores para clip limit
         tile_sizes: Lista de tamaños de baldosa
+        n_procesos: Número de procesos en paralelo (1 = secuencial,
+            None = todos los núcleos). La numeración de experimentos y las
+            carpetas iteracion_XXXX son idénticas en ambos modos.
+        motor: 'opencv' (cv2.createCLAHE por experimento) o 'numpy'
+            (histogramas por baldosa reutilizados para todos los α de cada ω;
+            salida idéntica bit a bit a OpenCV)
+        cache_dir: Directorio de caché de resultados compartible entre
+            ejecuciones y directorios de salida (None = sin caché)
+        cache_tamano_maximo: Tamaño máximo de la caché en bytes (None = sin límite)
+        cache_imagenes: Guardar también la imagen CLAHE en la caché, de modo
+            que los aciertos no requieran volver a aplicar CLAHE
+        modo_salida: 'carpetas' (iteracion_XXXX con PNG y JSON), 'columnar'
+            (Parquet + bloques NPZ de imágenes) o 'solo_metricas'
+        busqueda: 'exhaustiva' (rejilla clip_limits × tile_sizes) o
+            'grueso_fino' (refinamiento adaptativo dentro de los rangos de
+            clip_limits y tile_sizes)
+        presupuesto: Evaluaciones CLAHE por imagen para la búsqueda adaptativa
+        objetivo: Columna de métrica a maximizar en la búsqueda adaptativa
+            y en el cribado proxy
+        proxy_escala: Factor de reducción (p. ej. 0.25) para cribar todos los
+            candidatos sobre una copia reducida antes de la resolución
+            completa (None = sin cribado)
+        proxy_top_k: Candidatos por imagen promovidos a resolución completa
+        filas_franja: Procesar por franjas de este número de filas imágenes
+            mapeadas en memoria (.npy, .raw + .json, TIFF sin comprimir),
+            con memoria acotada por el tamaño de la franja (None = cargar
+            cada imagen completa). Usa el motor numpy; las imágenes CLAHE se
+            guardan como imagen_modificada.npy
+        alta_profundidad: Conservar la profundidad de las imágenes (uint16
+            para datos de 12/16 bits) en todo el proceso; las salidas se
+            guardan sin pérdida (PNG de 16 bits, NPZ o NPY)
+        bins_histograma: Intervalos del histograma para la entropía, potencia
+            de 2 (p. ej. 4096; None = uno por nivel: 256 u 65536)
+        instrumentar: Añadir a la tabla maestra (y a los JSON) el tiempo de
+            pared y de CPU de cada etapa (Tiempo_<etapa>_s, CPU_<etapa>_s) y
+            el pico de memoria por imagen, con un resumen por etapa al final
+        perfil: Ruta donde volcar las estadísticas de cProfile del barrido
+            (legibles con pstats o snakeviz; None = sin perfilado). En
+            paralelo se combinan los perfiles de todos los procesos
+        hilos_escritura: Hilos que escriben imágenes y JSON en segundo plano
+            mientras se calcula el siguiente experimento (0 = escritura
+            síncrona; la línea de comandos usa 2). La cola está acotada y todo se sincroniza con disco
+            antes de escribir la tabla maestra
+        formato_imagen: Formato de imagen_modificada en modo carpetas: 'png',
+            'tiff' o 'raw' (.npy sin comprimir)
+        compresion_png: Nivel de compresión PNG de 0 (rápido) a 9 (None = el
+            predeterminado de OpenCV)
+        precarga: Imágenes que se decodifican en segundo plano por delante de
+            la actual en ejecución secuencial (0 = carga síncrona; la línea
+            de comandos usa 2; en paralelo cada proceso ya carga su propia imagen)
+        memoria_precarga_mb: Límite de memoria de las imágenes precargadas
+            (None = sin límite; la línea de comandos usa 2048; siempre se
+            precarga al menos una)
+        reanudar: Continuar un barrido interrumpido a partir de su diario
+            (resultados_diario.jsonl): los experimentos registrados no se
+            repiten y la numeración continúa. Requiere la misma configuración
+        shard: Procesar solo la parte i de N del corpus ('i/N' o (i, N); las
+            imágenes i, i + N, i + 2N... en orden)
+        cola_trabajo: Archivo SQLite de una cola compartida de la que este
+            proceso reclama imágenes hasta vaciarla (excluyente con shard)
+        nodo: Identificador del trabajador de la cola (por defecto host-pid;
+            fijarlo permite reanudar su diario)
+        metricas: Métricas a calcular, por clave o columna (ver
+            registro_metricas; p. ej. ['Entropia', 'SSIM']). Solo se calculan
+            las seleccionadas y los intermedios que necesitan (None = las
+            cuatro clásicas)
+        region_interes: Calcular las métricas solo sobre la región de interés
+            de cada imagen, definida por un archivo hermano en input_dir:
+            <nombre>.mascara.png/.npy/.tif (distinto de cero = región) o
+            <nombre>.roi.json ({"x", "y", "ancho", "alto"}). Los filtros solo
+            recorren la caja de la región más su halo; las imágenes sin
+            archivo de región se evalúan completas
+        clahe_recorte: Con region_interes, aplicar CLAHE solo al recorte de la
+            región (con MARGEN_RECORTE píxeles de contexto) en lugar de a la
+            imagen completa; las imágenes guardadas son ese recorte
+        paso_fotogramas: Barrer también las secuencias de input_dir (vídeos
+            .mp4/.avi/.mov/.mkv y TIFF multipágina) sobre uno de cada
+            paso_fotogramas fotogramas, que se decodifican en streaming y se
+            guardan en output_dir/fotogramas_clave como imágenes más del
+            barrido (None = ignorar las secuencias)
+    
+    En un barrido repartido (shard o cola_trabajo) todos los nodos escriben en
+    el mismo output_dir, cada uno con su propio diario; el ID de cada
+    experimento se deriva de la posición global de su imagen, de modo que es
+    único y estable con independencia del nodo que lo calcule. La tabla
+    maestra se genera al final con reparto_trabajo.combinar_resultados.
+    
+    Returns:
+        Ruta del CSV maestro (en un barrido repartido, la del diario del
+        nodo), o None si no hay imágenes
     """
+    if motor not in MOTORES_CLAHE:
+        raise ValueError(f"Motor CLAHE desconocido: {motor} (opciones: {MOTORES_CLAHE})")
+    if modo_salida not in MODOS_ALMACENAMIENTO:
+        raise ValueError(f"Modo de salida desconocido: {modo_salida} "
+                         f"(opciones: {MODOS_ALMACENAMIENTO})")
+    if formato_imagen not in FORMATOS_IMAGEN:
+        raise ValueError(f"Formato de imagen desconocido: {formato_imagen} "
+                         f"(opciones: {tuple(FORMATOS_IMAGEN)})")
+    if filas_franja is not None:
+        # Los bloques NPZ y el reescalado del proxy requieren imágenes completas en memoria
+        if modo_salida == 'columnar':
+            raise ValueError("El procesamiento por franjas no admite modo_salida='columnar'")
+        if proxy_escala is not None:
+            raise ValueError("El procesamiento por franjas no admite cribado proxy")
+    if shard is not None and cola_trabajo is not None:
+        raise ValueError("shard y cola_trabajo son excluyentes")
+    if clahe_recorte and not region_interes:
+        raise ValueError("clahe_recorte requiere region_interes=True")
+    if paso_fotogramas is not None and paso_fotogramas < 1:
+        raise ValueError(f"paso_fotogramas debe ser >= 1: {paso_fotogramas}")
+    metricas = resolver_metricas(metricas)
+    if ((busqueda != 'exhaustiva' or proxy_escala is not None)
+            and objetivo not in columnas_metricas(metricas)):
+        raise ValueError(f"El objetivo {objetivo} no está entre las métricas seleccionadas "
+                         f"{columnas_metricas(metricas)}")
+    if shard is not None:
+        shard = parsear_shard(shard)
+    repartido = shard is not None or cola_trabajo is not None
     
     # A. INICIALIZACIÓN
     print("=" * 70)
@@ -57,11 +966,25 @@ def procesar_imagenes_clahe(input_dir, output_dir, clip_limits, tile_sizes):
     os.makedirs(output_dir, exist_ok=True)
     print(f"\n✓ Directorio de salida creado: {output_dir}")
     
-    # Buscar imágenes en el directorio de entrada
+    # Buscar imágenes en el directorio de entrada (orden estable entre ejecuciones)
     input_path = Path(input_dir)
     extensiones_validas = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff']
-    imagenes = [f for f in input_path.iterdir() 
-                if f.suffix.lower() in extensiones_validas]
+    if filas_franja is not None:
+        extensiones_validas = EXTENSIONES_MAPEADAS
+    imagenes = sorted(f for f in input_path.iterdir() 
+                      if f.suffix.lower() in extensiones_validas and not es_archivo_auxiliar(f))
+    
+    if paso_fotogramas is not None:
+        # Las secuencias se sustituyen por sus fotogramas clave
+        secuencias = [f for f in sorted(input_path.iterdir())
+                      if f.suffix.lower() in EXTENSIONES_VIDEO + EXTENSIONES_TIFF
+                      and not es_archivo_auxiliar(f) and es_secuencia(f)]
+        if secuencias:
+            print(f"✓ Extrayendo fotogramas clave de {len(secuencias)} secuencia(s)")
+            claves = extraer_fotogramas_clave(
+                secuencias, Path(output_dir) / DIR_FOTOGRAMAS_CLAVE, paso_fotogramas,
+                alta_profundidad, '.npy' if filas_franja is not None else '.png')
+            imagenes = [f for f in imagenes if f not in secuencias] + claves
     
     if not imagenes:
         print(f"✗ No se encontraron imágenes en {input_dir}")
@@ -69,153 +992,397 @@ def procesar_imagenes_clahe(input_dir, output_dir, clip_limits, tile_sizes):
     
     print(f"✓ Encontradas {len(imagenes)} imagen(es) para procesar")
     
-    # Preparar DataFrame maestro
-    resultados_maestros = []
+    if n_procesos is None:
+        n_procesos = os.cpu_count() or 1
     
-    # Contador de iteraciones global
-    id_experimento = 0
+    # Los nodos de un barrido repartido comparten directorio: no borrar lo ajeno
+    preparar_almacen(modo_salida, output_dir, reanudar or repartido)
+    print(f"✓ Modo de salida: {modo_salida}")
     
-    # Procesar cada imagen
-    for img_path in imagenes:
-        print(f"\n{'─' * 70}")
-        print(f"Procesando: {img_path.name}")
-        print(f"{'─' * 70}")
-        
-        # Cargar imagen en escala de grises
-        imagen_original = cv2.imread(str(img_path), cv2.IMREAD_GRAYSCALE)
-        
-        if imagen_original is None:
-            print(f"✗ Error al cargar {img_path.name}")
-            continue
-        
-        print(f"✓ Imagen cargada: {imagen_original.shape}")
-        
-        # B. BUCLE DE EXPERIMENTACIÓN
-        total_iteraciones = len(clip_limits) * len(tile_sizes)
-        iteracion_actual = 0
-        
-        for alpha in clip_limits:
-            for omega in tile_sizes:
-                iteracion_actual += 1
-                id_experimento += 1
-                
-                # Crear carpeta de iteración
-                carpeta_iteracion = os.path.join(output_dir, f"iteracion_{id_experimento:04d}")
-                os.makedirs(carpeta_iteracion, exist_ok=True)
-                
-                print(f"\n[{iteracion_actual}/{total_iteraciones}] Experimento {id_experimento}: α={alpha:.2f}, ω={omega}")
-                
-                # C. PROCESAMIENTO - Aplicar CLAHE
-                clahe = cv2.createCLAHE(clipLimit=alpha, tileGridSize=(omega, omega))
-                imagen_modificada = clahe.apply(imagen_original)
-                
-                # D. CÁLCULO DE MÉTRICAS
-                try:
-                    metricas = {
-                        'entropia': calcular_entropia(imagen_modificada),
-                        'contraste_local_promedio': calcular_contraste_local_promedio(imagen_modificada),
-                        'nitidez_borde': calcular_nitidez_borde(imagen_modificada),
-                        'contraste_michelson': calcular_contraste_michelson(imagen_modificada)
-                    }
+    cache = None
+    if cache_dir is not None:
+        cache = CacheResultados(cache_dir, cache_tamano_maximo, cache_imagenes)
+        print(f"✓ Caché de resultados: {cache_dir}")
+    
+    # Las métricas dependen de la profundidad, del binning y del recorte:
+    # claves de caché distintas
+    variante_cache = (f"{16 if alta_profundidad else 8}bits-b{bins_histograma}"
+                      if alta_profundidad or bins_histograma is not None else '')
+    if clahe_recorte:
+        variante_cache += '-recorte'
+    
+    opciones = {
+        'clip_limits': clip_limits,
+        'tile_sizes': tile_sizes,
+        'output_dir': output_dir,
+        'motor': motor,
+        'cache': cache,
+        'modo_salida': modo_salida,
+        'busqueda': busqueda,
+        'presupuesto': presupuesto,
+        'objetivo': objetivo,
+        'proxy_escala': proxy_escala,
+        'proxy_top_k': proxy_top_k,
+        'filas_franja': filas_franja,
+        'alta_profundidad': alta_profundidad,
+        'bins_histograma': bins_histograma,
+        'instrumentar': instrumentar,
+        'perfil': None if perfil is None else os.path.abspath(perfil),
+        'hilos_escritura': hilos_escritura,
+        'formato_imagen': formato_imagen,
+        'compresion_png': compresion_png,
+        'ids_globales': repartido,
+        'metricas': metricas,
+        'region_interes': region_interes,
+        'clahe_recorte': clahe_recorte,
+        'variante_cache': variante_cache
+    }
+    if busqueda != 'exhaustiva':
+        print(f"✓ Búsqueda {busqueda}: {_crear_busqueda(opciones).total_evaluaciones()} "
+              f"evaluaciones por imagen (objetivo: {objetivo})")
+    if proxy_escala is not None:
+        print(f"✓ Cribado proxy a escala {proxy_escala}: top {proxy_top_k} por imagen "
+              f"a resolución completa")
+    if alta_profundidad:
+        print(f"✓ Alta profundidad de bits (entropía con "
+              f"{bins_histograma or 'todos los'} intervalos)")
+    if filas_franja is not None:
+        print(f"✓ Procesamiento por franjas de {filas_franja} filas (entrada mapeada en memoria)")
+    print(f"✓ Métricas: {', '.join(columnas_metricas(metricas))}")
+    if region_interes:
+        print(f"✓ Métricas sobre la región de interés de cada imagen"
+              + (" (CLAHE sobre el recorte)" if clahe_recorte else ""))
+    if instrumentar:
+        print("✓ Instrumentación por etapas activada")
+    if hilos_escritura and modo_salida != 'solo_metricas':
+        print(f"✓ Escritura en segundo plano con {hilos_escritura} hilo(s)")
+    
+    # Reparto: imágenes asignadas a este proceso y etiqueta de su diario
+    etiqueta = None
+    cola = None
+    asignadas = imagenes
+    posiciones = None
+    if repartido:
+        posiciones = {img_path: indice for indice, img_path in enumerate(imagenes)}
+    if shard is not None:
+        etiqueta = f"shard_{shard[0]}_de_{shard[1]}"
+        asignadas = imagenes[shard[0]::shard[1]]
+        print(f"✓ Shard {shard[0]}/{shard[1]}: {len(asignadas)} imagen(es)")
+    elif cola_trabajo is not None:
+        nodo = nodo or nodo_por_defecto()
+        etiqueta = f"nodo_{nodo}"
+        cola = ColaTrabajo(cola_trabajo, imagenes, nodo)
+        asignadas = cola
+        print(f"✓ Cola de trabajo: {cola_trabajo} (nodo {nodo})")
+    
+    # Diario de resultados: las filas se anexan por lotes durante el barrido
+    nombre_diario = NOMBRE_DIARIO if etiqueta is None else nombre_diario_shard(etiqueta)
+    diario = DiarioResultados(output_dir, {
+        'imagenes': [img_path.name for img_path in imagenes],
+        'clip_limits': [float(a) for a in clip_limits],
+        'tile_sizes': [int(w) for w in tile_sizes],
+        'modo_salida': modo_salida,
+        'formato_imagen': formato_imagen,
+        'busqueda': busqueda,
+        'presupuesto': presupuesto,
+        'objetivo': objetivo,
+        'proxy_escala': proxy_escala,
+        'proxy_top_k': proxy_top_k,
+        'alta_profundidad': alta_profundidad,
+        'bins_histograma': bins_histograma,
+        'metricas': columnas_metricas(metricas),
+        'region_interes': region_interes,
+        'clahe_recorte': clahe_recorte,
+        'evaluaciones_por_imagen': _evaluaciones_por_imagen(opciones),
+        'ids_globales': repartido
+    }, reanudar, nombre=nombre_diario)
+    if reanudar:
+        print(f"✓ Reanudando desde el diario: "
+              f"{sum(map(len, diario.completadas.values()))} experimentos registrados")
+    
+    try:
+        if n_procesos > 1:
+            print(f"✓ Ejecución paralela con {n_procesos} procesos")
+            resultados_proxy = _barrido_paralelo(asignadas, opciones, n_procesos, diario,
+                                                 posiciones, cola)
+        else:
+            resultados_proxy = []
+            
+            # Contador de iteraciones global
+            n_experimentos = 0
+            evaluaciones = _evaluaciones_por_imagen(opciones)
+            
+            # Las imágenes ya completas en el diario no se vuelven a cargar
+            def completa(img_path):
+                return _imagen_completa(diario.registradas(img_path.name), opciones)
+            
+            def cargar_pendiente(img_path):
+                if completa(img_path):
+                    return None
+                return _cargar_imagen(img_path, filas_franja is not None, alta_profundidad)
+            
+            # Procesar cada imagen (decodificando las siguientes en segundo plano)
+            cargador = CargadorAnticipado(asignadas, cargar_pendiente, precarga,
+                                          memoria_precarga_mb)
+            with perfilar(opciones['perfil']):
+                for img_path, obtener in cargador:
+                    print(f"\n{'─' * 70}")
+                    print(f"Procesando: {img_path.name}")
+                    print(f"{'─' * 70}")
                     
-                    print(f"  Entropía: {metricas['entropia']:.4f}")
-                    print(f"  Contraste Local: {metricas['contraste_local_promedio']:.4f}")
-                    print(f"  Nitidez Borde: {metricas['nitidez_borde']:.4f}")
-                    print(f"  Contraste Michelson: {metricas['contraste_michelson']:.4f}")
+                    if completa(img_path):
+                        print("✓ Ya registrada en el diario")
+                        n_experimentos += evaluaciones
+                    else:
+                        previas_imagen = diario.previas(img_path.name)
+                        # Cargar imagen en escala de grises
+                        imagen_original, cronometro = _cargar_instrumentada(img_path, opciones,
+                                                                            obtener)
+                        
+                        if imagen_original is None:
+                            print(f"✗ Error al cargar {img_path.name}")
+                            # Misma numeración que en paralelo: una cabecera
+                            # legible reserva su bloque de IDs aunque falle
+                            if _cabecera_legible(img_path, filas_franja is not None,
+                                                 alta_profundidad):
+                                n_experimentos += evaluaciones
+                        else:
+                            print(f"✓ Imagen cargada: {imagen_original.shape}")
+                            
+                            id_inicial = n_experimentos
+                            if posiciones is not None:
+                                id_inicial = posiciones[img_path] * evaluaciones
+                            filas, filas_proxy = _procesar_imagen(img_path, imagen_original,
+                                                                  id_inicial, opciones,
+                                                                  cronometro=cronometro,
+                                                                  previas=previas_imagen)
+                            diario.anadir(filas, previas_imagen)
+                            n_experimentos += len(filas)
+                            resultados_proxy.extend(filas_proxy)
                     
-                except Exception as e:
-                    print(f"  ✗ Error calculando métricas: {e}")
-                    metricas = {
-                        'entropia': 0,
-                        'contraste_local_promedio': 0,
-                        'nitidez_borde': 0,
-                        'contraste_michelson': 0
-                    }
-                
-                # E. ALMACENAMIENTO LOCAL (TRAZABILIDAD)
-                # 1. Guardar imagen modificada
-                ruta_imagen = os.path.join(carpeta_iteracion, "imagen_modificada.png")
-                cv2.imwrite(ruta_imagen, imagen_modificada)
-                
-                # 2. Guardar parámetros y métricas en JSON
-                datos_json = {
-                    'ID_Experimento': id_experimento,
-                    'Imagen_Original': img_path.name,
-                    'ClipLimit': float(alpha),
-                    'TileSize': int(omega),
-                    'Metricas': {
-                        'Entropia': float(metricas['entropia']),
-                        'Contraste_Local_Promedio': float(metricas['contraste_local_promedio']),
-                        'Nitidez_Borde': float(metricas['nitidez_borde']),
-                        'Contraste_Michelson': float(metricas['contraste_michelson'])
-                    }
-                }
-                
-                ruta_json = os.path.join(carpeta_iteracion, "parametros_resultados.json")
-                with open(ruta_json, 'w', encoding='utf-8') as f:
-                    json.dump(datos_json, f, indent=4, ensure_ascii=False)
-                
-                # F. ALMACENAMIENTO MAESTRO (ANÁLISIS)
-                fila_resultado = {
-                    'ID_Experimento': id_experimento,
-                    'Imagen_Original': img_path.name,
-                    'ClipLimit': alpha,
-                    'TileSize': omega,
-                    'Entropia': metricas['entropia'],
-                    'Contraste_Local_Promedio': metricas['contraste_local_promedio'],
-                    'Nitidez_Borde': metricas['nitidez_borde'],
-                    'Contraste_Michelson': metricas['contraste_michelson']
-                }
-                resultados_maestros.append(fila_resultado)
+                    if cola is not None:
+                        # La tarea solo se da por hecha con sus filas ya en disco
+                        diario.volcar()
+                        cola.completar(img_path)
+            
+            print(f"\n✓ Espera por carga de imágenes: {cargador.espera_total:.2f} s"
+                  + (f" (precarga de {precarga})" if precarga else ""))
+    finally:
+        # Lo registrado hasta una interrupción queda en el diario para reanudar
+        diario.cerrar()
     
     # G. FINALIZACIÓN - Guardar DataFrame maestro
     print(f"\n{'=' * 70}")
     print("FINALIZANDO EXPERIMENTACIÓN")
     print(f"{'=' * 70}")
     
-    df_maestro = pd.DataFrame(resultados_maestros)
-    ruta_csv = os.path.join(output_dir, "resultados_maestros.csv")
-    df_maestro.to_csv(ruta_csv, index=False, encoding='utf-8')
-    
-    print(f"\n✓ Tabla maestra guardada: {ruta_csv}")
+    # La tabla maestra se vuelca del diario por bloques, sin cargarla entera
+    ruta_diario = os.path.join(output_dir, nombre_diario)
+    resumen = _ResumenMaestro(objetivo, instrumentar)
+    bloques = resumen.observar(bloques_diario(ruta_diario, diario.ordenado))
+    if etiqueta is None:
+        ruta_salida = finalizar_almacen(modo_salida, output_dir, bloques)
+        print(f"\n✓ Tabla maestra guardada: {ruta_salida}")
+    else:
+        # Cada nodo solo escribe su diario; la tabla maestra se combina al final
+        for _ in bloques:
+            pass
+        ruta_salida = ruta_diario
+        print(f"\n✓ Diario de {etiqueta}: {ruta_diario}")
+        print(f"  Al terminar todos los nodos: python reparto_trabajo.py {output_dir}")
+    id_experimento = resumen.filas
     print(f"✓ Total de experimentos realizados: {id_experimento}")
-    print(f"✓ Carpetas de trazabilidad creadas: {id_experimento}")
+    if modo_salida == 'carpetas':
+        print(f"✓ Carpetas de trazabilidad creadas: {id_experimento}")
+    elif modo_salida == 'columnar':
+        print(f"✓ Imágenes archivadas en bloques NPZ: {os.path.join(output_dir, 'imagenes')}")
+    
+    if resultados_proxy:
+        import pandas as pd
+        df_proxy = pd.DataFrame(resultados_proxy)
+        df_proxy['ID_Experimento'] = df_proxy['ID_Experimento'].astype('Int64')
+        ruta_proxy = os.path.join(output_dir, "resultados_proxy.csv" if etiqueta is None
+                                  else f"resultados_proxy.{etiqueta}.csv")
+        df_proxy.to_csv(ruta_proxy, index=False, encoding='utf-8')
+        print(f"✓ Puntuaciones proxy guardadas: {ruta_proxy}")
+        _resumen_proxy(resumen.promovidos(), df_proxy, objetivo)
     
     # Mostrar estadísticas resumidas
     print(f"\n{'─' * 70}")
     print("ESTADÍSTICAS RESUMIDAS")
     print(f"{'─' * 70}")
-    print(df_maestro.describe())
+    print(resumen.describir() if resumen.filas else "Sin experimentos")
+    
+    tabla_tiempos = resumen.tiempos.tabla() if instrumentar else None
+    if tabla_tiempos is not None:
+        print(f"\n{'─' * 70}")
+        print("TIEMPOS POR ETAPA")
+        print(f"{'─' * 70}")
+        print(tabla_tiempos.round(3))
+        if resumen.maximo('Pico_RSS_MB') is not None:
+            print(f"\n✓ Pico de memoria residente por imagen: "
+                  f"{resumen.maximo('Pico_RSS_MB'):.1f} MB")
+    if perfil is not None:
+        print(f"✓ Perfil cProfile guardado: {perfil}")
     
     print(f"\n{'=' * 70}")
     print("✓ PROCESO COMPLETADO EXITOSAMENTE")
     print(f"{'=' * 70}\n")
     
-    return df_maestro
+    return ruta_salida
 
 
-if __name__ == "__main__":
-    # CONFIGURACIÓN DE PARÁMETROS
-    INPUT_DIR = "./data"
-    OUTPUT_DIR = "./resultados_clahe/"
+def parsear_clip_limits(texto):
+    """
+    Clip limits desde la línea de comandos: un rango 'inicio:fin:paso' (fin
+    incluido, p. ej. '1.0:5.0:0.5') o una lista '1.0,2.0,3.5'.
+    """
+    try:
+        if ':' in texto:
+            inicio, fin, paso = (float(v) for v in texto.split(':'))
+            if paso <= 0:
+                raise ValueError
+            return np.round(np.arange(inicio, fin + paso / 2, paso), 10)
+        return np.array([float(v) for v in texto.split(',')])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"se esperaba 'inicio:fin:paso' o 'a,b,c': {texto}")
+
+def main(argv=None, prog=None):
+    """Barrido desde la línea de comandos (ver clahe.py barrer --help)."""
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Barrido de parámetros CLAHE con métricas y trazabilidad")
+    parser.add_argument('--entrada', default="./data", help="Directorio de imágenes originales")
+    parser.add_argument('--salida', default="./resultados_clahe/", help="Directorio de resultados")
+    
+    grupo = parser.add_argument_group("rangos de búsqueda")
+    grupo.add_argument('--clip-limits', type=parsear_clip_limits, default="1.0:5.0:0.5",
+                       help="Rango 'inicio:fin:paso' o lista 'a,b,c' (por defecto 1.0:5.0:0.5)")
+    grupo.add_argument('--tile-sizes', type=int, nargs='+', default=[8, 16, 32])
+    grupo.add_argument('--busqueda', choices=['exhaustiva', 'grueso_fino'], default='exhaustiva',
+                       help="Rejilla completa o refinamiento adaptativo dentro de los rangos")
+    grupo.add_argument('--presupuesto', type=int, default=27,
+                       help="Evaluaciones por imagen de la búsqueda adaptativa")
+    grupo.add_argument('--objetivo', default='Contraste_Local_Promedio',
+                       help="Métrica que maximizan la búsqueda adaptativa y el cribado proxy")
+    grupo.add_argument('--proxy-escala', type=float, default=None,
+                       help="Cribar todos los candidatos a esta escala (p. ej. 0.25)")
+    grupo.add_argument('--proxy-top-k', type=int, default=5,
+                       help="Candidatos por imagen promovidos a resolución completa")
     
-    # Rangos de búsqueda
-    CLIP_LIMITS = np.arange(1.0, 5.1, 0.5)  # [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0]
-    TILE_SIZES = [8, 16, 32]
+    grupo = parser.add_argument_group("métricas")
+    grupo.add_argument('--metricas', nargs='+', default=list(COLUMNAS_METRICAS),
+                       help="Métricas por columna o clave (ver registro_metricas; "
+                            "p. ej. Entropia SSIM)")
+    grupo.add_argument('--region-interes', action='store_true',
+                       help="Métricas solo sobre <nombre>.mascara.png o <nombre>.roi.json")
+    grupo.add_argument('--clahe-recorte', action='store_true',
+                       help="Con --region-interes, aplicar CLAHE solo al recorte de la región")
+    grupo.add_argument('--alta-profundidad', action='store_true',
+                       help="Conservar uint16 en CLAHE, métricas y salidas")
+    grupo.add_argument('--bins-histograma', type=int, default=None,
+                       help="Intervalos del histograma de la entropía (por defecto uno por nivel)")
+    
+    grupo = parser.add_argument_group("ejecución")
+    grupo.add_argument('--procesos', type=int, default=1,
+                       help="Procesos en paralelo (0 = todos los núcleos)")
+    grupo.add_argument('--motor', choices=MOTORES_CLAHE, default='opencv')
+    grupo.add_argument('--filas-franja', type=int, default=None,
+                       help="Procesar por franjas de N filas imágenes mapeadas en memoria")
+    grupo.add_argument('--paso-fotogramas', type=int, default=None,
+                       help="Barrer uno de cada N fotogramas de los vídeos y TIFF multipágina")
+    grupo.add_argument('--precarga', type=int, default=2,
+                       help="Imágenes decodificadas por delante de la actual (0 = síncrona; "
+                            "por defecto 2, mientras que procesar_imagenes_clahe usa 0)")
+    grupo.add_argument('--memoria-precarga-mb', type=float, default=2048,
+                       help="Límite de memoria de la precarga (por defecto 2048; sin límite "
+                            "en procesar_imagenes_clahe)")
+    grupo.add_argument('--cache-dir', default=None, help="Caché de resultados compartida")
+    grupo.add_argument('--cache-tamano-maximo-mb', type=float, default=None,
+                       help="Tamaño máximo de la caché (por defecto, sin límite)")
+    grupo.add_argument('--cache-imagenes', action='store_true',
+                       help="Guardar también la imagen CLAHE en la caché")
+    grupo.add_argument('--reanudar', action='store_true',
+                       help="Continuar un barrido interrumpido desde su diario")
+    grupo.add_argument('--shard', default=None, help="Procesar solo la parte 'i/N' del corpus")
+    grupo.add_argument('--cola-trabajo', default=None,
+                       help="Cola SQLite compartida de la que reclamar imágenes")
+    grupo.add_argument('--nodo', default=None,
+                       help="Identificador de este nodo de la cola (por defecto host-pid); "
+                            "fijarlo permite reanudar su diario con --reanudar")
+    grupo.add_argument('--instrumentar', action='store_true',
+                       help="Tiempos por etapa y pico de memoria en la tabla maestra")
+    grupo.add_argument('--perfil', default=None, help="Volcar estadísticas de cProfile")
+    
+    grupo = parser.add_argument_group("salida")
+    grupo.add_argument('--modo-salida', choices=MODOS_ALMACENAMIENTO, default='carpetas')
+    grupo.add_argument('--formato-imagen', choices=tuple(FORMATOS_IMAGEN), default='png')
+    grupo.add_argument('--compresion-png', type=int, default=None, choices=range(10))
+    grupo.add_argument('--hilos-escritura', type=int, default=2,
+                       help="Hilos de escritura en segundo plano (0 = síncrona; por defecto "
+                            "2, mientras que procesar_imagenes_clahe usa 0)")
+    args = parser.parse_args(argv)
+    if args.nodo and not args.cola_trabajo:
+        parser.error("--nodo requiere --cola-trabajo")
     
     print("\nCONFIGURACIÓN DE EXPERIMENTACIÓN:")
-    print(f"  - Directorio de entrada: {INPUT_DIR}")
-    print(f"  - Directorio de salida: {OUTPUT_DIR}")
-    print(f"  - Clip Limits: {list(CLIP_LIMITS)}")
-    print(f"  - Tile Sizes: {TILE_SIZES}")
-    print(f"  - Total de combinaciones por imagen: {len(CLIP_LIMITS) * len(TILE_SIZES)}")
+    print(f"  - Directorio de entrada: {args.entrada}")
+    print(f"  - Directorio de salida: {args.salida}")
+    print(f"  - Clip Limits: {[float(a) for a in args.clip_limits]}")
+    print(f"  - Tile Sizes: {args.tile_sizes}")
+    print(f"  - Total de combinaciones por imagen: "
+          f"{len(args.clip_limits) * len(args.tile_sizes)}")
+    print(f"  - Procesos en paralelo: {args.procesos or os.cpu_count()}")
+    print(f"  - Motor CLAHE: {args.motor}")
+    print(f"  - Caché de resultados: {args.cache_dir or 'desactivada'}"
+          + (f" (máx. {args.cache_tamano_maximo_mb:g} MB)"
+             if args.cache_dir and args.cache_tamano_maximo_mb else "")
+          + (" con imágenes" if args.cache_dir and args.cache_imagenes else ""))
+    print(f"  - Modo de salida: {args.modo_salida}")
+    print(f"  - Búsqueda: {args.busqueda}")
+    print(f"  - Cribado proxy: {args.proxy_escala or 'desactivado'}")
+    print(f"  - Procesamiento por franjas: {args.filas_franja or 'desactivado'}")
+    print(f"  - Alta profundidad de bits: {'sí' if args.alta_profundidad else 'no'}")
+    print(f"  - Métricas: {args.metricas}")
+    print(f"  - Región de interés: {'sí' if args.region_interes else 'no'}"
+          + (" (CLAHE sobre el recorte)" if args.region_interes and args.clahe_recorte else ""))
+    print(f"  - Fotogramas clave de secuencias: "
+          f"{f'1 de cada {args.paso_fotogramas}' if args.paso_fotogramas else 'desactivado'}")
+    print(f"  - Instrumentación por etapas: {'sí' if args.instrumentar else 'no'}")
+    print(f"  - Hilos de escritura: {args.hilos_escritura or 'síncrona'} "
+          f"({args.formato_imagen})")
+    print(f"  - Precarga de imágenes: {args.precarga or 'desactivada'}")
+    print(f"  - Reanudar desde el diario: {'sí' if args.reanudar else 'no'}")
+    print(f"  - Reparto: {args.shard or args.cola_trabajo or 'desactivado'}"
+          + (f" (nodo {args.nodo})" if args.nodo else ""))
     
-    # Ejecutar experimentación
-    df_resultados = procesar_imagenes_clahe(INPUT_DIR, OUTPUT_DIR, CLIP_LIMITS, TILE_SIZES)
+    ruta_resultados = procesar_imagenes_clahe(
+        args.entrada, args.salida, args.clip_limits, args.tile_sizes,
+        n_procesos=args.procesos or None, motor=args.motor, cache_dir=args.cache_dir,
+        cache_tamano_maximo=(None if args.cache_tamano_maximo_mb is None
+                             else int(args.cache_tamano_maximo_mb * 1024 ** 2)),
+        cache_imagenes=args.cache_imagenes,
+        modo_salida=args.modo_salida, busqueda=args.busqueda, presupuesto=args.presupuesto,
+        objetivo=args.objetivo, proxy_escala=args.proxy_escala,
+        proxy_top_k=args.proxy_top_k, filas_franja=args.filas_franja,
+        alta_profundidad=args.alta_profundidad, bins_histograma=args.bins_histograma,
+        instrumentar=args.instrumentar, perfil=args.perfil,
+        hilos_escritura=args.hilos_escritura, formato_imagen=args.formato_imagen,
+        compresion_png=args.compresion_png, precarga=args.precarga,
+        memoria_precarga_mb=args.memoria_precarga_mb, reanudar=args.reanudar,
+        shard=args.shard, cola_trabajo=args.cola_trabajo, nodo=args.nodo,
+        metricas=args.metricas,
+        region_interes=args.region_interes, clahe_recorte=args.clahe_recorte,
+        paso_fotogramas=args.paso_fotogramas)
     
-    if df_resultados is not None:
+    if ruta_resultados is not None:
         print("\nPara analizar los resultados, puedes:")
         print("1. Abrir 'resultados_maestros.csv' en Excel o Python")
         print("2. Ordenar por la métrica más relevante para tu caso")
         print("3. Identificar las mejores iteraciones")
-        print("4. Revisar las imágenes en las carpetas correspondientes")
\ No newline at end of file
+        print("4. Revisar las imágenes en las carpetas correspondientes")
+        print(f"5. Analizarlos: python clahe.py analizar --resultados {args.salida}")
+    return ruta_resultados
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import cProfile
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+# Etapas instrumentadas, en el orden en que aparecen en la tabla maestra
+ETAPAS = ('Carga', 'CLAHE', 'Entropia', 'Contraste_Local', 'Nitidez_Borde', 'Michelson',
+          'PSNR', 'SSIM', 'Escritura_PNG', 'Escritura_JSON')
+
+# Clave de las etapas que se miden una vez por imagen (p. ej. la carga)
+POR_IMAGEN = 'imagen'
+
+class Cronometro:
+    """
+    Acumula tiempo de pared (perf_counter) y de CPU del proceso (process_time)
+    por etapa y por experimento.
+
+    Las etapas por experimento se registran con su ID; las que se miden una
+    vez por imagen con la clave POR_IMAGEN, y se incluyen en las columnas de
+    todos los experimentos de esa imagen. El tiempo de CPU incluye los hilos
+    de OpenCV, por lo que puede superar al de pared.
+    """
+
+    def __init__(self):
+        self._tiempos = {}
+
+    def registrar(self, etapa, clave, pared, cpu):
+        acumulado = self._tiempos.setdefault(clave, {}).setdefault(etapa, [0.0, 0.0])
+        acumulado[0] += pared
+        acumulado[1] += cpu
+
+    @contextmanager
+    def medir(self, etapa, clave=POR_IMAGEN):
+        pared, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, clave, time.perf_counter() - pared,
+                           time.process_time() - cpu)
+
+    def tiempo(self, etapa, clave=POR_IMAGEN):
+        """(pared, cpu) acumulados de una etapa."""
+        return tuple(self._tiempos.get(clave, {}).get(etapa, (0.0, 0.0)))
+
+    def repartir(self, etapa, claves, pared, cpu):
+        """Reparte a partes iguales el tiempo de una operación por lotes."""
+        for clave in claves:
+            self.registrar(etapa, clave, pared / len(claves), cpu / len(claves))
+
+    def columnas(self, clave):
+        """Columnas Tiempo_<etapa>_s y CPU_<etapa>_s de un experimento."""
+        tiempos = dict(self._tiempos.get(POR_IMAGEN, {}))
+        tiempos.update(self._tiempos.get(clave, {}))
+        columnas = {}
+        for etapa in ETAPAS:
+            if etapa in tiempos:
+                columnas[f"Tiempo_{etapa}_s"] = tiempos[etapa][0]
+                columnas[f"CPU_{etapa}_s"] = tiempos[etapa][1]
+        return columnas
+
+def medir(cronometro, etapa, clave=POR_IMAGEN):
+    """Contexto de medida, o un contexto vacío si la instrumentación está desactivada."""
+    if cronometro is None:
+        return nullcontext()
+    return cronometro.medir(etapa, clave)
+
+@contextmanager
+def perfilar(ruta):
+    """Ejecuta el bloque bajo cProfile y vuelca las estadísticas en ruta (None = no perfilar)."""
+    if ruta is None:
+        yield
+        return
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield
+    finally:
+        perfil.disable()
+        perfil.dump_stats(ruta)
+
+def combinar_perfiles(ruta, partes):
+    """Combina los volcados de cProfile de varios procesos en ruta y elimina las partes."""
+    partes = [p for p in partes if os.path.exists(p)]
+    if not partes:
+        return
+    pstats.Stats(*partes).dump_stats(ruta)
+    for parte in partes:
+        os.remove(parte)
+
+def reiniciar_pico_memoria():
+    """
+    Reinicia el pico de memoria residente del proceso (Linux: VmHWM) para
+    poder medirlo por imagen. Devuelve False si el sistema no lo permite, en
+    cuyo caso el pico es el acumulado desde el inicio del proceso.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def pico_memoria_mb():
+    """Pico de memoria residente del proceso en MB (None si no está disponible)."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+class AcumuladorTiempos:
+    """
+    Suma las columnas de tiempo de la tabla maestra por etapa, bloque a bloque
+    (la tabla se recorre por bloques sin cargarla entera).
+    """
+
+    def __init__(self):
+        # Etapa → [pared, CPU, mediciones]
+        self._sumas = {}
+        # Imágenes cuya carga ya se contó
+        self._imagenes = set()
+
+    def anadir(self, df):
+        for etapa in ETAPAS:
+            columna = f"Tiempo_{etapa}_s"
+            if columna not in df.columns:
+                continue
+            columna_cpu = f"CPU_{etapa}_s"
+            filas = df
+            if etapa == 'Carga':
+                # Se repite en todos los experimentos de la imagen: contar una vez
+                filas = df[~df['Imagen_Original'].isin(self._imagenes)]
+                filas = filas.drop_duplicates('Imagen_Original')
+                self._imagenes.update(filas['Imagen_Original'])
+            suma = self._sumas.setdefault(etapa, [0.0, 0.0, 0])
+            suma[0] += filas[columna].sum()
+            suma[1] += filas[columna_cpu].sum()
+            suma[2] += int(filas[columna].count())
+
+    def tabla(self):
+        """
+        Returns:
+            DataFrame con el total, la media por experimento, la relación CPU/pared
+            y el porcentaje del tiempo total, o None si no hay columnas de tiempo
+        """
+        import pandas as pd
+        filas = []
+        for etapa in ETAPAS:
+            if etapa not in self._sumas:
+                continue
+            pared, cpu, mediciones = self._sumas[etapa]
+            filas.append({
+                'Etapa': etapa,
+                'Total_s': pared,
+                'Media_ms': pared / mediciones * 1000 if mediciones else float('nan'),
+                'CPU/Pared': cpu / pared if pared > 0 else float('nan'),
+                'Mediciones': mediciones
+            })
+        if not filas:
+            return None
+        tabla = pd.DataFrame(filas).set_index('Etapa')
+        tabla['Porcentaje'] = 100 * tabla['Total_s'] / tabla['Total_s'].sum()
+        return tabla
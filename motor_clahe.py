@@ -0,0 +1,426 @@
+import cv2
+import numpy as np
+
+# Número de píxeles procesados por bloque en la interpolación; acota la
+# memoria temporal independientemente del tamaño de la imagen.
+ELEMENTOS_POR_BLOQUE = 1 << 20
+
+def _limite_recorte(alpha, area_baldosa, hist_size):
+    """Límite de recorte entero por baldosa, con la misma conversión que OpenCV."""
+    if alpha <= 0:
+        return None
+    return max(int(alpha * area_baldosa / hist_size), 1)
+
+def _coeficientes_interpolacion(n, tam_baldosa, n_baldosas):
+    """
+    Índices de baldosa vecinos y pesos bilineales (float32) para un eje.
+
+    Reproduce la aritmética de CLAHE_Interpolation_Body de OpenCV:
+    t = x * (1 / tam) - 0.5 en precisión simple.
+    """
+    inv = np.float32(1.0) / np.float32(tam_baldosa)
+    tf = np.arange(n, dtype=np.float32) * inv - np.float32(0.5)
+    t1 = np.floor(tf).astype(np.int64)
+    peso = tf - t1.astype(np.float32)
+    peso1 = np.float32(1.0) - peso
+    t2 = np.minimum(t1 + 1, n_baldosas - 1)
+    t1 = np.maximum(t1, 0)
+    return t1, t2, peso, peso1
+
+class _LutsPorFilaBaldosas:
+    """
+    LUTs float32 de una fila de baldosas, calculadas bajo demanda.
+
+    Con 65536 niveles (uint16) las tablas de toda la rejilla ocuparían
+    ω² × 65536 entradas por α; la interpolación solo necesita dos filas de
+    baldosas a la vez, de modo que se conservan únicamente las más recientes.
+    """
+
+    FILAS_RETENIDAS = 3
+
+    def __init__(self, histogramas_baldosas, clip_limits):
+        self.histogramas_baldosas = histogramas_baldosas
+        self.clip_limits = list(clip_limits)
+        self.n_alpha = len(self.clip_limits)
+        self._tablas = {}
+
+    def fila(self, ty):
+        """Tabla (len(clip_limits), ω·hist_size) de la fila de baldosas ty."""
+        if ty not in self._tablas:
+            hb = self.histogramas_baldosas
+            luts = hb._luts_histogramas(hb._histogramas_filas(ty, ty + 1), self.clip_limits)
+            self._tablas[ty] = luts.astype(np.float32).reshape(self.n_alpha, -1)
+            for antigua in [k for k in self._tablas if k <= ty - self.FILAS_RETENIDAS]:
+                del self._tablas[antigua]
+        return self._tablas[ty]
+
+class HistogramasBaldosas:
+    """
+    Histogramas por baldosa de una imagen para una rejilla ω × ω.
+
+    Los histogramas se calculan una única vez y se reutilizan para cualquier
+    vector de clip limits: solo el recorte/redistribución y la interpolación
+    dependen de α. La geometría (relleno BORDER_REFLECT_101 cuando las
+    dimensiones no son divisibles por ω) y los 256 o 65536 niveles del
+    histograma (uint8 / uint16) son los mismos que usa cv2.createCLAHE, por
+    lo que la salida coincide bit a bit con OpenCV.
+
+    Con filas_franja, la imagen (p. ej. un np.memmap) se recorre por franjas
+    de filas tanto al acumular los histogramas como al interpolar con
+    aplicar_filas, de modo que nunca se materializa completa en memoria.
+
+    Para uint16 los histogramas de 65536 niveles no se precalculan: se
+    obtienen por filas de baldosas durante la interpolación, con memoria
+    proporcional a ω × 65536 en lugar de ω² × 65536.
+    """
+
+    def __init__(self, imagen, omega, filas_franja=None):
+        if imagen.dtype not in (np.uint8, np.uint16) or imagen.ndim != 2:
+            raise ValueError("Se requiere una imagen uint8 o uint16 en escala de grises")
+
+        self.imagen = imagen
+        self.omega = int(omega)
+        self.hist_size = 256 if imagen.dtype == np.uint8 else 65536
+
+        alto, ancho = imagen.shape
+        if alto % self.omega == 0 and ancho % self.omega == 0:
+            self._relleno = (0, 0)
+        else:
+            self._relleno = (self.omega - alto % self.omega, self.omega - ancho % self.omega)
+        alto_extendido = alto + self._relleno[0]
+
+        self.alto_baldosa = alto_extendido // self.omega
+        self.ancho_baldosa = (ancho + self._relleno[1]) // self.omega
+        self.area_baldosa = self.alto_baldosa * self.ancho_baldosa
+        self._filas_franja = filas_franja or alto_extendido
+
+        self.histogramas = None
+        if self.hist_size == 256:
+            self.histogramas = self._histogramas_filas(0, self.omega)
+
+    def _histogramas_filas(self, ty0, ty1):
+        """
+        Histogramas de las baldosas de las filas [ty0, ty1) de la rejilla.
+
+        Returns:
+            Array int32 de forma ((ty1 - ty0)·ω, hist_size)
+        """
+        # Histograma de todas las baldosas con un bincount por franja
+        columna = np.arange(self.imagen.shape[1] + self._relleno[1]) // self.ancho_baldosa
+        n_baldosas = (ty1 - ty0) * self.omega
+        histogramas = np.zeros(n_baldosas * self.hist_size, np.int64)
+        inicio, fin = ty0 * self.alto_baldosa, ty1 * self.alto_baldosa
+        for y0 in range(inicio, fin, self._filas_franja):
+            y1 = min(y0 + self._filas_franja, fin)
+            fila = (np.arange(y0, y1) - inicio) // self.alto_baldosa
+            baldosa = (fila[:, None] * self.omega + columna[None, :]).astype(np.int32)
+            claves = baldosa * self.hist_size + self._filas_extendidas(y0, y1)
+            histogramas += np.bincount(claves.ravel(), minlength=histogramas.size)
+        return histogramas.reshape(n_baldosas, self.hist_size).astype(np.int32)
+
+    def _filas_extendidas(self, y0, y1):
+        """Filas [y0, y1) de la imagen rellenada con reflexión (BORDER_REFLECT_101)."""
+        alto, ancho = self.imagen.shape
+        if y1 <= alto:
+            franja = np.asarray(self.imagen[y0:y1])
+        else:
+            franja = self.imagen[_reflejar_101(np.arange(y0, y1), alto)]
+        if self._relleno[1]:
+            franja = franja[:, _reflejar_101(np.arange(ancho + self._relleno[1]), ancho)]
+        return franja
+
+    def _luts_histogramas(self, histogramas, clip_limits):
+        """Recorte, redistribución y LUT para un conjunto de histogramas de baldosas."""
+        hist_size = self.hist_size
+        dtype = self.imagen.dtype
+        limites = np.array([
+            _limite_recorte(a, self.area_baldosa, hist_size) or self.area_baldosa
+            for a in clip_limits
+        ], dtype=np.int32)
+        escala = np.float32(hist_size - 1) / np.float32(self.area_baldosa)
+
+        # Se procesan varios α a la vez mientras el tamaño intermedio lo permita
+        salida = np.empty((len(limites),) + histogramas.shape, dtype=dtype)
+        paso_alpha = max(1, ELEMENTOS_POR_BLOQUE // histogramas.size)
+        for a0 in range(0, len(limites), paso_alpha):
+            bloque = limites[a0:a0 + paso_alpha]
+
+            # Recorte vectorizado para los α del bloque y todas las baldosas
+            hist = np.minimum(histogramas[None], bloque[:, None, None])
+            recortados = self.area_baldosa - hist.sum(axis=-1, dtype=np.int64)
+
+            # Redistribución: lote uniforme + residuo repartido con paso fijo
+            # (un incremento en los niveles 0, paso, 2·paso, ... por baldosa)
+            lote = recortados // hist_size
+            residuo = (recortados - lote * hist_size).ravel()
+            paso = np.maximum(hist_size // np.maximum(residuo, 1), 1)
+            hist += lote[..., None].astype(np.int32)
+            baldosa = np.repeat(np.arange(residuo.size), residuo)
+            orden = np.arange(baldosa.size) - np.repeat(np.cumsum(residuo) - residuo, residuo)
+            hist.reshape(-1, hist_size)[baldosa, orden * paso[baldosa]] += 1
+
+            # Valores en [0, hist_size - 1]: rint no puede superar el máximo
+            acumulado = np.cumsum(hist, axis=-1, dtype=np.int32).astype(np.float32)
+            acumulado *= escala
+            salida[a0:a0 + paso_alpha] = np.rint(acumulado, out=acumulado)
+        return salida
+
+    def luts(self, clip_limits):
+        """
+        Tablas de transformación por baldosa para un vector de clip limits.
+
+        Returns:
+            Array de forma (len(clip_limits), ω·ω, hist_size) con el dtype de la imagen
+        """
+        histogramas = self.histogramas
+        if histogramas is None:
+            histogramas = self._histogramas_filas(0, self.omega)
+        return self._luts_histogramas(histogramas, clip_limits)
+
+    def luts_interpolacion(self, clip_limits):
+        """LUTs en float32 por α, en el formato que espera aplicar_filas."""
+        if self.histogramas is None:
+            return _LutsPorFilaBaldosas(self, clip_limits)
+        # Las LUT en float32 son exactas (enteros 0-255) y evitan conversiones
+        luts = self.luts(clip_limits).astype(np.float32)
+        return luts.reshape(luts.shape[0], -1)
+
+    def aplicar(self, clip_limits):
+        """
+        Aplica CLAHE para todos los clip limits reutilizando los histogramas.
+
+        Returns:
+            Array de forma (len(clip_limits), alto, ancho) con el dtype de la imagen
+        """
+        return self.aplicar_filas(self.luts_interpolacion(clip_limits),
+                                  0, self.imagen.shape[0])
+
+    def aplicar_filas(self, luts, y0, y1):
+        """
+        Interpola las filas [y0, y1) de la salida CLAHE para cada LUT.
+
+        Los pesos dependen solo de la posición absoluta de cada píxel, por lo
+        que las franjas aplicadas por separado coinciden exactamente con la
+        imagen completa.
+
+        Args:
+            luts: Resultado de luts_interpolacion
+            y0, y1: Rango de filas de la imagen original
+
+        Returns:
+            Array de forma (len(luts), y1 - y0, ancho) con el dtype de la imagen
+        """
+        alto, ancho = self.imagen.shape
+        hist_size = self.hist_size
+        ty1, ty2, ya, ya1 = _coeficientes_interpolacion(alto, self.alto_baldosa, self.omega)
+        tx1, tx2, xa, xa1 = _coeficientes_interpolacion(ancho, self.ancho_baldosa, self.omega)
+
+        # Desplazamientos de columna dentro de la tabla de una fila de baldosas
+        columna1 = (tx1 * hist_size).astype(np.int32)
+        columna2 = (tx2 * hist_size).astype(np.int32)
+        ya, ya1 = ya[:, None], ya1[:, None]
+
+        if isinstance(luts, _LutsPorFilaBaldosas):
+            # Tramos de filas que comparten el mismo par de filas de baldosas
+            n_alpha = luts.n_alpha
+            fila1 = fila2 = np.zeros((alto, 1), np.int32)
+            clave = ty1[y0:y1] * self.omega + ty2[y0:y1]
+            cortes = [y0] + list(y0 + 1 + np.flatnonzero(np.diff(clave))) + [y1]
+            tramos = [(t0, t1, luts.fila(ty1[t0]), luts.fila(ty2[t0]))
+                      for t0, t1 in zip(cortes[:-1], cortes[1:])]
+        else:
+            # Tabla completa: desplazamiento de fila de baldosas por fila de píxeles
+            n_alpha = luts.shape[0]
+            fila1 = (ty1 * self.omega * hist_size).astype(np.int32)[:, None]
+            fila2 = (ty2 * self.omega * hist_size).astype(np.int32)[:, None]
+            tramos = [(y0, y1, luts, luts)]
+
+        salida = np.empty((n_alpha, y1 - y0, ancho), dtype=self.imagen.dtype)
+        filas_bloque = max(1, ELEMENTOS_POR_BLOQUE // ancho)
+
+        for t0, t1, luts_superior, luts_inferior in tramos:
+            for b0 in range(t0, t1, filas_bloque):
+                b1 = min(b0 + filas_bloque, t1)
+                valores = self.imagen[b0:b1].astype(np.int32)
+                v1 = valores + columna1
+                v2 = valores + columna2
+                i11, i12 = v1 + fila1[b0:b1], v2 + fila1[b0:b1]
+                i21, i22 = v1 + fila2[b0:b1], v2 + fila2[b0:b1]
+
+                for a in range(n_alpha):
+                    lut, lut_inferior = luts_superior[a], luts_inferior[a]
+                    # Mismo orden de operaciones en float32 que OpenCV:
+                    # (l11·xa1 + l12·xa)·ya1 + (l21·xa1 + l22·xa)·ya
+                    superior = lut.take(i11)
+                    superior *= xa1
+                    tmp = lut.take(i12)
+                    tmp *= xa
+                    superior += tmp
+                    superior *= ya1[b0:b1]
+                    inferior = lut_inferior.take(i21)
+                    inferior *= xa1
+                    tmp = lut_inferior.take(i22)
+                    tmp *= xa
+                    inferior += tmp
+                    inferior *= ya[b0:b1]
+                    superior += inferior
+                    # Combinación convexa de valores de la LUT: no requiere saturación
+                    salida[a, b0 - y0:b1 - y0] = np.rint(superior, out=superior)
+
+        return salida
+
+def _reflejar_101(indices, n):
+    """
+    Índices en [0, n) de un eje rellenado con BORDER_REFLECT_101, repitiendo
+    la reflexión cuando el relleno supera al eje (como cv2.borderInterpolate).
+    """
+    if n == 1:
+        return np.zeros_like(indices)
+    periodo = 2 * (n - 1)
+    indices = np.abs(indices) % periodo
+    return np.where(indices < n, indices, periodo - indices)
+
+def clahe_lote(imagen, clip_limits, omega):
+    """Aplica CLAHE con rejilla ω × ω (uint8 o uint16) para un vector de clip limits."""
+    return HistogramasBaldosas(imagen, omega).aplicar(clip_limits)
+
+def _histogramas_enteros(histogramas, total):
+    """
+    Redondea histogramas float (uno por fila) a enteros que suman `total`:
+    parte entera más una unidad en los niveles de mayor parte fraccionaria.
+    """
+    enteros = np.floor(histogramas)
+    fraccion = histogramas - enteros
+    enteros = enteros.astype(np.int32)
+    faltan = total - enteros.sum(axis=1)
+    orden = np.argsort(-fraccion, axis=1, kind='stable')
+    rango = np.arange(histogramas.shape[1])[None, :]
+    np.put_along_axis(enteros, orden, np.take_along_axis(enteros, orden, axis=1)
+                      + (rango < faltan[:, None]), axis=1)
+    return enteros
+
+def _tramos(t1, t2):
+    """Tramos [inicio, fin) consecutivos con el mismo par de baldosas vecinas (t1, t2)."""
+    clave = t1 * (int(t2.max()) + 1) + t2
+    cortes = [0] + list(1 + np.flatnonzero(np.diff(clave))) + [len(t1)]
+    return [(c0, c1, int(t1[c0]), int(t2[c0])) for c0, c1 in zip(cortes[:-1], cortes[1:])]
+
+class ClaheTemporal:
+    """
+    CLAHE para secuencias de fotogramas con histogramas por baldosa
+    suavizados en el tiempo (uint8).
+
+    Los histogramas de cada baldosa se promedian de forma exponencial entre
+    fotogramas, H = suavizado·H + (1 - suavizado)·h, y las LUT se obtienen de
+    ese promedio (redondeado a enteros con el mismo total), lo que evita el
+    parpadeo entre fotogramas casi idénticos. Con actualizar_cada = k los
+    histogramas y las LUT solo se recalculan uno de cada k fotogramas; en el
+    resto se reutilizan las LUT vigentes y solo se interpola. Con
+    suavizado=0 y actualizar_cada=1 equivale a cv2.createCLAHE fotograma a
+    fotograma, que es lo que se usa en ese caso.
+    """
+
+    def __init__(self, alpha, omega, suavizado=0.0, actualizar_cada=1):
+        if not 0 <= suavizado < 1:
+            raise ValueError(f"suavizado debe estar en [0, 1): {suavizado}")
+        if actualizar_cada < 1:
+            raise ValueError(f"actualizar_cada debe ser >= 1: {actualizar_cada}")
+        self.alpha = float(alpha)
+        self.omega = int(omega)
+        self.suavizado = float(suavizado)
+        self.actualizar_cada = int(actualizar_cada)
+        self._clahe = None
+        if self.suavizado == 0 and self.actualizar_cada == 1:
+            self._clahe = cv2.createCLAHE(clipLimit=self.alpha,
+                                          tileGridSize=(self.omega, self.omega))
+        self._forma = None
+        self._promedio = None
+        self._luts = None
+        self._geometria = None
+        self._contador = 0
+
+    def aplicar(self, fotograma):
+        """
+        Aplica CLAHE a un fotograma de la secuencia (todos de igual forma).
+
+        Raises:
+            ValueError: Si el fotograma no es uint8 con suavizado o
+                actualizar_cada > 1 (uint16 solo sin ellos), o cambia de forma
+        """
+        if fotograma.dtype != np.uint8 and (self._clahe is None or fotograma.dtype != np.uint16):
+            raise ValueError(f"Tipo de fotograma no admitido: {fotograma.dtype} (el suavizado "
+                             f"temporal requiere uint8)")
+        if self._forma is None:
+            self._forma = fotograma.shape
+        elif fotograma.shape != self._forma:
+            raise ValueError(f"Fotograma de forma {fotograma.shape} en una secuencia de "
+                             f"{self._forma}")
+        contador = self._contador
+        self._contador += 1
+        if self._clahe is not None:
+            return self._clahe.apply(fotograma)
+
+        if contador % self.actualizar_cada == 0:
+            baldosas = HistogramasBaldosas(fotograma, self.omega)
+            actual = baldosas.histogramas.astype(np.float64)
+            if self._promedio is None or self.suavizado == 0:
+                self._promedio = actual
+            else:
+                self._promedio *= self.suavizado
+                self._promedio += (1 - self.suavizado) * actual
+                baldosas.histogramas = _histogramas_enteros(self._promedio,
+                                                            baldosas.area_baldosa)
+            self._luts = baldosas.luts([self.alpha])[0]
+            if self._geometria is None:
+                self._geometria = self._calcular_geometria(baldosas)
+        return self._interpolar(fotograma)
+
+    def _calcular_geometria(self, baldosas):
+        alto, ancho = self._forma
+        ty1, ty2, ya, ya1 = _coeficientes_interpolacion(alto, baldosas.alto_baldosa, self.omega)
+        tx1, tx2, xa, xa1 = _coeficientes_interpolacion(ancho, baldosas.ancho_baldosa,
+                                                        self.omega)
+        return _tramos(ty1, ty2), _tramos(tx1, tx2), ya, ya1, xa, xa1
+
+    def _interpolar(self, fotograma):
+        """
+        Interpolación bilineal entre las LUT de las cuatro baldosas vecinas.
+
+        Las filas y columnas se agrupan en tramos con las mismas baldosas
+        vecinas, de modo que cada tramo se transforma con cv2.LUT y los
+        valores se combinan por bloques de filas con el mismo orden de
+        operaciones en float32 que aplicar_filas (y OpenCV).
+        """
+        tramos_filas, tramos_columnas, ya, ya1, xa, xa1 = self._geometria
+        luts, omega = self._luts, self.omega
+        alto, ancho = self._forma
+        salida = np.empty(self._forma, dtype=np.uint8)
+        # Bloques pequeños para que los temporales quepan en caché
+        filas_bloque = max(1, (ELEMENTOS_POR_BLOQUE >> 5) // ancho)
+        valores = np.empty((4, filas_bloque, ancho), dtype=np.uint8)
+        superior = np.empty((filas_bloque, ancho), dtype=np.float32)
+        inferior = np.empty_like(superior)
+        tmp = np.empty_like(superior)
+
+        for f0, f1, t1, t2 in tramos_filas:
+            for b0 in range(f0, f1, filas_bloque):
+                b1 = min(b0 + filas_bloque, f1)
+                h = b1 - b0
+                for c0, c1, s1, s2 in tramos_columnas:
+                    bloque = fotograma[b0:b1, c0:c1]
+                    for k, baldosa in enumerate((t1 * omega + s1, t1 * omega + s2,
+                                                 t2 * omega + s1, t2 * omega + s2)):
+                        valores[k, :h, c0:c1] = cv2.LUT(bloque, luts[baldosa])
+                s, i, t = superior[:h], inferior[:h], tmp[:h]
+                # (l11·xa1 + l12·xa)·ya1 + (l21·xa1 + l22·xa)·ya
+                np.multiply(valores[0, :h], xa1, out=s)
+                np.multiply(valores[1, :h], xa, out=t)
+                s += t
+                s *= ya1[b0:b1, None]
+                np.multiply(valores[2, :h], xa1, out=i)
+                np.multiply(valores[3, :h], xa, out=t)
+                i += t
+                i *= ya[b0:b1, None]
+                s += i
+                salida[b0:b1] = np.rint(s, out=s)
+        return salida
@@ -0,0 +1,92 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+class CargadorAnticipado:
+    """
+    Recorre una secuencia de imágenes decodificando las siguientes en hilos
+    mientras se procesa la actual (cv2.imread libera el GIL). La secuencia
+    se consume de forma perezosa, de modo que puede ser una cola de trabajo.
+
+    Se mantienen como máximo `profundidad` imágenes en curso o ya cargadas
+    por delante de la actual y, con memoria_maxima_mb, no se anticipa otra
+    si las imágenes retenidas (más una del mayor tamaño visto) superarían
+    ese límite; siempre se permite al menos una. Las imágenes mapeadas en
+    memoria no cuentan para el límite. Con profundidad=0 cada imagen se
+    carga de forma síncrona al pedirla.
+
+    espera_total acumula el tiempo que el barrido ha esperado por la E/S.
+    """
+
+    def __init__(self, rutas, cargar, profundidad=2, memoria_maxima_mb=None):
+        self.rutas = rutas
+        self.cargar = cargar
+        self.profundidad = max(int(profundidad), 0)
+        self.memoria_maxima = (None if memoria_maxima_mb is None
+                               else memoria_maxima_mb * 1024 ** 2)
+        self.espera_total = 0.0
+        self._mayor = 0
+
+    def _cargar_seguro(self, ruta):
+        """Carga una imagen; un error de lectura se trata como imagen ilegible."""
+        try:
+            imagen = self.cargar(ruta)
+        except Exception as e:
+            print(f"  ✗ {ruta.name}: {e}")
+            return None
+        if imagen is not None:
+            self._mayor = max(self._mayor, _bytes_retenidos(imagen))
+        return imagen
+
+    def _hay_hueco(self, en_curso):
+        if not en_curso:
+            return True
+        if len(en_curso) >= self.profundidad:
+            return False
+        if self.memoria_maxima is None:
+            return True
+        retenido = 0
+        for _, futuro in en_curso:
+            retenido += _bytes_retenidos(futuro.result()) if futuro.done() else self._mayor
+        return retenido + self._mayor <= self.memoria_maxima
+
+    def _esperar(self, obtener):
+        inicio = time.perf_counter()
+        try:
+            return obtener()
+        finally:
+            self.espera_total += time.perf_counter() - inicio
+
+    def __iter__(self):
+        """
+        Genera pares (ruta, obtener): obtener() devuelve la imagen (None si
+        no se pudo leer), esperando a que termine su carga si hace falta.
+        """
+        if self.profundidad == 0:
+            for ruta in self.rutas:
+                yield ruta, lambda ruta=ruta: self._esperar(lambda: self._cargar_seguro(ruta))
+            return
+
+        with ThreadPoolExecutor(max_workers=self.profundidad) as pool:
+            rutas = iter(self.rutas)
+            en_curso = deque()
+            agotadas = False
+            while True:
+                while not agotadas and self._hay_hueco(en_curso):
+                    ruta = next(rutas, None)
+                    if ruta is None:
+                        agotadas = True
+                    else:
+                        en_curso.append((ruta, pool.submit(self._cargar_seguro, ruta)))
+                if not en_curso:
+                    return
+                ruta, futuro = en_curso.popleft()
+                yield ruta, lambda futuro=futuro: self._esperar(futuro.result)
+
+def _bytes_retenidos(imagen):
+    """Memoria que ocupa una imagen cargada (0 si es None o está mapeada)."""
+    if imagen is None or isinstance(imagen, np.memmap):
+        return 0
+    return imagen.nbytes
@@ -0,0 +1,157 @@
+import json
+import cv2
+import numpy as np
+from pathlib import Path
+
+from cache_resultados import hash_archivo
+
+# Archivos hermanos de cada imagen que definen su región de interés:
+# <nombre>.mascara.<ext> (distinto de cero = región) o <nombre>.roi.json
+# con {"x": ..., "y": ..., "ancho": ..., "alto": ...} en píxeles
+SUFIJO_MASCARA = '.mascara'
+SUFIJO_CAJA = '.roi.json'
+EXTENSIONES_MASCARA = ('.png', '.npy', '.tif', '.tiff', '.bmp')
+
+# Píxeles de contexto mínimos alrededor de la región al aplicar CLAHE solo
+# al recorte (fijos para que la salida no dependa de las métricas elegidas)
+MARGEN_RECORTE = 16
+
+class RegionInteres:
+    """
+    Región de interés de una imagen: una caja (y0, y1, x0, x1) y,
+    opcionalmente, una máscara booleana recortada a esa caja (None = toda la
+    caja). Las métricas se calculan solo sobre sus píxeles.
+    """
+
+    def __init__(self, caja, mascara=None, firma=''):
+        self.caja = tuple(int(v) for v in caja)
+        self.mascara = mascara
+        # Huella de los archivos de los que procede (para la caché)
+        self.firma = firma
+
+    @property
+    def pixeles(self):
+        """Número de píxeles de la región."""
+        y0, y1, x0, x1 = self.caja
+        if self.mascara is None:
+            return (y1 - y0) * (x1 - x0)
+        return int(np.count_nonzero(self.mascara))
+
+    def zona(self, forma, margen):
+        """
+        Recorte de la imagen que cubre la región más `margen` píxeles por cada
+        lado (limitado a la imagen), y la máscara de la región en ese recorte.
+
+        Con un margen igual al halo de los filtros de las métricas, los
+        píxeles de la región ven en el recorte los mismos vecinos que en la
+        imagen completa.
+
+        Returns:
+            ((slice de filas, slice de columnas), máscara booleana del recorte)
+        """
+        y0, y1, x0, x1 = self.caja
+        alto, ancho = forma
+        r0, r1 = max(y0 - margen, 0), min(y1 + margen, alto)
+        c0, c1 = max(x0 - margen, 0), min(x1 + margen, ancho)
+        mascara = np.zeros((r1 - r0, c1 - c0), dtype=bool)
+        mascara[y0 - r0:y1 - r0, x0 - c0:x1 - c0] = (True if self.mascara is None
+                                                     else self.mascara)
+        return (slice(r0, r1), slice(c0, c1)), mascara
+
+    def desplazada(self, dy, dx):
+        """Misma región con el origen de coordenadas desplazado (p. ej. en un recorte)."""
+        y0, y1, x0, x1 = self.caja
+        return RegionInteres((y0 + dy, y1 + dy, x0 + dx, x1 + dx), self.mascara, self.firma)
+
+    def escalada(self, escala, forma):
+        """Región equivalente en una copia de la imagen reescalada a `forma`."""
+        y0, y1, x0, x1 = self.caja
+        alto, ancho = forma
+        r0, c0 = min(int(y0 * escala), alto - 1), min(int(x0 * escala), ancho - 1)
+        r1 = min(max(int(np.ceil(y1 * escala)), r0 + 1), alto)
+        c1 = min(max(int(np.ceil(x1 * escala)), c0 + 1), ancho)
+        mascara = None
+        if self.mascara is not None:
+            mascara = cv2.resize(self.mascara.astype(np.uint8), (c1 - c0, r1 - r0),
+                                 interpolation=cv2.INTER_NEAREST).astype(bool)
+            # Una región menor que un píxel del proxy se reduce a su caja
+            if mascara.all() or not mascara.any():
+                mascara = None
+        return RegionInteres((r0, r1, c0, c1), mascara, self.firma)
+
+def es_archivo_auxiliar(ruta):
+    """Indica si un archivo es una máscara o caja de otra imagen (no una imagen de entrada)."""
+    nombre = Path(ruta).name.lower()
+    return Path(Path(ruta).stem).suffix.lower() == SUFIJO_MASCARA or nombre.endswith(SUFIJO_CAJA)
+
+def _ruta_mascara(img_path):
+    for extension in EXTENSIONES_MASCARA:
+        ruta = img_path.with_name(f"{img_path.stem}{SUFIJO_MASCARA}{extension}")
+        if ruta.exists():
+            return ruta
+    return None
+
+def _leer_mascara(ruta):
+    if ruta.suffix.lower() == '.npy':
+        mascara = np.load(ruta, mmap_mode='r')
+    else:
+        mascara = cv2.imread(str(ruta), cv2.IMREAD_UNCHANGED)
+        if mascara is None:
+            raise ValueError(f"No se pudo leer la máscara {ruta.name}")
+        if mascara.ndim == 3:
+            mascara = mascara.max(axis=2)
+    if mascara.ndim != 2:
+        raise ValueError(f"La máscara {ruta.name} debe ser 2-D: {mascara.shape}")
+    return mascara
+
+def _leer_caja(ruta, forma):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        datos = json.load(f)
+    try:
+        x, y = int(datos['x']), int(datos['y'])
+        ancho, alto = int(datos['ancho']), int(datos['alto'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{ruta.name}: se esperaba {{\"x\", \"y\", \"ancho\", \"alto\"}}")
+    caja = (max(y, 0), min(y + alto, forma[0]), max(x, 0), min(x + ancho, forma[1]))
+    if caja[0] >= caja[1] or caja[2] >= caja[3]:
+        raise ValueError(f"{ruta.name}: la caja no se solapa con la imagen {forma}")
+    return caja
+
+def cargar_region_interes(img_path, forma):
+    """
+    Región de interés de una imagen a partir de sus archivos hermanos
+    (None si no tiene). Si hay máscara y caja, la máscara se limita a la caja.
+
+    Args:
+        img_path: Ruta de la imagen
+        forma: (alto, ancho) de la imagen
+
+    Raises:
+        ValueError: Si la máscara no tiene la forma de la imagen, o la región está vacía
+    """
+    img_path = Path(img_path)
+    ruta_mascara = _ruta_mascara(img_path)
+    ruta_caja = img_path.with_name(f"{img_path.stem}{SUFIJO_CAJA}")
+    if not ruta_caja.exists():
+        ruta_caja = None
+    if ruta_mascara is None and ruta_caja is None:
+        return None
+
+    firma = '-'.join(hash_archivo(r)[:16] for r in (ruta_mascara, ruta_caja) if r is not None)
+    caja = (0, forma[0], 0, forma[1]) if ruta_caja is None else _leer_caja(ruta_caja, forma)
+    if ruta_mascara is None:
+        return RegionInteres(caja, None, firma)
+
+    mascara = _leer_mascara(ruta_mascara)
+    if tuple(mascara.shape) != tuple(forma):
+        raise ValueError(f"La máscara {ruta_mascara.name} {mascara.shape} no tiene la forma "
+                         f"de la imagen {tuple(forma)}")
+    mascara = np.asarray(mascara[caja[0]:caja[1], caja[2]:caja[3]]) != 0
+    filas, columnas = np.flatnonzero(mascara.any(axis=1)), np.flatnonzero(mascara.any(axis=0))
+    if filas.size == 0:
+        raise ValueError(f"La máscara {ruta_mascara.name} no contiene ningún píxel")
+    # Caja ajustada a la máscara
+    mascara = mascara[filas[0]:filas[-1] + 1, columnas[0]:columnas[-1] + 1]
+    caja = (caja[0] + filas[0], caja[0] + filas[-1] + 1,
+            caja[2] + columnas[0], caja[2] + columnas[-1] + 1)
+    return RegionInteres(caja, None if mascara.all() else mascara, firma)
@@ -0,0 +1,395 @@
+import cv2
+import numpy as np
+
+from instrumentacion import medir
+
+# Registro de métricas en tres niveles: intermedios (mapas por píxel que se
+# calculan una vez por salida CLAHE y se comparten), reducciones (sumas por
+# filas acumulables entre franjas) y métricas (valor final a partir de las
+# sumas). Cada nivel declara de qué depende del anterior, de modo que solo
+# se calcula lo que necesitan las métricas seleccionadas.
+INTERMEDIOS = {}
+REDUCCIONES = {}
+METRICAS = {}
+
+# Métricas que se evalúan si no se indica otra selección
+METRICAS_POR_DEFECTO = ('entropia', 'contraste_local_promedio', 'nitidez_borde',
+                        'contraste_michelson')
+
+class Intermedio:
+    """Mapa por píxel derivado de la salida CLAHE (o de la imagen original)."""
+
+    def __init__(self, nombre, calcular, requiere=(), halo=0, referencia=False):
+        self.nombre = nombre
+        self.calcular = calcular
+        self.requiere = tuple(requiere)
+        # Filas de contexto que necesita por franjas: entero o función del evaluador
+        self.halo = halo
+        self.referencia = referencia
+
+class Reduccion:
+    """Suma sobre las filas [inicio, fin) de uno o varios intermedios."""
+
+    def __init__(self, nombre, calcular, requiere=(), etapa=None):
+        self.nombre = nombre
+        self.calcular = calcular
+        self.requiere = tuple(requiere)
+        self.etapa = etapa
+
+class Metrica:
+    """Métrica final: columna de la tabla maestra calculada a partir de reducciones."""
+
+    def __init__(self, clave, columna, etiqueta, calcular, reducciones=(), etapa=None):
+        self.clave = clave
+        self.columna = columna
+        self.etiqueta = etiqueta
+        self.calcular = calcular
+        self.reducciones = tuple(reducciones)
+        self.etapa = etapa
+
+def registrar_intermedio(nombre, requiere=(), halo=0, referencia=False):
+    """
+    Decorador que registra un intermedio. La función recibe el contexto de
+    evaluación (ver _Contexto) y devuelve un array de la forma de la imagen.
+
+    Args:
+        requiere: Intermedios de los que depende (contexto[nombre])
+        halo: Filas de vecindad que usan sus filtros (entero o función del evaluador)
+        referencia: Depende de la imagen original (SSIM, PSNR...)
+    """
+    def decorador(funcion):
+        INTERMEDIOS[nombre] = Intermedio(nombre, funcion, requiere, halo, referencia)
+        return funcion
+    return decorador
+
+def registrar_reduccion(nombre, requiere=(), etapa=None):
+    """
+    Decorador que registra una reducción: función (contexto, inicio, fin)
+    que devuelve un float o un array sumable entre franjas. etapa es la
+    etapa de instrumentacion en la que se mide (incluye sus intermedios).
+    """
+    def decorador(funcion):
+        REDUCCIONES[nombre] = Reduccion(nombre, funcion, requiere, etapa)
+        return funcion
+    return decorador
+
+def registrar_metrica(clave, columna, etiqueta, reducciones=(), etapa=None):
+    """
+    Decorador que registra una métrica: función (sumas, n_pixeles, evaluador)
+    que devuelve su valor, donde sumas es {reducción: suma acumulada}.
+
+    Args:
+        clave: Clave en el diccionario de métricas y en la caché
+        columna: Columna de la tabla maestra
+        etiqueta: Texto con que se muestra en consola
+    """
+    def decorador(funcion):
+        METRICAS[clave] = Metrica(clave, columna, etiqueta, funcion, reducciones, etapa)
+        return funcion
+    return decorador
+
+def resolver_metricas(metricas=None):
+    """
+    Claves de las métricas seleccionadas, en el orden dado.
+
+    Args:
+        metricas: Claves o columnas (p. ej. 'ssim' o 'SSIM'); None = METRICAS_POR_DEFECTO
+
+    Raises:
+        ValueError: Si alguna no está registrada
+    """
+    if metricas is None:
+        return METRICAS_POR_DEFECTO
+    por_columna = {m.columna: clave for clave, m in METRICAS.items()}
+    claves = []
+    for nombre in metricas:
+        clave = nombre if nombre in METRICAS else por_columna.get(nombre)
+        if clave is None:
+            raise ValueError(f"Métrica desconocida: {nombre} "
+                             f"(registradas: {tuple(m.columna for m in METRICAS.values())})")
+        if clave not in claves:
+            claves.append(clave)
+    return tuple(claves)
+
+def columnas_metricas(metricas=None):
+    """Columnas de la tabla maestra de las métricas seleccionadas."""
+    return [METRICAS[clave].columna for clave in resolver_metricas(metricas)]
+
+def _dependencias(nombres, registro):
+    """Cierre de dependencias de intermedios, con cada uno tras los que requiere."""
+    orden = []
+    def visitar(nombre):
+        if nombre not in orden:
+            for requerido in INTERMEDIOS[nombre].requiere:
+                visitar(requerido)
+            orden.append(nombre)
+    for nombre in nombres:
+        for requerido in registro[nombre].requiere:
+            visitar(requerido)
+    return orden
+
+class _Contexto:
+    """
+    Intermedios de una imagen (o franja): cada uno se calcula la primera vez
+    que se pide y se comparte entre todas las reducciones que lo usan.
+    """
+
+    def __init__(self, evaluador, imagen, referencia, mascara):
+        self.evaluador = evaluador
+        self.imagen = imagen
+        self.referencia = referencia
+        self.mascara = mascara
+        self._valores = {}
+
+    def __getitem__(self, nombre):
+        if nombre not in self._valores:
+            self._valores[nombre] = INTERMEDIOS[nombre].calcular(self)
+        return self._valores[nombre]
+
+    def buffer(self, nombre):
+        """Buffer float32 de la forma de la imagen, reutilizado entre llamadas."""
+        return self.evaluador._buffer(nombre, self.imagen.shape)
+
+    def filas(self, mapa, inicio, fin):
+        """
+        Píxeles de las filas [inicio, fin) de un mapa que entran en las
+        métricas: las filas completas, o solo los de la máscara (1-D) si la hay.
+        """
+        if self.mascara is None:
+            return mapa[inicio:fin]
+        return mapa[inicio:fin][self.mascara[inicio:fin]]
+
+class EvaluadorMetricas:
+    """
+    Evaluador fusionado de las métricas seleccionadas sobre una imagen uint8 o uint16.
+
+    Solo se calculan los intermedios y reducciones que necesitan las métricas
+    pedidas, cada uno una vez por imagen: el histograma se comparte entre la
+    entropía y el contraste de Michelson, la imagen en float32 entre el
+    contraste local, el PSNR y el SSIM, etc. Reutiliza buffers float32 entre
+    llamadas (se reservan de nuevo solo si cambia la forma de la imagen),
+    obtiene la varianza local con filtros de caja y el gradiente de Sobel en
+    CV_32F. Los valores coinciden con las funciones calcular_* de
+    generar_datos_clahe salvo redondeo de float32 (~1e-6 relativo). Todas las
+    operaciones son deterministas: el resultado no depende del número de
+    hilos de OpenCV. Cada proceso debe usar su propia instancia.
+
+    El histograma se acumula siempre con todos los niveles del tipo (256 o
+    65536, con bincount) y la entropía se calcula agrupándolo en `bins`
+    intervalos de igual anchura (None = un intervalo por nivel). El
+    contraste local y la nitidez se expresan en unidades de intensidad de la
+    imagen, por lo que solo son comparables entre imágenes de igual profundidad.
+    """
+
+    def __init__(self, kernel_size=3, bins=None, metricas=None):
+        if bins is not None and (bins < 1 or bins > 65536 or bins & (bins - 1)):
+            raise ValueError(f"bins debe ser una potencia de 2 entre 1 y 65536: {bins}")
+        self.kernel_size = kernel_size
+        self.bins = bins
+        self.metricas = resolver_metricas(metricas)
+        nombres = []
+        for clave in self.metricas:
+            nombres.extend(r for r in METRICAS[clave].reducciones if r not in nombres)
+        self._reducciones = [REDUCCIONES[nombre] for nombre in nombres]
+        intermedios = [INTERMEDIOS[nombre] for nombre in _dependencias(nombres, REDUCCIONES)]
+        self.requiere_referencia = any(i.referencia for i in intermedios)
+        # Filas de contexto que necesitan las sumas por franjas (al menos una)
+        self.halo = max([1] + [i.halo(self) if callable(i.halo) else i.halo
+                               for i in intermedios])
+        self._buffers = {}
+
+    def _buffer(self, nombre, forma):
+        buffer = self._buffers.get(nombre)
+        if buffer is None or buffer.shape != forma:
+            buffer = self._buffers[nombre] = np.empty(forma, np.float32)
+        return buffer
+
+    def sumas(self, imagen, inicio=0, fin=None, cronometro=None, clave=None, referencia=None,
+              mascara=None):
+        """
+        Sumas parciales de las métricas sobre las filas [inicio, fin).
+
+        imagen puede ser una franja con filas de halo alrededor del rango: los
+        filtros ven así los mismos vecinos que en la imagen completa, y en los
+        bordes reales de la imagen se aplica la reflexión por defecto de
+        OpenCV. Se requieren self.halo filas de halo (o el borde de la imagen).
+        referencia es la imagen original (o la misma franja de ella) para las
+        métricas que la comparan con la salida. Con una máscara booleana de la
+        forma de imagen solo cuentan sus píxeles (ver region_interes); los
+        filtros siguen viendo a los vecinos de fuera. Con un cronómetro (ver
+        instrumentacion) cada reducción se mide en su etapa con la clave dada.
+
+        Returns:
+            Diccionario {reducción: suma} con el número de píxeles en 'n_pixeles'
+
+        Raises:
+            ValueError: Si alguna métrica seleccionada requiere referencia y no se da
+        """
+        if self.requiere_referencia and referencia is None:
+            raise ValueError("Las métricas seleccionadas requieren la imagen original")
+        fin = imagen.shape[0] if fin is None else fin
+        contexto = _Contexto(self, imagen, referencia, mascara)
+        sumas = {}
+        for reduccion in self._reducciones:
+            with medir(cronometro, reduccion.etapa, clave):
+                sumas[reduccion.nombre] = reduccion.calcular(contexto, inicio, fin)
+        sumas['n_pixeles'] = ((fin - inicio) * imagen.shape[1] if mascara is None
+                              else int(np.count_nonzero(mascara[inicio:fin])))
+        return sumas
+
+    @staticmethod
+    def acumular(acumuladas, sumas):
+        """Suma dos resultados de sumas() (None = vacío), p. ej. de franjas consecutivas."""
+        if acumuladas is None:
+            return dict(sumas)
+        return {nombre: acumuladas[nombre] + valor for nombre, valor in sumas.items()}
+
+    def metricas_desde_sumas(self, sumas, cronometro=None, clave=None):
+        """Diccionario de métricas a partir de sumas (posiblemente acumuladas por franjas)."""
+        metricas = {}
+        for clave_metrica in self.metricas:
+            metrica = METRICAS[clave_metrica]
+            with medir(cronometro, metrica.etapa, clave):
+                metricas[clave_metrica] = metrica.calcular(sumas, sumas['n_pixeles'], self)
+        return metricas
+
+    def evaluar(self, imagen, cronometro=None, clave=None, referencia=None, mascara=None):
+        """Devuelve el diccionario de métricas que se registra en JSON y CSV."""
+        return self.metricas_desde_sumas(self.sumas(imagen, cronometro=cronometro, clave=clave,
+                                                    referencia=referencia, mascara=mascara),
+                                         cronometro=cronometro, clave=clave)
+
+# ----------------------------------------------------------------------------
+# Intermedios
+# ----------------------------------------------------------------------------
+
+@registrar_intermedio('imagen_f32')
+def _imagen_f32(contexto):
+    f = contexto.buffer('imagen_f32')
+    np.copyto(f, contexto.imagen)
+    return f
+
+@registrar_intermedio('referencia_f32', referencia=True)
+def _referencia_f32(contexto):
+    f = contexto.buffer('referencia_f32')
+    np.copyto(f, contexto.referencia)
+    return f
+
+@registrar_intermedio('desviacion_local', requiere=('imagen_f32',),
+                      halo=lambda evaluador: 2 * (evaluador.kernel_size // 2))
+def _desviacion_local(contexto):
+    # Media local, desviación cuadrática y su media local: dos filtros de caja encadenados
+    k = (contexto.evaluador.kernel_size,) * 2
+    f = contexto['imagen_f32']
+    local = contexto.buffer('desviacion_local')
+    diferencia = contexto.buffer('diferencia')
+    cv2.boxFilter(f, -1, k, dst=local)
+    cv2.subtract(f, local, dst=diferencia)
+    cv2.multiply(diferencia, diferencia, dst=diferencia)
+    cv2.boxFilter(diferencia, -1, k, dst=local)
+    cv2.sqrt(local, dst=local)
+    return local
+
+@registrar_intermedio('magnitud_gradiente', halo=1)
+def _magnitud_gradiente(contexto):
+    # Magnitud del gradiente de Sobel 3 × 3
+    gx = contexto.buffer('magnitud_gradiente')
+    gy = contexto.buffer('gradiente_y')
+    cv2.Sobel(contexto.imagen, cv2.CV_32F, 1, 0, dst=gx, ksize=3)
+    cv2.Sobel(contexto.imagen, cv2.CV_32F, 0, 1, dst=gy, ksize=3)
+    np.multiply(gx, gx, out=gx)
+    np.multiply(gy, gy, out=gy)
+    np.add(gx, gy, out=gx)
+    np.sqrt(gx, out=gx)
+    return gx
+
+@registrar_intermedio('mapa_ssim', requiere=('imagen_f32', 'referencia_f32'), halo=5)
+def _mapa_ssim(contexto):
+    # SSIM local de Wang et al. (2004): ventana gaussiana 11 × 11 con σ = 1.5
+    x, y = contexto['referencia_f32'], contexto['imagen_f32']
+    L = float(np.iinfo(contexto.imagen.dtype).max)
+    C1, C2 = (0.01 * L) ** 2, (0.03 * L) ** 2
+    def suavizar(a):
+        return cv2.GaussianBlur(a, (11, 11), 1.5)
+    mu_x, mu_y = suavizar(x), suavizar(y)
+    mu_xx, mu_yy, mu_xy = mu_x * mu_x, mu_y * mu_y, mu_x * mu_y
+    var_x = suavizar(x * x) - mu_xx
+    var_y = suavizar(y * y) - mu_yy
+    cov = suavizar(x * y) - mu_xy
+    mapa = contexto.buffer('mapa_ssim')
+    np.divide((2 * mu_xy + C1) * (2 * cov + C2),
+              (mu_xx + mu_yy + C1) * (var_x + var_y + C2), out=mapa)
+    return mapa
+
+# ----------------------------------------------------------------------------
+# Reducciones
+# ----------------------------------------------------------------------------
+
+@registrar_reduccion('histograma', etapa='Entropia')
+def _histograma(contexto, inicio, fin):
+    # Entropía de Shannon y extremos para Michelson
+    imagen = contexto.imagen
+    niveles = 256 if imagen.dtype == np.uint8 else 65536
+    return np.bincount(contexto.filas(imagen, inicio, fin).ravel(), minlength=niveles)
+
+@registrar_reduccion('suma_contraste_local', requiere=('desviacion_local',),
+                     etapa='Contraste_Local')
+def _suma_contraste_local(contexto, inicio, fin):
+    return float(contexto.filas(contexto['desviacion_local'], inicio, fin).sum(dtype=np.float64))
+
+@registrar_reduccion('suma_nitidez', requiere=('magnitud_gradiente',), etapa='Nitidez_Borde')
+def _suma_nitidez(contexto, inicio, fin):
+    return float(contexto.filas(contexto['magnitud_gradiente'], inicio, fin).sum(dtype=np.float64))
+
+@registrar_reduccion('suma_error_relativo', requiere=('imagen_f32', 'referencia_f32'),
+                     etapa='PSNR')
+def _suma_error_relativo(contexto, inicio, fin):
+    # Error cuadrático respecto del original, relativo al nivel máximo del tipo
+    diferencia = contexto.buffer('diferencia')
+    cv2.subtract(contexto['imagen_f32'], contexto['referencia_f32'], dst=diferencia)
+    valores = contexto.filas(diferencia, inicio, fin).ravel()
+    L = float(np.iinfo(contexto.imagen.dtype).max)
+    return float(np.einsum('i,i->', valores, valores, dtype=np.float64)) / (L * L)
+
+@registrar_reduccion('suma_ssim', requiere=('mapa_ssim',), etapa='SSIM')
+def _suma_ssim(contexto, inicio, fin):
+    return float(contexto.filas(contexto['mapa_ssim'], inicio, fin).sum(dtype=np.float64))
+
+# ----------------------------------------------------------------------------
+# Métricas
+# ----------------------------------------------------------------------------
+
+@registrar_metrica('entropia', 'Entropia', 'Entropía', ('histograma',), etapa='Entropia')
+def _entropia(sumas, n_pixeles, evaluador):
+    histograma = sumas['histograma']
+    if evaluador.bins is not None and evaluador.bins < histograma.size:
+        histograma = histograma.reshape(evaluador.bins, -1).sum(axis=1)
+    p = histograma[histograma > 0] / n_pixeles
+    return float(np.sum(p * np.log2(1 / p)))
+
+@registrar_metrica('contraste_local_promedio', 'Contraste_Local_Promedio', 'Contraste Local',
+                   ('suma_contraste_local',), etapa='Contraste_Local')
+def _contraste_local_promedio(sumas, n_pixeles, evaluador):
+    return sumas['suma_contraste_local'] / n_pixeles
+
+@registrar_metrica('nitidez_borde', 'Nitidez_Borde', 'Nitidez Borde', ('suma_nitidez',),
+                   etapa='Nitidez_Borde')
+def _nitidez_borde(sumas, n_pixeles, evaluador):
+    return sumas['suma_nitidez'] / n_pixeles
+
+@registrar_metrica('contraste_michelson', 'Contraste_Michelson', 'Contraste Michelson',
+                   ('histograma',), etapa='Michelson')
+def _contraste_michelson(sumas, n_pixeles, evaluador):
+    niveles = np.flatnonzero(sumas['histograma'])
+    I_min, I_max = int(niveles[0]), int(niveles[-1])
+    return (I_max - I_min) / (I_max + I_min) if I_max + I_min else 0
+
+@registrar_metrica('psnr', 'PSNR', 'PSNR (dB)', ('suma_error_relativo',), etapa='PSNR')
+def _psnr(sumas, n_pixeles, evaluador):
+    # Respecto de la imagen original; infinito si la salida es idéntica
+    mse = sumas['suma_error_relativo'] / n_pixeles
+    return float(-10 * np.log10(mse)) if mse > 0 else float('inf')
+
+@registrar_metrica('ssim', 'SSIM', 'SSIM', ('suma_ssim',), etapa='SSIM')
+def _ssim(sumas, n_pixeles, evaluador):
+    return sumas['suma_ssim'] / n_pixeles
@@ -0,0 +1,235 @@
+import argparse
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+
+from almacenamiento import finalizar_almacen
+from diario_resultados import NOMBRE_DIARIO, leer_lineas_diario
+from registro_metricas import METRICAS
+
+# Tiempo tras el cual una tarea reclamada y no terminada (nodo caído) puede
+# volver a reclamarse
+CADUCIDAD_RECLAMACION_S = 6 * 3600
+
+def parsear_shard(shard):
+    """
+    Convierte 'i/N' (o una tupla (i, N)) en (i, N), con 0 <= i < N.
+
+    Raises:
+        ValueError: Si el formato o los valores no son válidos
+    """
+    if isinstance(shard, str):
+        try:
+            indice, total = (int(parte) for parte in shard.split('/'))
+        except ValueError:
+            raise ValueError(f"Shard no válido: {shard!r} (formato 'i/N')")
+    else:
+        indice, total = shard
+    if not 0 <= indice < total:
+        raise ValueError(f"Shard fuera de rango: {indice}/{total} (0 <= i < N)")
+    return indice, total
+
+def nombre_diario_shard(etiqueta):
+    """Nombre del diario de un shard o nodo: resultados_diario.<etiqueta>.jsonl."""
+    base, extension = os.path.splitext(NOMBRE_DIARIO)
+    return f"{base}.{etiqueta}{extension}"
+
+def nodo_por_defecto():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class ColaTrabajo:
+    """
+    Cola de trabajo en archivo compartido (SQLite) con una tarea por imagen.
+
+    Cada nodo reclama la siguiente imagen pendiente en una transacción
+    exclusiva y la marca como hecha cuando sus filas están en su diario.
+    Una reclamación sin terminar durante más de `caducidad_s` segundos se
+    considera de un nodo caído y vuelve a repartirse; si el nodo original
+    terminara después, la imagen aparecería en dos diarios y la combinación
+    conserva una sola copia.
+
+    Un nodo relanzado con el mismo identificador recupera primero las
+    imágenes que reclamó antes de caer y no llegó a terminar, sin esperar a
+    la caducidad.
+
+    SQLite depende del bloqueo de archivos del sistema de ficheros: es fiable
+    en disco local y en sistemas compartidos con bloqueo POSIX correcto, pero
+    no en todos los montajes NFS.
+    """
+
+    def __init__(self, ruta, imagenes, nodo=None, caducidad_s=CADUCIDAD_RECLAMACION_S):
+        """
+        Args:
+            ruta: Archivo SQLite de la cola (se crea si no existe)
+            imagenes: Lista completa y ordenada de imágenes del barrido; la
+                posición de cada una fija su bloque de IDs
+            nodo: Identificador de este trabajador (por defecto host-pid)
+        """
+        self.ruta = str(ruta)
+        self.nodo = nodo or nodo_por_defecto()
+        self.caducidad_s = caducidad_s
+        # Las reclamaciones propias anteriores son de una ejecución caída de
+        # este nodo; las posteriores están en curso en esta misma ejecución
+        self._inicio = time.time()
+        self._por_nombre = {img_path.name: img_path for img_path in imagenes}
+        self._ejecutar("CREATE TABLE IF NOT EXISTS tareas ("
+                       "imagen TEXT PRIMARY KEY, indice INTEGER, "
+                       "estado TEXT DEFAULT 'pendiente', nodo TEXT, instante REAL)")
+        self._ejecutar("INSERT OR IGNORE INTO tareas (imagen, indice) VALUES (?, ?)",
+                       [(img_path.name, indice) for indice, img_path in enumerate(imagenes)])
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=60, isolation_level=None)
+
+    def _ejecutar(self, sql, parametros=None):
+        """Ejecuta una sentencia (o una por cada tupla de una lista) en una transacción."""
+        conexion = self._conectar()
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            if isinstance(parametros, list):
+                conexion.executemany(sql, parametros)
+            else:
+                conexion.execute(sql, parametros or ())
+            conexion.execute("COMMIT")
+        finally:
+            conexion.close()
+
+    def reclamar(self):
+        """
+        Reclama la siguiente imagen (None si no queda ninguna): primero las
+        que este nodo dejó reclamadas en una ejecución anterior, después las
+        pendientes y las de reclamación caducada.
+        """
+        conexion = self._conectar()
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            ahora = time.time()
+            fila = conexion.execute(
+                "SELECT imagen FROM tareas WHERE estado = 'reclamada' AND nodo = ? "
+                "AND instante < ? ORDER BY indice LIMIT 1",
+                (self.nodo, self._inicio)).fetchone()
+            if fila is None:
+                fila = conexion.execute(
+                    "SELECT imagen FROM tareas WHERE estado = 'pendiente' "
+                    "OR (estado = 'reclamada' AND instante < ?) ORDER BY indice LIMIT 1",
+                    (ahora - self.caducidad_s,)).fetchone()
+            if fila is not None:
+                conexion.execute("UPDATE tareas SET estado = 'reclamada', nodo = ?, "
+                                 "instante = ? WHERE imagen = ?", (self.nodo, ahora, fila[0]))
+            conexion.execute("COMMIT")
+        finally:
+            conexion.close()
+        return None if fila is None else self._por_nombre[fila[0]]
+
+    def completar(self, img_path):
+        """Marca una imagen como hecha (sus filas ya están en el diario del nodo)."""
+        self._ejecutar("UPDATE tareas SET estado = 'hecha', nodo = ?, instante = ? "
+                       "WHERE imagen = ?", (self.nodo, time.time(), img_path.name))
+
+    def __iter__(self):
+        """Reclama imágenes una a una hasta vaciar la cola."""
+        while True:
+            img_path = self.reclamar()
+            if img_path is None:
+                return
+            yield img_path
+
+def estado_cola(ruta):
+    """Número de tareas de una cola de trabajo por estado."""
+    conexion = sqlite3.connect(str(ruta), timeout=60)
+    try:
+        return dict(conexion.execute("SELECT estado, COUNT(*) FROM tareas GROUP BY estado"))
+    finally:
+        conexion.close()
+
+def combinar_resultados(output_dir):
+    """
+    Combina los diarios de todos los shards/nodos de un directorio de
+    resultados (resultados_diario.<etiqueta>.jsonl) en resultados_maestros.csv.
+
+    Las filas se unen por ID_Experimento, que es global y estable en los
+    barridos repartidos. Un ID presente en varios diarios (p. ej. una tarea
+    reclamada de nuevo) se conserva una sola vez, y se avisa si sus métricas
+    difieren. Las líneas truncadas por una interrupción se descartan, y se
+    informa de las imágenes sin filas o incompletas para volver a lanzarlas.
+
+    Returns:
+        DataFrame maestro combinado
+
+    Raises:
+        FileNotFoundError: Si no hay diarios de shard o nodo en output_dir
+        ValueError: Si los diarios proceden de barridos con distinta configuración
+    """
+    import pandas as pd
+    # Solo diarios de shard o nodo: un resultados_diario.jsonl de una ejecución
+    # sin reparto en el mismo directorio no forma parte del barrido
+    rutas = sorted(Path(output_dir).glob(nombre_diario_shard('*')))
+    if not rutas:
+        raise FileNotFoundError(f"No hay diarios de resultados en {output_dir}")
+
+    configuracion = None
+    partes = []
+    for ruta in rutas:
+        configuracion_diario, filas = leer_lineas_diario(ruta)
+        if configuracion is None:
+            configuracion = configuracion_diario
+        elif configuracion_diario != configuracion:
+            raise ValueError(f"{ruta.name} procede de un barrido con otra configuración")
+        print(f"✓ {ruta.name}: {len(filas)} filas")
+        if filas:
+            partes.append(pd.DataFrame(filas))
+
+    df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    if not df.empty:
+        duplicadas = df[df.duplicated('ID_Experimento', keep=False)]
+        if not duplicadas.empty:
+            metricas = [m.columna for m in METRICAS.values() if m.columna in df.columns]
+            conflictos = duplicadas.groupby('ID_Experimento')[metricas].nunique().gt(1).any(axis=1)
+            print(f"✓ IDs repetidos entre diarios: {duplicadas['ID_Experimento'].nunique()} "
+                  f"(se conserva una copia)")
+            if conflictos.any():
+                print(f"  ✗ Con métricas distintas: {list(conflictos[conflictos].index)}")
+        df = (df.drop_duplicates('ID_Experimento', keep='first')
+                .sort_values('ID_Experimento', kind='stable').reset_index(drop=True))
+
+    # Imágenes sin filas (ilegibles o no procesadas) o incompletas
+    filas_por_imagen = df.groupby('Imagen_Original').size() if not df.empty else pd.Series()
+    esperadas = configuracion.get('evaluaciones_por_imagen')
+    sin_filas = [nombre for nombre in configuracion['imagenes']
+                 if nombre not in filas_por_imagen.index]
+    incompletas = [nombre for nombre, n in filas_por_imagen.items()
+                   if esperadas is not None and n < esperadas]
+    if sin_filas:
+        print(f"  ✗ Imágenes sin filas ({len(sin_filas)}): {sin_filas[:10]}"
+              f"{' ...' if len(sin_filas) > 10 else ''}")
+    if incompletas:
+        print(f"  ✗ Imágenes incompletas ({len(incompletas)}): {incompletas[:10]}"
+              f"{' ...' if len(incompletas) > 10 else ''}")
+
+    ruta_csv = finalizar_almacen(configuracion['modo_salida'], output_dir, df)
+    print(f"✓ Tabla maestra combinada: {ruta_csv} ({len(df)} experimentos)")
+
+    # Puntuaciones proxy de cada shard
+    rutas_proxy = sorted(Path(output_dir).glob("resultados_proxy.*.csv"))
+    if rutas_proxy:
+        df_proxy = pd.concat([pd.read_csv(r) for r in rutas_proxy], ignore_index=True)
+        df_proxy = df_proxy.drop_duplicates(['Imagen_Original', 'ClipLimit', 'TileSize'])
+        df_proxy['ID_Experimento'] = df_proxy['ID_Experimento'].astype('Int64')
+        df_proxy.to_csv(os.path.join(output_dir, "resultados_proxy.csv"), index=False,
+                        encoding='utf-8')
+        print(f"✓ Puntuaciones proxy combinadas: {len(rutas_proxy)} archivo(s)")
+
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Combina los resultados de un barrido CLAHE repartido entre shards o nodos")
+    parser.add_argument('output_dir', help="Directorio de resultados compartido")
+    parser.add_argument('--cola', help="Mostrar además el estado de esta cola de trabajo SQLite")
+    args = parser.parse_args()
+
+    if args.cola:
+        print(f"Estado de la cola: {estado_cola(args.cola)}")
+    combinar_resultados(args.output_dir)
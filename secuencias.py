@@ -0,0 +1,335 @@
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from motor_clahe import ClaheTemporal
+
+# Secuencias de fotogramas: vídeos (decodificados con OpenCV) y TIFF multipágina
+EXTENSIONES_VIDEO = ('.mp4', '.avi', '.mov', '.mkv')
+EXTENSIONES_TIFF = ('.tif', '.tiff')
+
+# Carpeta de output_dir donde el barrido guarda los fotogramas clave
+DIR_FOTOGRAMAS_CLAVE = "fotogramas_clave"
+
+# Fotogramas decodificados o procesados en espera entre hilos; acota la
+# memoria con independencia de la longitud de la secuencia
+CAPACIDAD_COLA = 8
+
+# Fotogramas por segundo de la salida cuando la entrada no los indica (TIFF)
+FPS_POR_DEFECTO = 25.0
+
+def _tifffile():
+    try:
+        import tifffile
+    except ImportError:
+        raise ImportError("Las secuencias TIFF multipágina requieren tifffile "
+                          "(pip install tifffile)")
+    return tifffile
+
+def es_secuencia(ruta):
+    """
+    Indica si un archivo es una secuencia de fotogramas: un vídeo o un TIFF
+    con más de una página (un TIFF de una página es una imagen normal).
+    """
+    sufijo = Path(ruta).suffix.lower()
+    if sufijo in EXTENSIONES_VIDEO:
+        return True
+    if sufijo in EXTENSIONES_TIFF:
+        try:
+            tifffile = _tifffile()
+        except ImportError:
+            return False
+        with tifffile.TiffFile(ruta) as tif:
+            return len(tif.pages) > 1
+    return False
+
+def _a_escala_de_grises(fotograma, alta_profundidad, color='BGR'):
+    """Fotograma 2-D uint8 (o uint16 con alta_profundidad) como los de _cargar_imagen."""
+    if fotograma.ndim == 3:
+        conversion = cv2.COLOR_BGR2GRAY if color == 'BGR' else cv2.COLOR_RGB2GRAY
+        fotograma = cv2.cvtColor(fotograma[..., :3], conversion)
+    if fotograma.dtype == np.uint16 and not alta_profundidad:
+        # Misma reducción que cv2.IMREAD_GRAYSCALE
+        fotograma = (fotograma >> 8).astype(np.uint8)
+    if fotograma.dtype not in (np.uint8, np.uint16):
+        raise ValueError(f"Tipo de fotograma no admitido: {fotograma.dtype}")
+    return fotograma
+
+def leer_fotogramas(ruta, paso=1, alta_profundidad=False):
+    """
+    Decodifica una secuencia en streaming: genera (índice, fotograma) de los
+    fotogramas 0, paso, 2·paso... sin cargar la secuencia completa.
+
+    En vídeo los fotogramas saltados solo se avanzan (grab), sin convertirlos.
+
+    Raises:
+        ValueError: Si el vídeo no puede abrirse
+    """
+    ruta = Path(ruta)
+    if ruta.suffix.lower() in EXTENSIONES_TIFF:
+        with _tifffile().TiffFile(ruta) as tif:
+            for indice in range(0, len(tif.pages), paso):
+                yield indice, _a_escala_de_grises(tif.pages[indice].asarray(),
+                                                  alta_profundidad, 'RGB')
+        return
+
+    captura = cv2.VideoCapture(str(ruta))
+    if not captura.isOpened():
+        raise ValueError(f"No se pudo abrir el vídeo {ruta.name}")
+    try:
+        indice = 0
+        while captura.grab():
+            if indice % paso == 0:
+                correcto, fotograma = captura.retrieve()
+                if not correcto:
+                    break
+                yield indice, _a_escala_de_grises(fotograma, alta_profundidad)
+            indice += 1
+    finally:
+        captura.release()
+
+def fps_secuencia(ruta):
+    """Fotogramas por segundo declarados por el vídeo (FPS_POR_DEFECTO si no los indica)."""
+    if Path(ruta).suffix.lower() in EXTENSIONES_VIDEO:
+        captura = cv2.VideoCapture(str(ruta))
+        fps = captura.get(cv2.CAP_PROP_FPS)
+        captura.release()
+        if fps and fps > 0:
+            return float(fps)
+    return FPS_POR_DEFECTO
+
+def _en_segundo_plano(elementos, capacidad):
+    """
+    Consume un iterable en un hilo con una cola acotada y genera sus
+    elementos (las excepciones del hilo se relanzan aquí).
+
+    Si el consumidor se detiene antes de agotarlo (break, excepción o cierre
+    del generador), el hilo deja de producir, la cola se vacía y se espera a
+    que el hilo termine, de modo que no queda bloqueado en cola.put.
+    """
+    cola = queue.Queue(maxsize=capacidad)
+    detener = threading.Event()
+    fin = object()
+
+    def poner(elemento):
+        # Reintentar con espera acotada para atender la señal de detención
+        while not detener.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producir():
+        try:
+            for elemento in elementos:
+                if not poner(elemento):
+                    return
+        except BaseException as e:
+            poner(e)
+            return
+        finally:
+            # Liberar el lector (p. ej. el VideoCapture) en el hilo que lo usa
+            cerrar = getattr(elementos, 'close', None)
+            if cerrar is not None:
+                cerrar()
+        poner(fin)
+
+    hilo = threading.Thread(target=producir, daemon=True)
+    hilo.start()
+    try:
+        while True:
+            elemento = cola.get()
+            if elemento is fin:
+                return
+            if isinstance(elemento, BaseException):
+                raise elemento
+            yield elemento
+    finally:
+        detener.set()
+        while True:
+            try:
+                cola.get_nowait()
+            except queue.Empty:
+                break
+        hilo.join()
+
+def _escribir_atomico(ruta, fotograma):
+    """
+    Escribe un fotograma (.npy o imagen) vía un temporal y os.replace. El
+    temporal lleva el pid: nodos que extraen el mismo fotograma en un
+    directorio compartido no se pisan.
+    """
+    temporal = ruta.with_name(f".{ruta.stem}.{os.getpid()}.tmp{ruta.suffix}")
+    if ruta.suffix == '.npy':
+        with open(temporal, 'wb') as f:
+            np.save(f, fotograma)
+    elif not cv2.imwrite(str(temporal), fotograma):
+        raise OSError(f"No se pudo escribir {ruta.name}")
+    os.replace(temporal, ruta)
+
+def extraer_fotogramas_clave(rutas, destino, paso, alta_profundidad=False, extension='.png',
+                             verbose=True):
+    """
+    Extrae uno de cada `paso` fotogramas de cada secuencia como imagen
+    <nombre>_f<índice>.<ext> en destino, para barrer parámetros sobre ellos.
+
+    Los fotogramas ya extraídos no se reescriben, de modo que un barrido
+    reanudado o repartido entre nodos reutiliza los mismos archivos.
+
+    Args:
+        extension: '.png' o '.npy' (para el procesamiento por franjas)
+
+    Returns:
+        Lista ordenada de rutas de los fotogramas clave
+    """
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    extraidos = []
+    for ruta in rutas:
+        ruta = Path(ruta)
+        inicio = time.perf_counter()
+        n = 0
+        try:
+            for indice, fotograma in _en_segundo_plano(
+                    leer_fotogramas(ruta, paso, alta_profundidad), CAPACIDAD_COLA):
+                ruta_clave = destino / f"{ruta.stem}_f{indice:06d}{extension}"
+                if not ruta_clave.exists():
+                    _escribir_atomico(ruta_clave, fotograma)
+                extraidos.append(ruta_clave)
+                n += 1
+        except (OSError, ValueError) as e:
+            print(f"  ✗ {ruta.name}: {e}")
+            continue
+        if verbose:
+            segundos = time.perf_counter() - inicio
+            print(f"  ✓ {ruta.name}: {n} fotograma(s) clave (1 de cada {paso}) "
+                  f"en {segundos:.2f} s")
+    return sorted(extraidos)
+
+class _EscritorSecuencia:
+    """
+    Destino de los fotogramas procesados según la ruta de salida: TIFF
+    multipágina (.tif/.tiff), vídeo (EXTENSIONES_VIDEO, solo uint8) o un
+    directorio de PNG <nombre>_f<índice>.png.
+    """
+
+    def __init__(self, salida, nombre, fps, fourcc):
+        self.salida = Path(salida)
+        self.nombre = nombre
+        self.fps = fps
+        self.fourcc = fourcc
+        self._tiff = None
+        self._video = None
+        sufijo = self.salida.suffix.lower()
+        if sufijo in EXTENSIONES_TIFF + EXTENSIONES_VIDEO:
+            self.salida.parent.mkdir(parents=True, exist_ok=True)
+        if sufijo in EXTENSIONES_TIFF:
+            self._tiff = _tifffile().TiffWriter(self.salida, bigtiff=True)
+        elif sufijo not in EXTENSIONES_VIDEO:
+            self.salida.mkdir(parents=True, exist_ok=True)
+
+    def escribir(self, indice, fotograma):
+        if self._tiff is not None:
+            self._tiff.write(fotograma, contiguous=True)
+        elif self.salida.suffix.lower() in EXTENSIONES_VIDEO:
+            if fotograma.dtype != np.uint8:
+                raise ValueError("La salida de vídeo requiere fotogramas de 8 bits "
+                                 "(usar .tif o un directorio)")
+            if self._video is None:
+                alto, ancho = fotograma.shape
+                self._video = cv2.VideoWriter(str(self.salida),
+                                              cv2.VideoWriter_fourcc(*self.fourcc),
+                                              self.fps, (ancho, alto), isColor=False)
+                if not self._video.isOpened():
+                    raise OSError(f"No se pudo crear el vídeo {self.salida} "
+                                  f"(códec {self.fourcc})")
+            self._video.write(fotograma)
+        elif not cv2.imwrite(str(self.salida / f"{self.nombre}_f{indice:06d}.png"), fotograma):
+            raise OSError(f"No se pudo escribir el fotograma {indice}")
+
+    def cerrar(self):
+        if self._tiff is not None:
+            self._tiff.close()
+        if self._video is not None:
+            self._video.release()
+
+def aplicar_secuencia(entrada, salida, alpha, omega, suavizado=0.0, actualizar_cada=1,
+                      fourcc='mp4v', alta_profundidad=False, capacidad=CAPACIDAD_COLA,
+                      verbose=True):
+    """
+    Aplica CLAHE con (α, ω) fijos a una secuencia completa en streaming.
+
+    La decodificación, CLAHE y la escritura se solapan en tres hilos unidos
+    por colas de `capacidad` fotogramas, de modo que la memoria no depende de
+    la longitud de la secuencia. Con suavizado > 0 o actualizar_cada > 1 se
+    usa ClaheTemporal (histogramas suavizados en el tiempo, sin parpadeo, y
+    LUT recalculadas solo cada actualizar_cada fotogramas).
+
+    Args:
+        entrada: Vídeo o TIFF multipágina
+        salida: .tif/.tiff, vídeo (.mp4, .avi...) o directorio de PNG
+        fourcc: Códec de la salida de vídeo
+
+    Returns:
+        Diccionario con fotogramas, segundos, fotogramas_por_s (de extremo a
+        extremo) y fotogramas_por_s_clahe (solo el procesamiento)
+    """
+    entrada = Path(entrada)
+    clahe = ClaheTemporal(alpha, omega, suavizado, actualizar_cada)
+    escritor = _EscritorSecuencia(salida, entrada.stem, fps_secuencia(entrada), fourcc)
+    cola = queue.Queue(maxsize=capacidad)
+    fin = object()
+    errores = []
+
+    def escribir():
+        while True:
+            elemento = cola.get()
+            if elemento is fin:
+                return
+            if errores:
+                continue
+            try:
+                escritor.escribir(*elemento)
+            except BaseException as e:
+                errores.append(e)
+
+    hilo = threading.Thread(target=escribir, daemon=True)
+    hilo.start()
+    fotogramas = 0
+    segundos_clahe = 0.0
+    inicio = time.perf_counter()
+    try:
+        for indice, fotograma in _en_segundo_plano(
+                leer_fotogramas(entrada, 1, alta_profundidad), capacidad):
+            if errores:
+                break
+            t0 = time.perf_counter()
+            resultado = clahe.aplicar(fotograma)
+            segundos_clahe += time.perf_counter() - t0
+            cola.put((indice, resultado))
+            fotogramas += 1
+            if verbose and fotogramas % 500 == 0:
+                print(f"  {fotogramas} fotogramas "
+                      f"({fotogramas / (time.perf_counter() - inicio):.1f} fotogramas/s)")
+    finally:
+        cola.put(fin)
+        hilo.join()
+        escritor.cerrar()
+    if errores:
+        raise errores[0]
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'fotogramas': fotogramas,
+        'segundos': segundos,
+        'fotogramas_por_s': fotogramas / segundos if segundos > 0 else float('nan'),
+        'fotogramas_por_s_clahe': (fotogramas / segundos_clahe if segundos_clahe > 0
+                                   else float('nan'))
+    }
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+# Métricas de calidad (todas se maximizan) sobre las que se calcula el frente
+METRICAS_PARETO = ('Entropia', 'Contraste_Local_Promedio', 'Nitidez_Borde',
+                   'Contraste_Michelson')
+
+# Elementos (imágenes × filas²) de la matriz de dominancia por lote
+ELEMENTOS_POR_LOTE = 1 << 24
+
+def _rangos_lote(valores, validas):
+    """
+    Rangos de Pareto de un lote de imágenes (G, n, m) rellenado hasta n filas.
+
+    Construye la matriz de dominancia (G, n, n) y pela frentes sucesivos: el
+    rango 0 son las filas no dominadas, el 1 las no dominadas al quitar el
+    frente 0, etc. Cada iteración opera sobre todo el lote a la vez.
+    """
+    ge = np.ones(valores.shape[:2] + (valores.shape[1],), dtype=bool)
+    gt = np.zeros_like(ge)
+    for k in range(valores.shape[2]):
+        a = valores[:, :, None, k]
+        b = valores[:, None, :, k]
+        ge &= a >= b
+        gt |= a > b
+    # domina[g, i, j]: la fila i domina a la j (>= en todo y > en alguna métrica)
+    domina = ge & gt
+    del ge, gt
+
+    rangos = np.full(validas.shape, -1, dtype=np.int32)
+    restantes = validas.copy()
+    rango = 0
+    while restantes.any():
+        dominadas = (domina & restantes[:, :, None]).any(axis=1)
+        frente = restantes & ~dominadas
+        rangos[frente] = rango
+        restantes &= ~frente
+        rango += 1
+    return rangos
+
+def _dominadas(candidatas, elementos_por_lote):
+    """
+    Indica qué filas de candidatas están dominadas por alguna otra de ellas,
+    comparando por bloques de filas para no superar elementos_por_lote.
+    """
+    n = len(candidatas)
+    bloque = max(1, elementos_por_lote // max(n, 1))
+    dominadas = np.zeros(n, dtype=bool)
+    for inicio in range(0, n, bloque):
+        a = candidatas[inicio:inicio + bloque, None, :]
+        b = candidatas[None, :, :]
+        # domina[i, j]: la fila inicio+i domina a la j
+        domina = (a >= b).all(axis=2) & (a > b).any(axis=2)
+        dominadas |= domina.any(axis=0)
+    return dominadas
+
+def _rangos_por_bloques(valores, elementos_por_lote):
+    """
+    Rangos de Pareto de una sola imagen cuya matriz de dominancia (n, n) no
+    cabe en elementos_por_lote: cada frente se pela recalculando la
+    dominancia entre las filas restantes por bloques. La memoria queda
+    acotada a cambio de recorrer las filas restantes una vez por frente.
+    """
+    rangos = np.full(len(valores), -1, dtype=np.int32)
+    restantes = np.arange(len(valores))
+    rango = 0
+    while restantes.size:
+        dominadas = _dominadas(valores[restantes], elementos_por_lote)
+        rangos[restantes[~dominadas]] = rango
+        restantes = restantes[dominadas]
+        rango += 1
+    return rangos
+
+def rangos_pareto(df, metricas=METRICAS_PARETO, grupo='Imagen_Original',
+                  elementos_por_lote=ELEMENTOS_POR_LOTE):
+    """
+    Rango de dominancia de Pareto de cada fila dentro de su imagen (0 = frente).
+
+    Las imágenes se agrupan por número de filas y se procesan por lotes
+    vectorizados, de modo que el coste es O(filas por imagen²) por imagen
+    sin bucles de Python por fila. Un valor ausente cuenta como el peor.
+    Una imagen con más de √elementos_por_lote filas no cabe en un lote y se
+    procesa sola por bloques (ver _rangos_por_bloques).
+
+    Returns:
+        Serie de enteros alineada con df.index
+    """
+    if df.empty:
+        return pd.Series(np.zeros(0, dtype=np.int32), index=df.index, name='Rango_Pareto')
+    # to_numpy puede devolver una vista de solo lectura (copy-on-write)
+    valores = df[list(metricas)].to_numpy(dtype=np.float64)
+    valores = np.where(np.isnan(valores), -np.inf, valores)
+
+    codigos, _ = pd.factorize(df[grupo], use_na_sentinel=False)
+    orden = np.argsort(codigos, kind='stable')
+    tamanos = np.bincount(codigos)
+    inicios = np.concatenate(([0], np.cumsum(tamanos)[:-1]))
+    # Posición de cada fila dentro de su imagen
+    posiciones = np.empty(len(df), dtype=np.int64)
+    posiciones[orden] = np.arange(len(orden)) - np.repeat(inicios, tamanos)
+
+    rangos = np.empty(len(df), dtype=np.int32)
+    grupos_por_tamano = np.argsort(tamanos, kind='stable')
+    i = 0
+    while i < len(grupos_por_tamano):
+        # Lote de imágenes de tamaño similar que cabe en el presupuesto
+        j = i + 1
+        while (j < len(grupos_por_tamano)
+               and (j + 1 - i) * int(tamanos[grupos_por_tamano[j]]) ** 2 <= elementos_por_lote):
+            j += 1
+        lote = grupos_por_tamano[i:j]
+        n = int(tamanos[lote].max())
+        if n * n > elementos_por_lote:
+            # Una sola imagen demasiado grande para la matriz completa
+            filas = orden[inicios[lote[0]]:inicios[lote[0]] + n]
+            rangos[filas] = _rangos_por_bloques(valores[filas], elementos_por_lote)
+            i = j
+            continue
+
+        indice_lote = np.full(len(tamanos), -1)
+        indice_lote[lote] = np.arange(len(lote))
+        filas = np.flatnonzero(indice_lote[codigos] >= 0)
+        g = indice_lote[codigos[filas]]
+        p = posiciones[filas]
+
+        relleno = np.full((len(lote), n, valores.shape[1]), -np.inf)
+        validas = np.zeros((len(lote), n), dtype=bool)
+        relleno[g, p] = valores[filas]
+        validas[g, p] = True
+        rangos[filas] = _rangos_lote(relleno, validas)[g, p]
+        i = j
+
+    return pd.Series(rangos, index=df.index, name='Rango_Pareto')
+
+def optimos_por_imagen(frente, pesos=None, metricas=METRICAS_PARETO, grupo='Imagen_Original'):
+    """
+    Elige una fila del frente de Pareto de cada imagen.
+
+    Las métricas se normalizan a [0, 1] dentro del frente de cada imagen y
+    se elige la fila con mayor suma ponderada (pesos iguales por defecto; una
+    métrica ausente de pesos no cuenta en la elección, pero sí en el frente).
+
+    Args:
+        frente: Filas de rango 0 (ver rangos_pareto)
+        pesos: Diccionario {métrica: peso}
+
+    Returns:
+        DataFrame con una fila por imagen, su puntuación y Tamano_Frente
+
+    Raises:
+        ValueError: Si pesos incluye una métrica que no está en metricas
+    """
+    desconocidas = sorted(set(pesos or {}) - set(metricas))
+    if desconocidas:
+        raise ValueError(f"Pesos de Pareto para métricas desconocidas: {desconocidas} "
+                         f"(disponibles: {list(metricas)})")
+    pesos = pesos or {m: 1.0 for m in metricas}
+    if frente.empty:
+        return frente.assign(Puntuacion_Pareto=[], Tamano_Frente=[])
+    por_imagen = frente.groupby(grupo, observed=True, sort=False)
+    puntuacion = pd.Series(0.0, index=frente.index)
+    for metrica in metricas:
+        peso = float(pesos.get(metrica, 0.0))
+        if peso == 0:
+            continue
+        minimo = por_imagen[metrica].transform('min')
+        rango = (por_imagen[metrica].transform('max') - minimo).replace(0, np.nan)
+        puntuacion += peso * ((frente[metrica] - minimo) / rango).fillna(0.0)
+
+    elegidas = puntuacion.groupby(frente[grupo], observed=True, sort=True).idxmax()
+    optimos = frente.loc[elegidas.to_numpy()].copy()
+    optimos['Puntuacion_Pareto'] = puntuacion.loc[elegidas.to_numpy()].to_numpy()
+    optimos['Tamano_Frente'] = por_imagen.size().reindex(optimos[grupo]).to_numpy()
+    return optimos.reset_index(drop=True)
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio, sin paquete
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Rejilla pequeña para los barridos de las pruebas
+CLIP_LIMITS = [1.0, 2.0, 3.0]
+TILE_SIZES = [4, 8]
+
+def imagen_sintetica(alto, ancho, semilla=0, dtype=np.uint8):
+    """Imagen en escala de grises con textura suave y dimensiones arbitrarias."""
+    maximo = np.iinfo(dtype).max
+    ruido = np.random.default_rng(semilla).random((alto, ancho)).astype(np.float32)
+    imagen = cv2.GaussianBlur(ruido, (0, 0), 3)
+    imagen = (imagen - imagen.min()) / (imagen.max() - imagen.min())
+    return (imagen * maximo).astype(dtype)
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Directorio con tres imágenes PNG de tamaños no divisibles por ω."""
+    data = tmp_path / "data"
+    data.mkdir()
+    for semilla, (alto, ancho) in enumerate([(97, 130), (120, 88), (64, 64)]):
+        cv2.imwrite(str(data / f"imagen_{semilla}.png"), imagen_sintetica(alto, ancho, semilla))
+    return data
+
+def barrer(data, salida, **kwargs):
+    """Barrido de la rejilla de pruebas (solo métricas salvo que se indique otro modo)."""
+    from generar_datos_clahe import procesar_imagenes_clahe
+    kwargs.setdefault('modo_salida', 'solo_metricas')
+    return procesar_imagenes_clahe(str(data), str(salida), CLIP_LIMITS, TILE_SIZES, **kwargs)
+
+def tabla_maestra(salida):
+    """Tabla maestra sin las columnas de tiempo, que varían entre ejecuciones."""
+    df = pd.read_csv(Path(salida) / "resultados_maestros.csv")
+    return df[[c for c in df.columns if not c.startswith('Tiempo')]]
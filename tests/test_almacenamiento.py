@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+
+import almacenamiento
+from almacenamiento import (NOMBRE_PARQUET, EscritorAsincrono, cargar_imagen_experimento,
+                            leer_modo_almacen)
+from conftest import CLIP_LIMITS, TILE_SIZES, barrer, tabla_maestra
+
+def _esperada(corpus, alpha, omega):
+    """Salida CLAHE del experimento (imagen_0, α, ω) calculada directamente."""
+    imagen = cv2.imread(str(corpus / "imagen_0.png"), cv2.IMREAD_GRAYSCALE)
+    return cv2.createCLAHE(clipLimit=alpha, tileGridSize=(omega, omega)).apply(imagen)
+
+@pytest.mark.parametrize('modo, formato', [('carpetas', 'png'), ('carpetas', 'tiff'),
+                                           ('carpetas', 'raw'), ('columnar', 'png')])
+def test_modos_de_salida_recuperan_las_imagenes(corpus, tmp_path, modo, formato):
+    barrer(corpus, tmp_path / "metricas")
+    salida = tmp_path / modo
+    barrer(corpus, salida, modo_salida=modo, formato_imagen=formato)
+
+    assert leer_modo_almacen(str(salida)) == modo
+    pd.testing.assert_frame_equal(tabla_maestra(salida), tabla_maestra(tmp_path / "metricas"))
+    # ID 2 = imagen_0 con el primer α y el segundo ω (α externo, ω interno)
+    np.testing.assert_array_equal(cargar_imagen_experimento(str(salida), 2),
+                                  _esperada(corpus, CLIP_LIMITS[0], TILE_SIZES[1]))
+    if modo == 'columnar':
+        pytest.importorskip("pyarrow")
+        df = pd.read_parquet(salida / NOMBRE_PARQUET)
+        pd.testing.assert_frame_equal(df.drop(columns=[c for c in df if c.startswith('Tiempo')]),
+                                      tabla_maestra(salida))
+
+def test_solo_metricas_no_guarda_imagenes(corpus, tmp_path):
+    barrer(corpus, tmp_path)
+    assert leer_modo_almacen(str(tmp_path)) == 'solo_metricas'
+    assert cargar_imagen_experimento(str(tmp_path), 1) is None
+    assert not list(tmp_path.glob("iteracion_*"))
+
+def test_escritor_asincrono_sincroniza_y_relanza_errores(tmp_path, monkeypatch):
+    sincronizados = []
+    fsync = almacenamiento.os.fsync
+    monkeypatch.setattr(almacenamiento.os, 'fsync',
+                        lambda fd: (sincronizados.append(fd), fsync(fd)))
+
+    def escribir(ruta, texto):
+        ruta.write_text(texto, encoding='utf-8')
+        return [str(ruta)]
+
+    escritor = EscritorAsincrono(hilos=2, capacidad=1)
+    for i in range(5):
+        escritor.enviar(escribir, tmp_path / f"archivo_{i}.txt", str(i))
+    escritor.esperar()
+    assert [(tmp_path / f"archivo_{i}.txt").read_text(encoding='utf-8')
+            for i in range(5)] == [str(i) for i in range(5)]
+    # Cada archivo y, una vez, su directorio
+    assert len(sincronizados) >= 6
+
+    escritor.enviar(escribir, tmp_path / "no_existe" / "archivo.txt", "x")
+    with pytest.raises(OSError):
+        escritor.cerrar()
+
+def test_escritura_en_segundo_plano_produce_los_mismos_archivos(corpus, tmp_path):
+    barrer(corpus, tmp_path / "sincrona", modo_salida='carpetas')
+    barrer(corpus, tmp_path / "asincrona", modo_salida='carpetas', hilos_escritura=2)
+    sincrona = sorted(p.relative_to(tmp_path / "sincrona")
+                      for p in (tmp_path / "sincrona").rglob("iteracion_*/*"))
+    assert len(sincrona) == 2 * 3 * len(CLIP_LIMITS) * len(TILE_SIZES)
+    for ruta in sincrona:
+        assert ((tmp_path / "asincrona" / ruta).read_bytes()
+                == (tmp_path / "sincrona" / ruta).read_bytes())
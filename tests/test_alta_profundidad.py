@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+
+from almacenamiento import cargar_imagen_experimento
+from conftest import CLIP_LIMITS, TILE_SIZES, barrer, imagen_sintetica, tabla_maestra
+
+@pytest.fixture
+def corpus16(tmp_path):
+    data = tmp_path / "data16"
+    data.mkdir()
+    for i, (alto, ancho) in enumerate([(97, 130), (64, 80)]):
+        cv2.imwrite(str(data / f"imagen_{i}.png"),
+                    imagen_sintetica(alto, ancho, semilla=i, dtype=np.uint16))
+    return data
+
+def _entropia(imagen, bins):
+    histograma = np.bincount(imagen.ravel() >> (16 - int(np.log2(bins))), minlength=bins)
+    p = histograma[histograma > 0] / histograma.sum()
+    return -np.sum(p * np.log2(p))
+
+def test_barrido_conserva_los_16_bits(corpus16, tmp_path):
+    salida = tmp_path / "salida"
+    barrer(corpus16, salida, alta_profundidad=True, bins_histograma=256,
+           modo_salida='carpetas')
+    tabla = tabla_maestra(salida)
+    original = cv2.imread(str(corpus16 / "imagen_0.png"), cv2.IMREAD_ANYDEPTH)
+    assert original.dtype == np.uint16
+
+    # ID 1 = imagen_0 con el primer α y el primer ω; se guarda en PNG de 16 bits
+    alpha, omega = CLIP_LIMITS[0], TILE_SIZES[0]
+    esperada = cv2.createCLAHE(clipLimit=alpha, tileGridSize=(omega, omega)).apply(original)
+    guardada = cargar_imagen_experimento(str(salida), 1)
+    assert guardada.dtype == np.uint16
+    np.testing.assert_array_equal(guardada, esperada)
+    assert tabla.loc[0, 'Entropia'] == pytest.approx(_entropia(esperada, 256))
+
+def test_motor_numpy_coincide_en_16_bits(corpus16, tmp_path):
+    barrer(corpus16, tmp_path / "opencv", alta_profundidad=True)
+    barrer(corpus16, tmp_path / "numpy", alta_profundidad=True, motor='numpy')
+    pd.testing.assert_frame_equal(tabla_maestra(tmp_path / "opencv"),
+                                  tabla_maestra(tmp_path / "numpy"))
+
+def test_sin_alta_profundidad_se_reduce_a_8_bits(corpus16, tmp_path):
+    barrer(corpus16, tmp_path / "8bits", modo_salida='carpetas')
+    assert cargar_imagen_experimento(str(tmp_path / "8bits"), 1).dtype == np.uint8
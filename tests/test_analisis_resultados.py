@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import cv2
+import pandas as pd
+import pytest
+
+import analisis_resultados
+from conftest import barrer, imagen_sintetica
+
+def _originales_del_mosaico(monkeypatch, tmp_path, df):
+    """Título e imagen original de cada fila del mosaico del reporte."""
+    data = tmp_path / "data"
+    data.mkdir(exist_ok=True)
+    cv2.imwrite(str(data / "a.png"), imagen_sintetica(40, 50))
+    mosaicos = []
+    monkeypatch.setattr(analisis_resultados, '_guardar_mosaico',
+                        lambda filas, ruta: mosaicos.append(filas))
+    analisis_resultados.evaluar_subjetivamente(df, list(df['ID_Experimento']),
+                                               str(tmp_path), str(tmp_path),
+                                               data_dir=str(data))
+    return [(titulo, imagen) for titulo, imagen, _, _ in mosaicos[0]]
+
+@pytest.fixture
+def df_top():
+    return pd.DataFrame({'ID_Experimento': [1, 2], 'ClipLimit': [2.0, 3.0],
+                         'TileSize': [8, 8], 'Contraste_Local_Promedio': [9.5, 9.0],
+                         'Imagen_Original': ["a.png", "b.png"]})
+
+def test_original_ausente_no_usa_otra_imagen(monkeypatch, tmp_path, df_top):
+    (titulo_a, imagen_a), (titulo_b, imagen_b) = _originales_del_mosaico(
+        monkeypatch, tmp_path, df_top)
+    assert titulo_a.endswith("a.png") and imagen_a is not None
+    assert titulo_b == "Imagen Original" and imagen_b is None
+
+def test_sin_columna_de_original_usa_la_primera(monkeypatch, tmp_path, df_top):
+    originales = _originales_del_mosaico(monkeypatch, tmp_path,
+                                         df_top.drop(columns='Imagen_Original'))
+    assert all(titulo.endswith("a.png") and imagen is not None
+               for titulo, imagen in originales)
+
+@pytest.fixture
+def ruta_tabla(corpus, tmp_path):
+    return barrer(corpus, tmp_path / "salida")
+
+def test_agregados_en_cache_se_invalidan_al_cambiar_la_tabla(ruta_tabla, capsys):
+    calculados = analisis_resultados.obtener_agregados(ruta_tabla)
+    assert "Agregados guardados" in capsys.readouterr().out
+    en_cache = analisis_resultados.obtener_agregados(ruta_tabla)
+    assert "Agregados en caché" in capsys.readouterr().out
+    assert en_cache['total'] == calculados['total']
+    pd.testing.assert_frame_equal(en_cache['medias'], calculados['medias'])
+    pd.testing.assert_frame_equal(en_cache['frente_pareto'], calculados['frente_pareto'],
+                                  check_categorical=False)
+
+    # Una fila más: cambia la firma de la tabla y los agregados se recalculan
+    df = pd.read_csv(ruta_tabla)
+    pd.concat([df, df.tail(1).assign(ID_Experimento=len(df) + 1)]).to_csv(ruta_tabla,
+                                                                          index=False)
+    recalculados = analisis_resultados.obtener_agregados(ruta_tabla)
+    assert "Agregados guardados" in capsys.readouterr().out
+    assert recalculados['total'] == calculados['total'] + 1
+
+def test_carga_por_bloques_coincide_con_la_completa(ruta_tabla):
+    completa = analisis_resultados.cargar_datos_maestros(ruta_tabla)
+    por_bloques = analisis_resultados.cargar_datos_maestros(ruta_tabla, filas_por_bloque=5)
+    pd.testing.assert_frame_equal(completa, por_bloques)
+    assert isinstance(completa['Imagen_Original'].dtype, pd.CategoricalDtype)
+    assert completa['Entropia'].dtype == 'float32'
+
+def _graficos(ruta_tabla, salida, **kwargs):
+    """Dibuja los gráficos y devuelve {archivo: fecha de modificación}."""
+    df = analisis_resultados.cargar_datos_maestros(ruta_tabla)
+    directorio = analisis_resultados.visualizar_relaciones_parametros(df, str(salida),
+                                                                      **kwargs)
+    return {p.name: p.stat().st_mtime_ns for p in Path(directorio).glob("*.png")}
+
+def test_manifiesto_omite_los_graficos_sin_cambios(ruta_tabla, tmp_path, capsys):
+    salida = tmp_path / "analisis"
+    primeros = _graficos(ruta_tabla, salida, procesos=2, vista_previa=True)
+    assert "heatmap_entropia.png" in primeros and len(primeros) >= 4
+    capsys.readouterr()
+
+    assert _graficos(ruta_tabla, salida, procesos=1, vista_previa=True) == primeros
+    assert "0 gráfico(s) generados" in capsys.readouterr().out
+
+    # Un gráfico borrado se vuelve a dibujar; el resto se conserva
+    (salida / "graficos_analisis" / "heatmap_entropia.png").unlink()
+    segundos = _graficos(ruta_tabla, salida, procesos=1, vista_previa=True)
+    assert "1 gráfico(s) generados" in capsys.readouterr().out
+    assert {a: f for a, f in segundos.items() if a != "heatmap_entropia.png"} == {
+        a: f for a, f in primeros.items() if a != "heatmap_entropia.png"}
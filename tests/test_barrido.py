@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from conftest import CLIP_LIMITS, TILE_SIZES, barrer, tabla_maestra
+from diario_resultados import NOMBRE_DIARIO
+
+def test_paralelo_coincide_con_secuencial(corpus, tmp_path):
+    barrer(corpus, tmp_path / "secuencial", n_procesos=1)
+    barrer(corpus, tmp_path / "paralelo", n_procesos=2)
+    secuencial = tabla_maestra(tmp_path / "secuencial")
+    assert len(secuencial) == 3 * len(CLIP_LIMITS) * len(TILE_SIZES)
+    pd.testing.assert_frame_equal(secuencial, tabla_maestra(tmp_path / "paralelo"))
+
+def test_archivo_truncado_numera_igual_en_paralelo(corpus, tmp_path):
+    # Cabecera PNG válida, píxeles truncados: legible por firma, no decodificable
+    contenido = (corpus / "imagen_1.png").read_bytes()
+    (corpus / "imagen_0b.png").write_bytes(contenido[:len(contenido) // 3])
+    barrer(corpus, tmp_path / "secuencial", n_procesos=1)
+    barrer(corpus, tmp_path / "paralelo", n_procesos=2)
+    secuencial = tabla_maestra(tmp_path / "secuencial")
+    pd.testing.assert_frame_equal(secuencial, tabla_maestra(tmp_path / "paralelo"))
+    assert "imagen_0b.png" not in set(secuencial['Imagen_Original'])
+    evaluaciones = len(CLIP_LIMITS) * len(TILE_SIZES)
+    ids = secuencial.loc[secuencial['Imagen_Original'] == "imagen_1.png", 'ID_Experimento']
+    assert ids.min() == 2 * evaluaciones + 1
+
+@pytest.mark.parametrize("n_procesos", [1, 2])
+def test_reanudar_tras_interrupcion(corpus, tmp_path, n_procesos):
+    completo, interrumpido = tmp_path / "completo", tmp_path / "interrumpido"
+    barrer(corpus, completo)
+
+    # Simular una caída: configuración, una imagen y media y una línea truncada
+    interrumpido.mkdir()
+    lineas = (completo / NOMBRE_DIARIO).read_text(encoding='utf-8').splitlines(keepends=True)
+    (interrumpido / NOMBRE_DIARIO).write_text(''.join(lineas[:8]) + lineas[8][:20],
+                                              encoding='utf-8')
+
+    barrer(corpus, interrumpido, reanudar=True, n_procesos=n_procesos)
+    pd.testing.assert_frame_equal(tabla_maestra(completo), tabla_maestra(interrumpido))
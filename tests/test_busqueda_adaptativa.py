@@ -0,0 +1,41 @@
+import pytest
+
+from busqueda_adaptativa import BusquedaExhaustiva, crear_busqueda
+
+def _recorrer(busqueda, objetivo):
+    """Ejecuta la búsqueda hasta agotarla con una función objetivo sintética."""
+    historial = []
+    while True:
+        puntos = busqueda.proponer(historial)
+        if not puntos:
+            return historial
+        historial.extend({'ClipLimit': alpha, 'TileSize': omega,
+                          'Contraste_Local_Promedio': objetivo(alpha, omega)}
+                         for alpha, omega in puntos)
+
+def _pico(alpha, omega):
+    return -(alpha - 2.3) ** 2 - (omega - 11) ** 2 / 50
+
+@pytest.mark.parametrize('presupuesto', [1, 9, 20, 37])
+def test_consume_exactamente_el_presupuesto(presupuesto):
+    busqueda = crear_busqueda('grueso_fino', [1.0, 4.0], [4, 32], presupuesto)
+    historial = _recorrer(busqueda, _pico)
+    assert len(historial) == busqueda.total_evaluaciones() == presupuesto
+    puntos = [(f['ClipLimit'], f['TileSize']) for f in historial]
+    assert len(set(puntos)) == presupuesto
+    assert all(1.0 <= alpha <= 4.0 and 4 <= omega <= 32 for alpha, omega in puntos)
+
+def test_presupuesto_mayor_que_el_reticulo_no_sale_del_rango():
+    # 1.13 no es múltiplo de la resolución: el último α del retículo es 1.13
+    busqueda = crear_busqueda('grueso_fino', [1.0, 1.13], [4, 6], presupuesto=1000)
+    historial = _recorrer(busqueda, _pico)
+    alphas = sorted({f['ClipLimit'] for f in historial})
+    assert alphas == [1.0, 1.05, 1.1, 1.13]
+    assert len(historial) == busqueda.total_evaluaciones() == 4 * 3
+
+def test_exhaustiva_y_estrategia_desconocida():
+    assert _recorrer(BusquedaExhaustiva([1.0, 2.0], [4, 8]), _pico)[1]['TileSize'] == 8
+    with pytest.raises(ValueError):
+        crear_busqueda('grueso_fino', [1.0], [8])
+    with pytest.raises(ValueError):
+        crear_busqueda('aleatoria', [1.0], [8])
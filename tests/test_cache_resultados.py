@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache_resultados import CacheResultados
+from conftest import CLIP_LIMITS, TILE_SIZES, barrer, tabla_maestra
+
+def test_clave_distingue_experimentos():
+    clave = CacheResultados.clave("abc", 2.0, 8)
+    assert clave == CacheResultados.clave("abc", 2, 8.0)
+    assert len({clave, CacheResultados.clave("abd", 2.0, 8), CacheResultados.clave("abc", 2.5, 8),
+                CacheResultados.clave("abc", 2.0, 16),
+                CacheResultados.clave("abc", 2.0, 8, variante='16bit')}) == 5
+
+def test_guardar_y_obtener(tmp_path):
+    cache = CacheResultados(tmp_path, guardar_imagenes=True)
+    clave = CacheResultados.clave("abc", 2.0, 8)
+    assert cache.obtener(clave) is None and cache.ruta_imagen(clave) is None
+    imagen = np.arange(48, dtype=np.uint8).reshape(6, 8)
+    cache.guardar(clave, {'Entropia': np.float32(7.5)}, imagen)
+    assert cache.obtener(clave) == {'Entropia': 7.5}
+    assert cache.ruta_imagen(clave) is not None
+
+def test_desaloja_la_entrada_menos_usada(tmp_path):
+    cache = CacheResultados(tmp_path, tamano_maximo=10 ** 6)
+    claves = [CacheResultados.clave("abc", alpha, 8) for alpha in (1.0, 2.0, 3.0)]
+    for t, clave in enumerate(claves[:2]):
+        cache.guardar(clave, {'Entropia': 7.0})
+        # Usos separados en el tiempo: la primera clave es la más antigua
+        os.utime(cache._ruta(clave, '.json'), (1000 + t, 1000 + t))
+    cache.obtener(claves[0])
+
+    # Con la tercera entrada se supera el máximo: sale la usada menos recientemente
+    cache.tamano_maximo = 2.5 * cache._ruta(claves[0], '.json').stat().st_size
+    cache.guardar(claves[2], {'Entropia': 7.0})
+    assert cache.obtener(claves[0]) is not None
+    assert cache.obtener(claves[1]) is None
+    assert cache.obtener(claves[2]) is not None
+
+def test_barrido_repetido_acierta_en_cache(corpus, tmp_path, capsys):
+    cache_dir = tmp_path / "cache"
+    barrer(corpus, tmp_path / "primero", cache_dir=str(cache_dir))
+    capsys.readouterr()
+    barrer(corpus, tmp_path / "segundo", cache_dir=str(cache_dir))
+    evaluaciones = len(CLIP_LIMITS) * len(TILE_SIZES)
+    assert capsys.readouterr().out.count(
+        f"Caché: {evaluaciones}/{evaluaciones} experimentos ya calculados") == 3
+    pd.testing.assert_frame_equal(tabla_maestra(tmp_path / "primero"),
+                                  tabla_maestra(tmp_path / "segundo"))
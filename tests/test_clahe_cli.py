@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+import clahe
+
+def test_alias_despacha_al_barrido(corpus, tmp_path):
+    salida = tmp_path / "salida"
+    ruta = clahe.main(['sweep', '--entrada', str(corpus), '--salida', str(salida),
+                       '--clip-limits', '1.0,2.0', '--tile-sizes', '4', '8',
+                       '--modo-salida', 'solo_metricas', '--procesos', '1'])
+    assert ruta == os.path.join(str(salida), "resultados_maestros.csv")
+    assert os.path.exists(ruta)
+
+def test_subcomando_desconocido(capsys):
+    with pytest.raises(SystemExit):
+        clahe.main(['medir'])
+    assert "subcomando" in capsys.readouterr().err
+
+def test_argumentos_del_subcomando(capsys):
+    with pytest.raises(SystemExit):
+        clahe.main(['barrer', '--nodo', 'n1'])
+    assert "--nodo requiere --cola-trabajo" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        clahe.main(['barrer', '--help'])
+    assert "usage: clahe barrer" in capsys.readouterr().out
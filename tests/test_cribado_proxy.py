@@ -0,0 +1,33 @@
+import pandas as pd
+
+from conftest import CLIP_LIMITS, TILE_SIZES, barrer, tabla_maestra
+
+OBJETIVO = 'Contraste_Local_Promedio'
+
+def test_promueve_los_mejores_candidatos_proxy(corpus, tmp_path):
+    top_k = 2
+    barrer(corpus, tmp_path / "completo")
+    barrer(corpus, tmp_path / "proxy", proxy_escala=0.5, proxy_top_k=top_k, objetivo=OBJETIVO)
+    completo = tabla_maestra(tmp_path / "completo")
+    promovidos = tabla_maestra(tmp_path / "proxy")
+    proxy = pd.read_csv(tmp_path / "proxy" / "resultados_proxy.csv")
+
+    # Todos los candidatos se puntúan en proxy; solo top_k por imagen a resolución completa
+    assert len(proxy) == 3 * len(CLIP_LIMITS) * len(TILE_SIZES)
+    assert len(promovidos) == 3 * top_k
+    assert list(promovidos['ID_Experimento']) == list(range(1, 3 * top_k + 1))
+    for imagen, grupo in proxy.groupby('Imagen_Original'):
+        mejores = grupo.sort_values('Proxy_Rango').head(top_k)
+        assert list(mejores[f"Proxy_{OBJETIVO}"]) == sorted(grupo[f"Proxy_{OBJETIVO}"],
+                                                           reverse=True)[:top_k]
+        filas = promovidos[promovidos['Imagen_Original'] == imagen]
+        assert list(filas['Proxy_Rango']) == list(range(1, top_k + 1))
+        assert list(zip(filas['ClipLimit'], filas['TileSize'])) == list(
+            zip(mejores['ClipLimit'], mejores['TileSize']))
+        assert list(mejores['ID_Experimento']) == list(filas['ID_Experimento'])
+
+    # Las métricas finales de los promovidos son las de resolución completa
+    claves = ['Imagen_Original', 'ClipLimit', 'TileSize']
+    combinadas = promovidos.merge(completo, on=claves, suffixes=('', '_completo'))
+    pd.testing.assert_series_equal(combinadas[OBJETIVO], combinadas[f"{OBJETIVO}_completo"],
+                                   check_names=False)
@@ -0,0 +1,58 @@
+from array import array
+
+import pandas as pd
+import pytest
+
+from almacenamiento import NOMBRE_CSV, NOMBRE_PARQUET, finalizar_almacen
+from diario_resultados import NOMBRE_DIARIO, DiarioResultados, bloques_diario
+
+CONFIGURACION = {'barrido': 'prueba'}
+
+def _filas(imagen, id_inicial):
+    return [{'ID_Experimento': id_inicial + i + 1, 'Imagen_Original': imagen,
+             'ClipLimit': alpha, 'TileSize': 8, 'Entropia': 7.0 + i / 10}
+            for i, alpha in enumerate([1.0, 2.0, 3.0])]
+
+def _diario(tmp_path, **kwargs):
+    return DiarioResultados(str(tmp_path), CONFIGURACION, **kwargs)
+
+def test_reanudar_retiene_solo_posiciones(tmp_path):
+    diario = _diario(tmp_path)
+    diario.anadir(_filas("a.png", 0) + _filas("b.png", 3)[:2])
+    diario.cerrar()
+
+    diario = _diario(tmp_path, reanudar=True)
+    assert diario.ordenado
+    assert {imagen: type(v) for imagen, v in diario.completadas.items()} == {
+        "a.png": array, "b.png": array}
+    assert diario.registradas("a.png") == 3 and diario.registradas("b.png") == 2
+    previas = diario.previas("b.png")
+    assert sorted(previas) == [(1.0, 8), (2.0, 8)]
+    assert previas[(2.0, 8)]['ID_Experimento'] == 5
+    assert "b.png" not in diario.completadas
+    diario.cerrar()
+
+def test_ids_desordenados_se_detectan(tmp_path):
+    diario = _diario(tmp_path)
+    diario.anadir(_filas("b.png", 3) + _filas("a.png", 0))
+    diario.cerrar()
+    assert not diario.ordenado
+    assert not _diario(tmp_path, reanudar=True).ordenado
+
+    tabla = pd.concat(bloques_diario(diario.ruta, ordenado=False, filas_por_bloque=4))
+    assert list(tabla['ID_Experimento']) == list(range(1, 7))
+
+@pytest.mark.parametrize("modo", ['solo_metricas', 'columnar'])
+def test_tabla_por_bloques_coincide_con_la_completa(tmp_path, modo):
+    diario = _diario(tmp_path)
+    diario.anadir(_filas("a.png", 0) + _filas("b.png", 3) + _filas("c.png", 6))
+    diario.cerrar()
+    (tmp_path / "imagenes").mkdir()
+    completa = pd.concat(bloques_diario(str(tmp_path / NOMBRE_DIARIO)), ignore_index=True)
+    assert len(completa) == 9
+
+    finalizar_almacen(modo, str(tmp_path), bloques_diario(diario.ruta, filas_por_bloque=2))
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / NOMBRE_CSV), completa)
+    if modo == 'columnar':
+        pytest.importorskip("pyarrow")
+        pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / NOMBRE_PARQUET), completa)
@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+import pytest
+
+from conftest import imagen_sintetica
+from motor_clahe import HistogramasBaldosas, clahe_lote
+
+CLIP_LIMITS = [1.0, 2.5, 4.0]
+
+def _clahe_opencv(imagen, alpha, omega):
+    return cv2.createCLAHE(clipLimit=alpha, tileGridSize=(omega, omega)).apply(imagen)
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16])
+@pytest.mark.parametrize('omega', [4, 8, 13])
+def test_clahe_lote_coincide_con_opencv(dtype, omega):
+    imagen = imagen_sintetica(101, 133, semilla=omega, dtype=dtype)
+    salidas = clahe_lote(imagen, CLIP_LIMITS, omega)
+    assert salidas.dtype == dtype
+    for alpha, salida in zip(CLIP_LIMITS, salidas):
+        np.testing.assert_array_equal(salida, _clahe_opencv(imagen, alpha, omega))
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16])
+def test_franjas_coinciden_con_opencv(dtype):
+    imagen = imagen_sintetica(150, 97, semilla=1, dtype=dtype)
+    omega, filas_franja = 8, 23
+    histogramas = HistogramasBaldosas(imagen, omega, filas_franja=filas_franja)
+    luts = histogramas.luts_interpolacion(CLIP_LIMITS)
+    salidas = np.concatenate([histogramas.aplicar_filas(luts, y0, min(y0 + filas_franja, 150))
+                              for y0 in range(0, 150, filas_franja)], axis=1)
+    for alpha, salida in zip(CLIP_LIMITS, salidas):
+        np.testing.assert_array_equal(salida, _clahe_opencv(imagen, alpha, omega))
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16])
+@pytest.mark.parametrize('forma, omega', [((1, 1), 3), ((1, 1), 8), ((1, 1), 16),
+                                          ((3, 5), 16), ((2, 7), 5)])
+def test_imagenes_menores_que_el_relleno(dtype, forma, omega):
+    # El relleno por reflexión supera a la imagen y debe repetirse como en OpenCV
+    maximo = np.iinfo(dtype).max
+    imagen = np.random.default_rng(omega).integers(0, maximo, forma, dtype=dtype, endpoint=True)
+    for alpha, salida in zip(CLIP_LIMITS, clahe_lote(imagen, CLIP_LIMITS, omega)):
+        np.testing.assert_array_equal(salida, _clahe_opencv(imagen, alpha, omega))
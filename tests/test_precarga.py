@@ -0,0 +1,62 @@
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import barrer, tabla_maestra
+from precarga import CargadorAnticipado
+
+RUTAS = [Path(f"imagen_{i}.png") for i in range(8)]
+
+class _Registro:
+    """Carga sintética que anota la distancia entre la imagen cargada y la consumida."""
+
+    def __init__(self, desde=0):
+        # Solo se anota el adelanto a partir de la imagen consumida `desde`
+        self.desde = desde
+        self.consumida = 0
+        self.adelanto_maximo = 0
+        self._candado = threading.Lock()
+
+    def cargar(self, ruta):
+        indice = RUTAS.index(ruta)
+        if indice == 3:
+            raise OSError("archivo ilegible")
+        with self._candado:
+            if self.consumida >= self.desde:
+                self.adelanto_maximo = max(self.adelanto_maximo, indice - self.consumida)
+        return np.full((100, 100), indice, np.uint8)
+
+def _recorrer(cargador, registro):
+    valores = []
+    for indice, (ruta, obtener) in enumerate(cargador):
+        registro.consumida = indice
+        imagen = obtener()
+        valores.append((ruta, None if imagen is None else int(imagen[0, 0])))
+    return valores
+
+@pytest.mark.parametrize('profundidad', [0, 1, 3])
+def test_orden_y_adelanto_acotado(profundidad):
+    registro = _Registro()
+    # Un generador: las rutas se consumen de forma perezosa
+    cargador = CargadorAnticipado((r for r in RUTAS), registro.cargar, profundidad)
+    valores = _recorrer(cargador, registro)
+    assert valores == [(ruta, None if i == 3 else i) for i, ruta in enumerate(RUTAS)]
+    assert registro.adelanto_maximo <= profundidad
+
+def test_limite_de_memoria_anticipa_una_sola_imagen():
+    # 10 000 bytes por imagen y un límite de ~15 000: una vez conocido el
+    # tamaño (tras la primera imagen) solo cabe una por delante
+    registro = _Registro(desde=1)
+    cargador = CargadorAnticipado(RUTAS, registro.cargar, profundidad=4,
+                                  memoria_maxima_mb=15_000 / 1024 ** 2)
+    assert len(_recorrer(cargador, registro)) == len(RUTAS)
+    assert registro.adelanto_maximo <= 1
+
+def test_barrido_con_precarga_coincide(corpus, tmp_path):
+    barrer(corpus, tmp_path / "sincrona")
+    barrer(corpus, tmp_path / "precarga", precarga=2, memoria_precarga_mb=1)
+    pd.testing.assert_frame_equal(tabla_maestra(tmp_path / "sincrona"),
+                                  tabla_maestra(tmp_path / "precarga"))
@@ -0,0 +1,66 @@
+import json
+
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import CLIP_LIMITS, TILE_SIZES, barrer, tabla_maestra
+from generar_datos_clahe import calcular_entropia
+from region_interes import cargar_region_interes, es_archivo_auxiliar
+
+def _caja(ruta_imagen, x, y, ancho, alto):
+    ruta = ruta_imagen.with_name(f"{ruta_imagen.stem}.roi.json")
+    ruta.write_text(json.dumps({'x': x, 'y': y, 'ancho': ancho, 'alto': alto}),
+                    encoding='utf-8')
+    return ruta
+
+def test_mascara_y_caja(tmp_path):
+    imagen = tmp_path / "imagen.png"
+    assert cargar_region_interes(imagen, (40, 50)) is None
+
+    mascara = np.zeros((40, 50), np.uint8)
+    mascara[10:20, 5:45] = 255
+    cv2.imwrite(str(tmp_path / "imagen.mascara.png"), mascara)
+    assert cargar_region_interes(imagen, (40, 50)).caja == (10, 20, 5, 45)
+
+    # Con caja, la máscara se limita a ella y la caja se ajusta a la máscara
+    ruta_caja = _caja(imagen, 0, 0, 25, 15)
+    region = cargar_region_interes(imagen, (40, 50))
+    assert region.caja == (10, 15, 5, 25) and region.pixeles == 5 * 20
+    assert es_archivo_auxiliar(ruta_caja)
+    assert es_archivo_auxiliar(tmp_path / "imagen.mascara.png")
+    assert not es_archivo_auxiliar(imagen)
+
+    with pytest.raises(ValueError, match="forma"):
+        cargar_region_interes(imagen, (40, 60))
+
+def test_mascara_vacia(tmp_path):
+    imagen = tmp_path / "imagen.png"
+    cv2.imwrite(str(tmp_path / "imagen.mascara.png"), np.zeros((40, 50), np.uint8))
+    with pytest.raises(ValueError, match="ningún píxel"):
+        cargar_region_interes(imagen, (40, 50))
+
+@pytest.mark.parametrize('clahe_recorte', [False, True])
+def test_barrido_con_region(corpus, tmp_path, clahe_recorte):
+    barrer(corpus, tmp_path / "completo")
+    # imagen_0: caja; imagen_1: máscara vacía (se avisa y se evalúa completa)
+    _caja(corpus / "imagen_0.png", x=20, y=30, ancho=60, alto=40)
+    cv2.imwrite(str(corpus / "imagen_1.mascara.png"), np.zeros((120, 88), np.uint8))
+    barrer(corpus, tmp_path / "region", region_interes=True, clahe_recorte=clahe_recorte)
+
+    completo, region = tabla_maestra(tmp_path / "completo"), tabla_maestra(tmp_path / "region")
+    assert len(region) == len(completo)
+    por_imagen = region['Imagen_Original'] == "imagen_1.png"
+    pd.testing.assert_frame_equal(region[por_imagen], completo[por_imagen])
+
+    original = cv2.imread(str(corpus / "imagen_0.png"), cv2.IMREAD_GRAYSCALE)
+    alpha, omega = CLIP_LIMITS[0], TILE_SIZES[0]
+    if clahe_recorte:
+        original = original[14:86, 4:96]  # caja más MARGEN_RECORTE
+        caja = (slice(16, 56), slice(16, 76))
+    else:
+        caja = (slice(30, 70), slice(20, 80))
+    salida = cv2.createCLAHE(clipLimit=alpha, tileGridSize=(omega, omega)).apply(original)
+    assert region.loc[0, 'Entropia'] == pytest.approx(calcular_entropia(salida[caja]))
+    assert region.loc[0, 'Entropia'] != completo.loc[0, 'Entropia']
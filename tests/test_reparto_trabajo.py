@@ -0,0 +1,60 @@
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from conftest import barrer, tabla_maestra
+from diario_resultados import NOMBRE_DIARIO
+from reparto_trabajo import ColaTrabajo, combinar_resultados, estado_cola, nombre_diario_shard
+
+IMAGENES = [Path(f"imagen_{i}.png") for i in range(3)]
+
+def test_nodos_reparten_sin_repetir(tmp_path):
+    ruta = tmp_path / "cola.sqlite"
+    a = ColaTrabajo(ruta, IMAGENES, nodo="a")
+    b = ColaTrabajo(ruta, IMAGENES, nodo="b")
+    reclamadas = [a.reclamar(), b.reclamar(), a.reclamar()]
+    assert reclamadas == IMAGENES
+    assert a.reclamar() is None
+    for cola, img_path in zip((a, b, a), reclamadas):
+        cola.completar(img_path)
+    assert estado_cola(ruta) == {'hecha': 3}
+
+def test_nodo_relanzado_recupera_sus_reclamaciones(tmp_path):
+    ruta = tmp_path / "cola.sqlite"
+    caido = ColaTrabajo(ruta, IMAGENES, nodo="n1")
+    assert caido.reclamar() == IMAGENES[0]
+    time.sleep(0.01)
+
+    # Otro nodo no la recibe antes de la caducidad; el mismo nodo sí, la primera
+    otro = ColaTrabajo(ruta, IMAGENES, nodo="n2")
+    assert otro.reclamar() == IMAGENES[1]
+    relanzado = ColaTrabajo(ruta, IMAGENES, nodo="n1")
+    assert relanzado.reclamar() == IMAGENES[0]
+    # Lo reclamado en esta ejecución (en curso) no se vuelve a entregar
+    assert relanzado.reclamar() == IMAGENES[2]
+    assert relanzado.reclamar() is None
+
+def test_reclamacion_caducada_se_reparte(tmp_path):
+    ruta = tmp_path / "cola.sqlite"
+    ColaTrabajo(ruta, IMAGENES[:1], nodo="caido").reclamar()
+    assert ColaTrabajo(ruta, IMAGENES[:1], nodo="otro").reclamar() is None
+    assert ColaTrabajo(ruta, IMAGENES[:1], nodo="otro", caducidad_s=0).reclamar() == IMAGENES[0]
+
+def test_combinar_shards_coincide_con_un_solo_nodo(corpus, tmp_path):
+    barrer(corpus, tmp_path / "unico")
+    repartido = tmp_path / "repartido"
+    for shard in ("0/2", "1/2"):
+        barrer(corpus, repartido, shard=shard)
+
+    # Una fila repetida en otro diario (tarea reclamada de nuevo) y un diario
+    # de una ejecución sin reparto en el mismo directorio no cambian la tabla
+    diario_0, diario_1 = sorted(repartido.glob(nombre_diario_shard('*')))
+    fila = diario_0.read_text(encoding='utf-8').splitlines(keepends=True)[1]
+    with open(diario_1, 'a', encoding='utf-8') as f:
+        f.write(fila)
+    (repartido / NOMBRE_DIARIO).write_text('{"otra": "configuracion"}\n', encoding='utf-8')
+
+    df = combinar_resultados(repartido)
+    assert df['ID_Experimento'].is_unique
+    pd.testing.assert_frame_equal(tabla_maestra(tmp_path / "unico"), tabla_maestra(repartido))
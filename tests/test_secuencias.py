@@ -0,0 +1,69 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from conftest import imagen_sintetica
+from secuencias import (_en_segundo_plano, aplicar_secuencia, es_secuencia,
+                        extraer_fotogramas_clave)
+
+tifffile = pytest.importorskip("tifffile")
+
+@pytest.fixture
+def secuencia_tiff(tmp_path):
+    ruta = tmp_path / "secuencia.tif"
+    fotogramas = np.stack([imagen_sintetica(48, 64, semilla=i) for i in range(7)])
+    tifffile.imwrite(ruta, fotogramas)
+    return ruta, fotogramas
+
+def test_consumidor_que_se_detiene_libera_el_productor():
+    cerrado = threading.Event()
+
+    def infinito():
+        try:
+            n = 0
+            while True:
+                yield n
+                n += 1
+        finally:
+            cerrado.set()
+
+    hilos = threading.active_count()
+    elementos = _en_segundo_plano(infinito(), capacidad=2)
+    assert [next(elementos) for _ in range(3)] == [0, 1, 2]
+    elementos.close()
+    assert cerrado.is_set()
+    assert threading.active_count() == hilos
+
+def test_excepcion_del_productor_se_relanza():
+    def fallido():
+        yield 1
+        raise ValueError("fotograma ilegible")
+
+    with pytest.raises(ValueError, match="ilegible"):
+        list(_en_segundo_plano(fallido(), capacidad=1))
+
+def test_fotogramas_clave_de_un_tiff(secuencia_tiff, tmp_path):
+    ruta, fotogramas = secuencia_tiff
+    assert es_secuencia(ruta)
+    destino = tmp_path / "claves"
+    claves = extraer_fotogramas_clave([ruta], destino, paso=3, verbose=False)
+    assert [c.name for c in claves] == [f"secuencia_f{i:06d}.png" for i in (0, 3, 6)]
+    for indice, clave in zip((0, 3, 6), claves):
+        np.testing.assert_array_equal(cv2.imread(str(clave), cv2.IMREAD_UNCHANGED),
+                                      fotogramas[indice])
+
+    # Los fotogramas ya extraídos se reutilizan sin reescribirlos
+    fechas = [c.stat().st_mtime_ns for c in claves]
+    assert extraer_fotogramas_clave([ruta], destino, paso=3, verbose=False) == claves
+    assert [c.stat().st_mtime_ns for c in claves] == fechas
+
+def test_aplicar_secuencia_coincide_con_opencv(secuencia_tiff, tmp_path):
+    ruta, fotogramas = secuencia_tiff
+    salida = tmp_path / "salida.tif"
+    resumen = aplicar_secuencia(ruta, salida, 2.0, 8, capacidad=2, verbose=False)
+    assert resumen['fotogramas'] == len(fotogramas)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    np.testing.assert_array_equal(tifffile.imread(salida),
+                                  np.stack([clahe.apply(f) for f in fotogramas]))
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from seleccion_pareto import METRICAS_PARETO, optimos_por_imagen, rangos_pareto
+
+def _tabla(filas_por_imagen=(40, 25, 60), semilla=0):
+    # Construida por filas, como en memoria: las métricas comparten un bloque
+    # float (to_numpy puede devolver una vista de solo lectura)
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame([{'Imagen_Original': f"imagen_{i}",
+                          **{m: float(rng.random()) for m in METRICAS_PARETO}}
+                         for i, n in enumerate(filas_por_imagen) for _ in range(n)])
+
+def _rangos_directos(valores):
+    """Rangos de Pareto pelando frentes fila a fila (referencia)."""
+    rangos = np.full(len(valores), -1)
+    rango = 0
+    while (rangos < 0).any():
+        restantes = np.flatnonzero(rangos < 0)
+        frente = [i for i in restantes
+                  if not any((valores[j] >= valores[i]).all() and (valores[j] > valores[i]).any()
+                             for j in restantes)]
+        rangos[frente] = rango
+        rango += 1
+    return rangos
+
+def test_rangos_con_valores_ausentes():
+    df = _tabla()
+    df.loc[3, 'Entropia'] = np.nan
+    rangos = rangos_pareto(df)
+    for _, grupo in df.groupby('Imagen_Original'):
+        valores = np.nan_to_num(grupo[list(METRICAS_PARETO)].to_numpy(), nan=-np.inf)
+        np.testing.assert_array_equal(rangos.loc[grupo.index], _rangos_directos(valores))
+
+@pytest.mark.parametrize('elementos_por_lote', [1, 1000, 4000])
+def test_lotes_pequenos_dan_los_mismos_rangos(elementos_por_lote):
+    df = _tabla()
+    pd.testing.assert_series_equal(rangos_pareto(df),
+                                   rangos_pareto(df, elementos_por_lote=elementos_por_lote))
+
+def test_pesos_de_metricas_desconocidas():
+    df = _tabla()
+    frente = df[rangos_pareto(df) == 0]
+    assert len(optimos_por_imagen(frente, {'Entropia': 1.0})) == 3
+    with pytest.raises(ValueError, match="Entropai"):
+        optimos_por_imagen(frente, {'Entropai': 1.0})